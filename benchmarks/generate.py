@@ -0,0 +1,82 @@
+"""Synthetic inputs for the benchmarks: long LRC files, big libraries and playlists.
+
+Everything comes from a seeded random.Random, so the same arguments give
+byte-identical files and runs on different commits time the same work.
+"""
+import json
+import os
+import random
+
+WORDS = ("love night dance heart fire rain light dream baby tonight shine "
+         "never forever away home road sky falling alone together gold").split()
+ARTISTS = ("Tame Impala", "The Midnight", "Daft Punk", "Björk", "宇多田ヒカル",
+           "Sigur Rós", "Khruangbin", "Röyksopp", "Caribou", "MGMT")
+
+
+def lyric_line(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))).capitalize()
+
+
+def write_lrc(path, lines=10000, seed=0):
+    """An LRC file of lines lyric lines, about 2.5 s apart, with comments and metadata tags mixed in"""
+    rng = random.Random(seed)
+    t = 0.0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[ar:Benchmark]\n[ti:Synthetic]\n# generated\n")
+        for i in range(lines):
+            t += rng.uniform(1.0, 4.0)
+            minutes, seconds = divmod(t, 60)
+            f.write(f"[{int(minutes):02d}:{seconds:05.2f}]{lyric_line(rng)}\n")
+            if i % 500 == 0:
+                f.write("\n# verse\n")
+    return path
+
+
+def make_library(root, songs=100000, folders=100, seed=0):
+    """songs fake mp3/lrc pairs spread over folders subfolders. Returns [(mp3_path, lrc_path)]"""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    pairs = []
+    for i in range(songs):
+        folder = os.path.join(root, f"folder{i % folders:03d}") if folders else root
+        if i < folders:
+            os.makedirs(folder, exist_ok=True)
+        name = f"{rng.choice(ARTISTS)} - {lyric_line(rng)[:40]} {i}"
+        mp3_path = os.path.join(folder, name + ".mp3")
+        lrc_path = mp3_path[:-4] + ".lrc"
+        with open(mp3_path, 'wb') as f:
+            f.write(b"ID3" + bytes(rng.randrange(256) for _ in range(13)))
+        with open(lrc_path, 'w', encoding='utf-8') as f:
+            f.write(f"[00:01.00]{lyric_line(rng)}\n[00:04.00]{lyric_line(rng)}\n")
+        pairs.append((mp3_path, lrc_path))
+    # mp3s without lyrics are skipped by scans but still walked over
+    for i in range(songs // 20):
+        folder = os.path.join(root, f"folder{i % folders:03d}") if folders else root
+        open(os.path.join(folder, f"no lyrics {i}.mp3"), 'wb').close()
+    return pairs
+
+
+def write_playlists(playlists_dir, pairs, count=20, size=5000, journal=200, seed=0):
+    """count playlist snapshots of size songs from pairs, each with journal edits to replay"""
+    rng = random.Random(seed)
+    os.makedirs(playlists_dir, exist_ok=True)
+    for n in range(count):
+        songs = [list(pair) for pair in rng.sample(pairs, min(size, len(pairs)))]
+        name = f"Playlist {n}"
+        snapshot = {
+            "name": name,
+            "songs": songs,
+            "ids": list(range(len(songs))),
+            "next_id": len(songs),
+            "shuffle_mode": bool(n % 2),
+        }
+        with open(os.path.join(playlists_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        next_id = len(songs)
+        with open(os.path.join(playlists_dir, f"{name}.journal"), 'w', encoding='utf-8') as f:
+            for _ in range(journal):
+                if rng.random() < 0.7:
+                    f.write(json.dumps({"op": "add", "id": next_id, "song": list(rng.choice(pairs))}) + "\n")
+                    next_id += 1
+                else:
+                    f.write(json.dumps({"op": "remove", "id": rng.randrange(next_id)}) + "\n")
@@ -0,0 +1,265 @@
+"""Time the parser, line lookup, headless drawing, playlist loading, library scans and startup.
+
+    python benchmarks/run.py                      # full size, results/<commit>.json
+    python benchmarks/run.py --quick              # small inputs for a smoke run
+    python benchmarks/run.py --compare results/abc1234.json
+
+Inputs are generated once into --data and reused while their sizes match.
+Timings are per call in microseconds (count, mean, max, p50, p95, p99,
+histogram), so results from different commits can be compared directly.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from generate import make_library, write_lrc, write_playlists
+from terminal_karaoke.headless import HeadlessSession
+from terminal_karaoke.library import LibraryIndex
+from terminal_karaoke.lyrics import LyricsParser, current_line_index
+from terminal_karaoke.persistence import PersistenceService
+from terminal_karaoke.playlist import PlaylistManager
+from terminal_karaoke.profiling import STARTUP_BUDGET, PhaseStats
+
+FULL = {"lrc_lines": 10000, "songs": 100000, "folders": 100, "playlists": 20, "playlist_size": 5000,
+        "parse_repeats": 20, "lookups": 20000, "draw_seconds": 120, "load_repeats": 5, "scan_repeats": 3,
+        "startup_repeats": 5}
+QUICK = {"lrc_lines": 2000, "songs": 5000, "folders": 20, "playlists": 5, "playlist_size": 1000,
+         "parse_repeats": 5, "lookups": 2000, "draw_seconds": 20, "load_repeats": 2, "scan_repeats": 1,
+         "startup_repeats": 2}
+# Sizes that change the generated files; the others only change how long cases run
+DATA_KEYS = ("lrc_lines", "songs", "folders", "playlists", "playlist_size")
+
+
+def timed(stats, func, *args):
+    started = time.perf_counter_ns()
+    result = func(*args)
+    stats.add(time.perf_counter_ns() - started)
+    return result
+
+
+def prepare_data(data_dir, params):
+    """Generate the inputs into data_dir unless it already holds them at these sizes"""
+    marker = os.path.join(data_dir, "params.json")
+    wanted = {key: params[key] for key in DATA_KEYS}
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == wanted:
+                return
+    except (OSError, ValueError):
+        pass
+    print(f"Generating inputs in {data_dir} ...", file=sys.stderr)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+    write_lrc(os.path.join(data_dir, "long.lrc"), params["lrc_lines"])
+    library = os.path.join(data_dir, "library")
+    pairs = make_library(library, params["songs"], params["folders"])
+    write_playlists(os.path.join(library, "playlists"), pairs, params["playlists"], params["playlist_size"])
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(wanted, f)
+
+
+def bench_parse(data_dir, params):
+    stats = PhaseStats()
+    parser = LyricsParser()
+    path = os.path.join(data_dir, "long.lrc")
+    for _ in range(params["parse_repeats"]):
+        lyrics = timed(stats, parser.parse, path)
+    return {"lines": len(lyrics), "us": stats.summary()}
+
+
+def bench_lookup(data_dir, params):
+    """current_line_index while playing straight through, and at random seek targets"""
+    lyrics = LyricsParser().parse(os.path.join(data_dir, "long.lrc"))
+    end = lyrics[-1][0] + 5.0
+    count = params["lookups"]
+    results = {}
+    rng = random.Random(0)
+    for name, times in (("playback", [end * i / count for i in range(count)]),
+                        ("seek", [rng.uniform(0, end) for _ in range(count)])):
+        stats = PhaseStats()
+        for t in times:
+            timed(stats, current_line_index, lyrics, t)
+        results[name] = stats.summary()
+    return results
+
+
+def bench_draw(data_dir, params):
+    """UI.draw into an in-memory screen, at a common and a large terminal size"""
+    results = {}
+    for size in ((24, 80), (60, 200)):
+        session = HeadlessSession(os.path.join(data_dir, "long.lrc"), size=size)
+        report = session.run(params["draw_seconds"])
+        results[f"{size[0]}x{size[1]}"] = {
+            "frames": report["frames"],
+            "us": report["draw_us"],
+            "bytes": report["bytes"],
+        }
+    return results
+
+
+def bench_load_playlists(data_dir, params):
+    library = os.path.join(data_dir, "library")
+    stats = PhaseStats()
+    for _ in range(params["load_repeats"]):
+        manager = timed(stats, PlaylistManager, library)  # __init__ runs load_playlists
+    songs = sum(len(playlist) for playlist in manager.playlists.values())
+    return {"playlists": len(manager.playlists), "songs": songs, "errors": len(manager.load_errors),
+            "us": stats.summary()}
+
+
+def bench_scan(data_dir, params):
+    """LibraryIndex.scan into an empty index, again with nothing changed, and reloading the index"""
+    library = os.path.join(data_dir, "library")
+    index_path = os.path.join(library, "library_index.json")
+    cold, warm, flush, load = PhaseStats(), PhaseStats(), PhaseStats(), PhaseStats()
+    for _ in range(params["scan_repeats"]):
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        persistence = PersistenceService()
+        try:
+            index = LibraryIndex(library, persistence)
+            added, _ = timed(cold, index.scan)
+            timed(flush, persistence.flush)
+            timed(warm, index.scan)
+        finally:
+            persistence.close()
+        timed(load, LibraryIndex, library)
+    os.remove(index_path)
+    return {"songs": len(added), "cold": cold.summary(), "warm": warm.summary(),
+            "flush": flush.summary(), "load_index": load.summary()}
+
+
+# Run in a fresh interpreter so imports count: launch the player on an in-memory
+# screen in the generated library and stop once the first menu is drawn
+STARTUP_SCRIPT = """
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from terminal_karaoke.player import KaraokePlayer
+from terminal_karaoke.render import MemoryScreen
+
+class FirstMenu(KaraokePlayer):
+    def drain_input(self):
+        return "first_menu" not in self.profiler.startup
+
+player = FirstMenu(MemoryScreen(), started_at=started)
+player.run()
+print(json.dumps(player.profiler.startup))
+sys.stdout.flush()
+os._exit(0)  # don't wait for the warm-up still running
+"""
+
+
+def bench_startup(data_dir, params):
+    """Launch to first menu in a new process, with the generated library warming up behind it"""
+    stats = PhaseStats()
+    for _ in range(params["startup_repeats"]):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, os.path.dirname(HERE)], cwd=data_dir,
+                                capture_output=True, text=True, check=True).stdout
+        startup = json.loads(output.strip().splitlines()[-1])
+        stats.add(int(startup["first_menu"] * 1e9))
+    index_path = os.path.join(data_dir, "library", "library_index.json")
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    return {"budget_ms": round(STARTUP_BUDGET * 1000), "first_menu": stats.summary()}
+
+
+CASES = {
+    "parse": bench_parse,
+    "current_line_index": bench_lookup,
+    "ui_draw": bench_draw,
+    "load_playlists": bench_load_playlists,
+    "library_scan": bench_scan,
+    "startup": bench_startup,
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "terminal_karaoke"], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def strip_histograms(results):
+    """Results without histograms, for printing"""
+    if isinstance(results, dict):
+        return {key: strip_histograms(value) for key, value in results.items() if key != "histogram"}
+    return results
+
+
+def medians(results, prefix=""):
+    """Flatten results to {"case.sub": p50} for every measurement with percentiles"""
+    found = {}
+    for key, value in results.items():
+        if isinstance(value, dict) and "p50" in value and "count" in value:
+            found[prefix + key] = value["p50"]
+        elif isinstance(value, dict):
+            found.update(medians(value, prefix + key + "."))
+    return found
+
+
+def compare(base, current):
+    """Print the median of each measurement in base and current, and their ratio"""
+    before, after = medians(base["results"]), medians(current["results"])
+    print(f"{'measurement':42} {base['commit']:>14} {current['commit']:>14}  ratio")
+    for name in sorted(before.keys() & after.keys()):
+        ratio = after[name] / before[name] if before[name] else float("inf")
+        flag = "  slower" if ratio > 1.2 else "  faster" if ratio < 0.8 else ""
+        print(f"{name:42} {before[name]:14.1f} {after[name]:14.1f}  {ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Terminal Karaoke benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Small inputs for a smoke run")
+    parser.add_argument("--only", action="append", choices=sorted(CASES), help="Run only these cases")
+    parser.add_argument("--data", help="Folder for generated inputs (default: benchmarks/data/<full|quick>)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASE", help="Print medians against an earlier results file")
+    args = parser.parse_args()
+
+    params = QUICK if args.quick else FULL
+    data_dir = args.data or os.path.join(HERE, "data", "quick" if args.quick else "full")
+    prepare_data(data_dir, params)
+
+    results = {}
+    for name in args.only or CASES:
+        print(f"Running {name} ...", file=sys.stderr)
+        results[name] = CASES[name](data_dir, params)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    output = args.output or os.path.join(HERE, "results", f"{commit}{'-quick' if args.quick else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+
+    print(json.dumps(strip_histograms(results), indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
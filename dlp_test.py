@@ -11,20 +11,16 @@ def test_download():
     query = "Rick Astley - Never Gonna Give You Up"
     print(f"Searching for: {query}")
     
-    url, error = downloader.search_youtube(query)
-    if error:
-        print(f"Search error: {error}")
+    url = downloader.search_youtube(query)
+    if not url:
+        print("Search failed - no result returned")
         return
     
     print(f"Found URL: {url}")
     
     # Test download
     print("\nDownloading...")
-    mp3_path, error = downloader.download_audio(url, query)
-    
-    if error:
-        print(f"\nDownload error: {error}")
-        return
+    mp3_path = downloader.download_audio(url, query)
     
     if mp3_path:
         print(f"\nSuccess! Downloaded to: {mp3_path}")
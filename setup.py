@@ -26,11 +26,12 @@ setup(
         "Programming Language :: Python :: 3.11",
         "License :: OSI Approved :: MIT License",
     ],
-    python_requires=">=3.7",
+    python_requires=">=3.13",
     install_requires=[
-        "pygame>=2.0.0",
+        "pyaudio>=0.2.11",
         "yt-dlp>=2023.3.4",
         "requests>=2.28.0",
+        "numpy>=2.1.0",
     ],
     entry_points={
         "console_scripts": [
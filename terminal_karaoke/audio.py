@@ -1,37 +1,66 @@
-import pygame
+from .engine import AudioEngine
+from .pcmcache import PCMCache
+from .persistence import remove_file
 
 class AudioManager:
-    def __init__(self):
-        self.sound = None
+    def __init__(self, profile="balanced", cache_dir=None, persistence=None, on_error=print, discard=remove_file):
+        self.on_error = on_error
+        self.engine = AudioEngine(profile=profile)
+        if cache_dir:
+            self.engine.pcm_cache = PCMCache(
+                cache_dir, self.engine.rate, self.engine.channels, persistence=persistence, discard=discard
+            )
         
     def init_mixer(self):
-        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+        self.engine.start()
         
-    def load_song(self, song_path):
+    def load_song(self, song_path, gain=None, duration=None):
         try:
-            pygame.mixer.music.stop()
-            pygame.mixer.music.load(song_path)
-            self.sound = pygame.mixer.Sound(song_path)
-            length = self.sound.get_length()
+            length = self.engine.load(song_path, duration)
+            if gain is not None:
+                self.engine.gain = gain
             return True, length
         except Exception as e:
             return False, 0.0
             
     def seek(self, seconds):
-        pygame.mixer.music.stop()
-        pygame.mixer.music.play(start=seconds)
+        self.engine.seek_frame(seconds * self.engine.rate)
+        self.engine.play()
         
     def pause(self):
-        pygame.mixer.music.pause()
+        self.engine.pause()
+        
+    def prefetch(self, song_path, duration=None):
+        """Decode the next song ahead of time"""
+        try:
+            self.engine.prefetch(song_path, duration)
+        except Exception as e:
+            self.on_error(f"Error preparing next song: {e}")
+            
+    def set_loop(self, start, end):
+        """Loop between two times in seconds"""
+        return self.engine.set_loop(start * self.engine.rate, end * self.engine.rate)
+        
+    def clear_loop(self):
+        self.engine.clear_loop()
         
     def unpause(self):
-        pygame.mixer.music.unpause()
+        self.engine.play()
         
-    def get_position(self):
-        return pygame.mixer.music.get_pos()
+    def finished(self):
+        """True once the song has played to its end"""
+        return self.engine.finished()
+
+    def get_length(self):
+        """Decoded length of the song in seconds, or None until decoding reaches the end"""
+        return self.engine.decoded_duration()
+
+    def get_time(self):
+        """Playback position in seconds, from the engine's frame counter"""
+        return self.engine.position_frames() / self.engine.rate
     
     def stop(self):
-        pygame.mixer.music.stop()
+        self.engine.stop()
         
     def cleanup(self):
-        pygame.mixer.music.stop()
+        self.engine.close()
@@ -0,0 +1,69 @@
+WRITE_SLOW = 0.010  # seconds a refresh may block on the terminal before it counts as congested
+QUEUE_HIGH = 4096  # bytes waiting in the tty output queue that count as congested
+QUEUE_CLEAR = 256  # bytes below which the link counts as caught up
+ESCALATE_GAP = 0.5  # seconds between steps down, so one slow frame costs one level
+RECOVER_SECONDS = 3.0  # clean seconds before stepping back up a level
+
+# Per level: frames per second (None is every loop), dancing cat, highlight step
+# in cells, and whether cosmetic rows (visualizer) are drawn
+LEVELS = [
+    (None, True, 1, True),
+    (15, False, 2, True),
+    (5, False, 4, False),
+]
+
+
+class RenderGovernor:
+    """Backs rendering off when the terminal can't keep up, and back on once it does.
+
+    Fed each frame's refresh time and the bytes still queued for the
+    terminal. Congestion drops a level: fewer frames, no cat, coarser
+    highlight steps. Frames where the layout changed (a new lyric line)
+    are always drawn, whatever the level.
+    """
+
+    def __init__(self, forced=False):
+        self.floor = 1 if forced else 0  # --low-bandwidth never goes back to full rate
+        self.level = self.floor
+        self.last_draw = None
+        self.last_change = float("-inf")
+        self.clean_since = None
+        self.frames_at_level = [0] * len(LEVELS)
+
+    @property
+    def fps(self):
+        return LEVELS[self.level][0]
+
+    @property
+    def show_cat(self):
+        return LEVELS[self.level][1]
+
+    @property
+    def highlight_step(self):
+        return LEVELS[self.level][2]
+
+    @property
+    def cosmetics(self):
+        return LEVELS[self.level][3]
+
+    def due(self, now):
+        """Whether a frame with no urgent change should be drawn at now"""
+        fps = self.fps
+        return fps is None or self.last_draw is None or now - self.last_draw >= 1.0 / fps
+
+    def record(self, now, write_seconds, queued_bytes):
+        """Note a drawn frame's refresh time and the output still queued after it"""
+        self.last_draw = now
+        self.frames_at_level[self.level] += 1
+        if write_seconds > WRITE_SLOW or queued_bytes > QUEUE_HIGH:
+            self.clean_since = None
+            if self.level < len(LEVELS) - 1 and now - self.last_change >= ESCALATE_GAP:
+                self.level += 1
+                self.last_change = now
+        elif queued_bytes <= QUEUE_CLEAR:
+            if self.clean_since is None:
+                self.clean_since = now
+            elif self.level > self.floor and now - self.clean_since >= RECOVER_SECONDS:
+                self.level -= 1
+                self.last_change = now
+                self.clean_since = now
@@ -1,22 +1,43 @@
 import os
-import requests
-import yt_dlp
 import re
 import time
 
+class QuietLogger:
+    """yt-dlp logger that drops its output; failures still arrive as exceptions"""
+
+    def debug(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+
 class SongDownloader:
-    def __init__(self, download_dir=None):
+    """Finds and downloads songs. Runs on worker threads under the player, so
+    errors go to on_error rather than the terminal curses is drawing on.
+    """
+
+    def __init__(self, download_dir=None, on_error=print):
         self.download_dir = download_dir or os.path.join(os.getcwd(), "library")
+        self.on_error = on_error
         if not os.path.exists(self.download_dir):
             os.makedirs(self.download_dir)
-        self.lyrics_fetcher = LyricsFetcher()
+        self.lyrics_fetcher = LyricsFetcher(on_error)
     
     def search_youtube(self, query):
         """Search YouTube for a song and return the first result URL"""
         try:
-            # Use yt-dlp to search YouTube
+            # yt-dlp takes a while to import, so it is only loaded for the first download
+            import yt_dlp
             ydl_opts = {
                 'quiet': True,
+                'logger': QuietLogger(),
                 'skip_download': True,
                 'extract_flat': 'in_playlist',
             }
@@ -27,12 +48,13 @@ class SongDownloader:
                 if result and 'entries' in result and result['entries']:
                     return result['entries'][0]['url']
         except Exception as e:
-            print(f"Error searching YouTube: {e}")
+            self.on_error(f"Error searching YouTube: {e}")
         return None
     
     def download_audio(self, url, title=None):
         """Download audio from YouTube URL"""
         try:
+            import yt_dlp
             # Sanitize title for filename
             if title:
                 safe_title = re.sub(r'[^\w\-_\. ]', '_', title)[:50]
@@ -49,7 +71,9 @@ class SongDownloader:
                     'preferredcodec': 'mp3',
                     'preferredquality': '192',
                 }],
-                'quiet': False,
+                'quiet': True,
+                'noprogress': True,
+                'logger': QuietLogger(),
             }
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -59,7 +83,7 @@ class SongDownloader:
                 mp3_file = downloaded_file.rsplit('.', 1)[0] + '.mp3'
                 return mp3_file
         except Exception as e:
-            print(f"Error downloading audio: {e}")
+            self.on_error(f"Error downloading audio: {e}")
             return None
     
     def save_lrc_file(self, lrc_content, mp3_path):
@@ -70,18 +94,27 @@ class SongDownloader:
                 f.write(lrc_content)
             return lrc_path
         except Exception as e:
-            print(f"Error saving LRC file: {e}")
+            self.on_error(f"Error saving LRC file: {e}")
             return None
 
 class LyricsFetcher:
     """Fetch synchronized lyrics using LRCLIB API"""
     
-    def __init__(self):
+    def __init__(self, on_error=print):
         self.base_url = "https://lrclib.net/api"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Terminal Karaoke Player (https://github.com/hissterical/terminal-karaoke)'
-        })
+        self.on_error = on_error
+        self._session = None
+
+    @property
+    def session(self):
+        """HTTP session, created on the first lookup so startup doesn't import requests"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'Terminal Karaoke Player (https://github.com/hissterical/terminal-karaoke)'
+            })
+        return self._session
     
     def search_lyrics(self, artist, title):
         """Search for lyrics using LRCLIB API"""
@@ -108,7 +141,7 @@ class LyricsFetcher:
                             return synced_lyrics
             return None
         except Exception as e:
-            print(f"Error fetching lyrics: {e}")
+            self.on_error(f"Error fetching lyrics: {e}")
             return None
     
     def get_lyrics_by_metadata(self, artist, title, album="", duration=0):
@@ -130,7 +163,7 @@ class LyricsFetcher:
                 return self.search_lyrics(artist, title)
             return None
         except Exception as e:
-            print(f"Error getting lyrics by meta {e}")
+            self.on_error(f"Error getting lyrics by meta {e}")
             return None
     
     def create_basic_lrc(self, duration_seconds, artist="", title=""):
@@ -0,0 +1,102 @@
+import subprocess
+import wave
+import numpy as np
+
+FFMPEG = "ffmpeg"
+
+
+def ffmpeg_decode_command(path, rate, channels, start=0.0, duration=None):
+    """ffmpeg arguments that decode path to raw little-endian s16 PCM on stdout"""
+    cmd = [FFMPEG, "-nostdin", "-v", "error"]
+    if start > 0:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(rate), "-"]
+    return cmd
+
+
+def decode_pcm(path, rate=22050, channels=1, start=0.0, duration=None):
+    """Decode an audio file to float32 samples in [-1, 1], shaped (frames, channels)"""
+    result = subprocess.run(
+        ffmpeg_decode_command(path, rate, channels, start, duration),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    samples = np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768.0
+    return samples.reshape(-1, channels)
+
+
+def to_mono(samples):
+    """Average a (frames, channels) array down to one channel"""
+    if samples.ndim == 1:
+        return samples
+    return samples.mean(axis=1)
+
+
+def write_wav(path, samples, rate):
+    """Write float samples shaped (frames, channels) as a 16-bit WAV file"""
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(pcm.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+
+
+def frame_signal(samples, frame_size, hop):
+    """Strided view of a mono signal as overlapping frames, shaped (count, frame_size)"""
+    if len(samples) < frame_size:
+        samples = np.pad(samples, (0, frame_size - len(samples)))
+    count = 1 + (len(samples) - frame_size) // hop
+    return np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(count, frame_size),
+        strides=(samples.strides[0] * hop, samples.strides[0]),
+        writeable=False,
+    )
+
+
+def overlap_add(frames, hop, length=None):
+    """Sum overlapping frames shaped (count, size) spaced hop samples apart"""
+    count, size = frames.shape
+    out = np.zeros((count - 1) * hop + size, dtype=frames.dtype)
+    offsets = np.arange(size)
+    # Frames a whole number of sizes apart never overlap, so each group adds without collisions
+    stride = -(-size // hop)
+    for group in range(stride):
+        starts = np.arange(group, count, stride) * hop
+        out[(starts[:, None] + offsets).ravel()] += frames[group::stride].ravel()
+    return out if length is None else out[:length]
+
+
+def stft(samples, n_fft=2048, hop=512):
+    """Short-time Fourier transform of a mono signal, shaped (frames, bins)"""
+    window = np.hanning(n_fft + 1)[:n_fft].astype(np.float32)
+    padded = np.pad(samples, (n_fft // 2, n_fft // 2))
+    return np.fft.rfft(frame_signal(padded, n_fft, hop) * window, axis=1).astype(np.complex64)
+
+
+def istft(spectrum, n_fft=2048, hop=512, length=None):
+    """Inverse of stft() by windowed overlap-add"""
+    window = np.hanning(n_fft + 1)[:n_fft].astype(np.float32)
+    frames = np.fft.irfft(spectrum, n=n_fft, axis=1).astype(np.float32) * window
+    gain = np.sum(window ** 2) / hop  # overlap of the squared window
+    out = overlap_add(frames, hop) / gain
+    out = out[n_fft // 2:]
+    return out if length is None else out[:length]
+
+
+def probe_duration(path):
+    """Length of an audio file in seconds, read from its container by ffprobe"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    return float(result.stdout.strip())
@@ -0,0 +1,399 @@
+import subprocess
+import threading
+import numpy as np
+from .dsp import ffmpeg_decode_command, probe_duration
+
+# Frames per callback. Smaller is tighter sync and recording alignment,
+# larger survives a busy machine without dropouts
+LATENCY_PROFILES = {
+    "low": 256,
+    "balanced": 512,
+    "safe": 2048,
+}
+
+
+class RingBuffer:
+    """Fixed-size FIFO of int16 frames shared by the decoder and the audio callback"""
+
+    def __init__(self, capacity, channels):
+        self.data = np.zeros((capacity, channels), dtype=np.int16)
+        self.capacity = capacity
+        self.read_pos = 0
+        self.write_pos = 0
+        self.lock = threading.Lock()
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def space(self):
+        return self.capacity - self.available()
+
+    def write(self, frames):
+        """Append as many frames as fit; returns how many were taken"""
+        with self.lock:
+            count = min(len(frames), self.space())
+            start = self.write_pos % self.capacity
+            first = min(count, self.capacity - start)
+            self.data[start:start + first] = frames[:first]
+            self.data[:count - first] = frames[first:count]
+            self.write_pos += count
+            return count
+
+    def read(self, count):
+        """Take up to count frames from the front"""
+        with self.lock:
+            count = min(count, self.available())
+            start = self.read_pos % self.capacity
+            first = min(count, self.capacity - start)
+            out = np.concatenate([self.data[start:start + first], self.data[:count - first]])
+            self.read_pos += count
+            return out
+
+    def clear(self):
+        with self.lock:
+            self.read_pos = self.write_pos = 0
+
+
+class StreamingSource:
+    """Decodes a file with ffmpeg, starting at a given frame"""
+
+    def __init__(self, path, rate, channels, start_frame=0):
+        self.channels = channels
+        self.process = subprocess.Popen(
+            ffmpeg_decode_command(path, rate, channels, start=start_frame / rate),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, frames):
+        """Next block of frames as an int16 array; empty at the end of the file"""
+        data = self.process.stdout.read(frames * self.channels * 2)
+        usable = len(data) - len(data) % (self.channels * 2)
+        return np.frombuffer(data[:usable], dtype='<i2').reshape(-1, self.channels)
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+
+class AudioEngine:
+    """One callback-driven duplex PyAudio stream for playback and microphone capture.
+
+    Playback and capture run off the same sample clock, so the playback
+    position in frames is exact and mic input can be placed against it.
+    """
+
+    def __init__(self, rate=44100, channels=2, profile="balanced", pcm_cache=None):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = LATENCY_PROFILES[profile]
+        self.pcm_cache = pcm_cache  # PCMCache; without one songs stream through ffmpeg
+        self.ring = RingBuffer(rate * 2, channels)  # two seconds of decoded audio
+        self.audio = None
+        self.stream = None
+        self.has_input = False
+        self.output_latency_frames = 0
+        self.continue_flag = 0  # pyaudio.paContinue, set by start
+
+        self.path = None
+        self.duration = 0.0
+        self.source = None
+        self.source_lock = threading.Lock()
+        self.decoded_to = 0  # frame the decoder has reached
+        self.position = 0  # frame at the front of the ring buffer
+        self.position_lock = threading.Lock()  # keeps position and ring contents consistent
+        self.eof = False
+        self.pcm = None  # DecodedPCM of the current song when it is cached
+        self.prefetched = None  # DecodedPCM being prepared for the next song
+        self.loop_start = None
+        self.loop_end = None
+        self.paused = True
+        self.gain = 1.0
+        self.input_queues = []  # queues receiving (bytes, song frame) for each input block
+        self.test_signal = None  # int16 frames played instead of the song, for calibration
+        self.test_position = 0
+        self.test_queue = None  # receives the input captured while the test signal plays
+
+        self.wakeup = threading.Event()
+        self.running = False
+        self.decoder_thread = None
+
+    def start(self):
+        """Open the stream, falling back to output only if there is no usable input"""
+        import pyaudio  # imported here so the player starts without waiting on PortAudio
+        self.continue_flag = pyaudio.paContinue
+        self.audio = pyaudio.PyAudio()
+        options = dict(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        try:
+            self.stream = self.audio.open(input=True, **options)
+            self.has_input = True
+        except Exception:
+            self.stream = self.audio.open(**options)
+            self.has_input = False
+        self.output_latency_frames = int(self.stream.get_output_latency() * self.rate)
+        self.running = True
+        self.decoder_thread = threading.Thread(target=self._decode_loop, name="decoder", daemon=True)
+        self.decoder_thread.start()
+        self.stream.start_stream()
+
+    def load(self, path, duration=None):
+        """Make path the current song, paused at the start. Returns its duration.
+
+        ffprobe is only run when the caller doesn't already know the duration.
+        """
+        if duration is None:
+            duration = probe_duration(path)
+        self.paused = True
+        pcm = self._open_cached(path, duration)
+        with self.source_lock:
+            self.path = None if pcm else path  # the streaming decoder idles while the cache plays
+            self.duration = duration
+            with self.position_lock:
+                self.pcm = pcm
+                self.loop_start = self.loop_end = None
+        self.seek_frame(0)
+        if self.pcm_cache:
+            self.pcm_cache.release(keep=(pcm, self.prefetched))
+        return duration
+
+    def _open_cached(self, path, duration):
+        if self.pcm_cache is None:
+            return None
+        try:
+            return self.pcm_cache.open(path, duration)
+        except Exception:
+            return None  # streaming plays it just the same
+
+    def prefetch(self, path, duration=None):
+        """Start decoding the song expected next so it starts and seeks instantly"""
+        if self.pcm_cache is None:
+            return
+        try:
+            if duration is None:
+                duration = probe_duration(path)
+        except Exception:
+            return
+        self.prefetched = self._open_cached(path, duration)
+        self.pcm_cache.release(keep=(self.pcm, self.prefetched))
+
+    def seek_frame(self, frame):
+        """Move playback to frame; a cached song plays from there immediately"""
+        if self.pcm is not None:
+            with self.position_lock:
+                self.position = max(0, int(frame))
+            return
+        # Streaming: restart decoding at frame; the callback plays once data arrives
+        with self.source_lock:
+            old_source, self.source = self.source, None
+            with self.position_lock:
+                if self.loop_end is not None and frame >= self.loop_end:
+                    frame = self.loop_start  # as the cached path does on its next read
+                self.ring.clear()
+                self.position = self.decoded_to = max(0, int(frame))
+            self.eof = False
+        if old_source:
+            old_source.close()
+        self.wakeup.set()
+
+    def play(self):
+        self.paused = False
+
+    def pause(self):
+        self.paused = True
+
+    def set_loop(self, start_frame, end_frame):
+        """Repeat the frames between start and end until clear_loop()"""
+        if end_frame <= start_frame:
+            return False
+        with self.position_lock:
+            self.loop_start = int(start_frame)
+            self.loop_end = int(end_frame)
+            position = self.position
+        if self.pcm is None:
+            # Streaming: drop what was decoded past the end, going back to the start if already there
+            self.seek_frame(self.loop_start if position >= self.loop_end else position)
+        return True
+
+    def clear_loop(self):
+        with self.position_lock:
+            looping = self.loop_end is not None
+            self.loop_start = self.loop_end = None
+            position = self.position
+        if looping and self.pcm is None:
+            self.seek_frame(position)  # the ring may already hold the next pass from the loop start
+
+    def finished(self):
+        """True once the song has played through to its real end"""
+        if self.loop_end is not None:
+            return False
+        pcm = self.pcm
+        if pcm is not None:
+            return pcm.complete and self.position >= pcm.length
+        return self.path is not None and self.eof and self.ring.available() == 0
+
+    def decoded_duration(self):
+        """Length of the song in seconds once decoding has reached its end, else None.
+
+        The duration load() returns is the container's estimate and can be
+        off by seconds.
+        """
+        pcm = self.pcm
+        if pcm is not None:
+            return pcm.length / self.rate if pcm.complete else None
+        return self.decoded_to / self.rate if self.path is not None and self.eof else None
+
+    def stop(self):
+        self.paused = True
+        with self.source_lock:
+            old_source, self.source = self.source, None
+            self.path = None
+            with self.position_lock:
+                self.ring.clear()
+                self.pcm = None
+                self.loop_start = self.loop_end = None
+        if old_source:
+            old_source.close()
+
+    def position_frames(self):
+        """Frame of the song now leaving the speakers"""
+        return max(0, self.position - (0 if self.paused else self.output_latency_frames))
+
+    def add_input_queue(self, input_queue):
+        """Receive every captured input block, tagged with the song frame it lines up with"""
+        self.input_queues.append(input_queue)
+
+    def remove_input_queue(self, input_queue):
+        if input_queue in self.input_queues:
+            self.input_queues.remove(input_queue)
+
+    def play_test_signal(self, frames, input_queue=None):
+        """Play int16 frames in place of the song.
+
+        Input captured meanwhile is tagged with the signal's frame, and also
+        goes to input_queue, which gets no blocks from before the signal.
+        """
+        self.test_position = 0
+        self.test_queue = input_queue
+        self.test_signal = frames  # last, so the callback never sees the signal half set up
+
+    def device_key(self):
+        """Identifies the devices and buffering a latency measurement applies to"""
+        try:
+            output = self.audio.get_default_output_device_info()["name"]
+            source = self.audio.get_default_input_device_info()["name"] if self.has_input else "none"
+        except Exception:
+            output = source = "default"
+        return f"{output}|{source}|{self.rate}|{self.frames_per_buffer}"
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        test_signal = self.test_signal
+        if test_signal is not None:
+            if in_data is not None:
+                if self.test_queue is not None:
+                    self.test_queue.put((in_data, self.test_position))
+                for input_queue in self.input_queues:
+                    input_queue.put((in_data, self.test_position))
+            frames = test_signal[self.test_position:self.test_position + frame_count]
+            self.test_position += frame_count
+            if self.test_position >= len(test_signal):
+                self.test_signal = None
+            if len(frames) < frame_count:
+                frames = np.concatenate([frames, np.zeros((frame_count - len(frames), self.channels), np.int16)])
+            return frames.tobytes(), self.continue_flag
+        if in_data is not None:
+            for input_queue in self.input_queues:
+                input_queue.put((in_data, self.position_frames()))
+        if self.paused:
+            return bytes(frame_count * self.channels * 2), self.continue_flag
+        with self.position_lock:
+            if self.pcm is not None:
+                frames = self._read_cached(frame_count)
+            else:
+                frames = self.ring.read(frame_count)
+                self.position += len(frames)
+                if self.loop_end is not None and self.position >= self.loop_end:
+                    self.position -= self.loop_end - self.loop_start  # the decoder wrapped at the same frame
+        if len(frames) < frame_count:
+            frames = np.concatenate([frames, np.zeros((frame_count - len(frames), self.channels), np.int16)])
+        if self.gain != 1.0:
+            frames = np.clip(frames * self.gain, -32768, 32767).astype(np.int16)
+        return frames.tobytes(), self.continue_flag
+
+    def _read_cached(self, frame_count):
+        """Copy frames straight out of the mapped PCM, wrapping at the loop end. Holds position_lock"""
+        parts = []
+        needed = frame_count
+        loop_end = self.loop_end
+        if loop_end is not None and self.pcm.complete:
+            loop_end = min(loop_end, self.pcm.length)  # the end may be past the real end of the song
+        while needed > 0:
+            if loop_end is not None and self.position >= loop_end:
+                self.position = self.loop_start
+            limit = self.pcm.filled
+            if loop_end is not None:
+                limit = min(limit, loop_end)
+            take = min(needed, limit - self.position)
+            if take <= 0:
+                break  # past the end, or ahead of the background decoder
+            parts.append(self.pcm.frames[self.position:self.position + take])
+            self.position += take
+            needed -= take
+        if not parts:
+            return np.zeros((0, self.channels), np.int16)
+        return np.concatenate(parts)
+
+    def _decode_loop(self):
+        block = self.frames_per_buffer * 4
+        while self.running:
+            with self.source_lock:
+                if self.path and self.source is None and not self.eof:
+                    self.source = StreamingSource(self.path, self.rate, self.channels, self.decoded_to)
+                source = self.source
+            if source is None or self.ring.space() < block:
+                self.wakeup.wait(0.01)
+                self.wakeup.clear()
+                continue
+            frames = source.read(block)
+            with self.source_lock:
+                if source is not self.source:
+                    continue  # a seek replaced the source while we were reading
+                with self.position_lock:
+                    loop_start, loop_end = self.loop_start, self.loop_end
+                    if loop_end is not None and len(frames) == 0:
+                        # The loop ends past the real end of the song: end it here instead
+                        loop_end = self.loop_end = self.decoded_to
+                    wrap = loop_end is not None and self.decoded_to + len(frames) >= loop_end
+                    if wrap:
+                        frames = frames[:max(0, loop_end - self.decoded_to)]
+                    self.ring.write(frames)
+                self.decoded_to += len(frames)
+                if wrap:
+                    # Carry on decoding from the loop start, right behind the loop end in the ring
+                    source.close()
+                    self.source = None
+                    self.decoded_to = loop_start
+                elif len(frames) == 0:
+                    source.close()
+                    self.source = None
+                    self.eof = True
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.stop()
+        if self.decoder_thread:
+            self.decoder_thread.join()
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+        if self.audio:
+            self.audio.terminate()
+        if self.pcm_cache:
+            self.pcm_cache.close()
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+from .dsp import decode_pcm, stft, to_mono
+from .fingerprint import content_hash
+
+RATE = 22050
+FPS = 30  # envelope frames per second
+N_FFT = 2048
+HOP = RATE // FPS
+BANDS = 16
+LOW_HZ = 40.0
+HIGH_HZ = 10000.0
+FLOOR_DB = -60.0
+MIN_BPM = 60
+MAX_BPM = 180
+CACHE_DIR = ".envelope"
+
+
+def envelope_path(mp3_path, song_hash):
+    """Cache location for a song's envelope, next to the original"""
+    return os.path.join(os.path.dirname(mp3_path), CACHE_DIR, f"{song_hash}.npy")
+
+
+def band_edges():
+    """FFT bin boundaries of BANDS log-spaced bands between LOW_HZ and HIGH_HZ"""
+    freqs = np.geomspace(LOW_HZ, HIGH_HZ, BANDS + 1)
+    edges = np.round(freqs * N_FFT / RATE).astype(int)
+    # Keep every band at least one bin wide at the low end
+    return np.maximum.accumulate(np.maximum(edges, np.arange(BANDS + 1) + 1))
+
+
+def beat_counts(onset):
+    """Beats elapsed at each frame, from the strongest periodicity of the onset curve"""
+    count = len(onset)
+    onset = onset - onset.mean()
+    min_lag = int(FPS * 60 / MAX_BPM)
+    max_lag = int(FPS * 60 / MIN_BPM)
+    if count < 2 * max_lag:
+        return np.zeros(count, dtype=np.int64)
+    size = 1 << int(np.ceil(np.log2(2 * count)))
+    spectrum = np.fft.rfft(onset, size)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum), size)[:max_lag + 1]
+    period = min_lag + int(np.argmax(autocorr[min_lag:max_lag + 1]))
+    # Phase with the most onset energy on the beat grid
+    usable = count // period * period
+    phase = int(np.argmax(onset[:usable].reshape(-1, period).sum(axis=0)))
+    frames = np.arange(count)
+    return np.maximum(0, (frames - phase) // period + 1)
+
+
+def compute_envelope(samples, rate=RATE):
+    """Per-frame band levels and beat count, as uint8 shaped (frames, BANDS + 1).
+
+    Columns 0..BANDS-1 are band levels scaled 0-255 over FLOOR_DB dB below
+    the song's loudest band. The last column is the beat count modulo 256.
+    """
+    power = np.abs(stft(to_mono(samples), N_FFT, HOP)) ** 2
+    edges = band_edges()
+    bands = np.add.reduceat(power, edges[:-1], axis=1)[:, :BANDS] + 1e-12
+    db = 10 * np.log10(bands / bands.max())
+    levels = np.clip((db - FLOOR_DB) / -FLOOR_DB * 255, 0, 255)
+    # Onsets: summed rises in band energy
+    onset = np.maximum(np.diff(db, axis=0, prepend=db[:1]), 0).sum(axis=1)
+    beats = beat_counts(onset) % 256
+    return np.column_stack([levels, beats]).astype(np.uint8)
+
+
+def render_envelope(mp3_path):
+    """Worker: compute and cache a song's envelope. Returns (content_hash, path)"""
+    song_hash = content_hash(mp3_path)
+    out_path = envelope_path(mp3_path, song_hash)
+    if os.path.exists(out_path):
+        return song_hash, out_path
+    envelope = compute_envelope(decode_pcm(mp3_path, RATE, 1))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = out_path + ".part"
+    with open(temp_path, 'wb') as f:
+        np.save(f, envelope)
+    os.replace(temp_path, out_path)
+    return song_hash, out_path
+
+
+def cached_envelope(mp3_path, entry):
+    """Path of an already computed envelope for an indexed song, or None"""
+    if not entry or "content_hash" not in entry:
+        return None
+    path = envelope_path(mp3_path, entry["content_hash"])
+    return path if os.path.exists(path) else None
+
+
+def load_envelope(path):
+    """Memory-mapped envelope, read a row at a time during playback. None if unreadable"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except Exception:
+        return None  # the visualizer falls back to its idle animation
+
+
+def envelope_frame(envelope, seconds):
+    """Row of the envelope at a song time, or None outside it"""
+    index = int(seconds * FPS)
+    if index < 0 or index >= len(envelope):
+        return None
+    return envelope[index]
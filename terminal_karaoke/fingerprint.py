@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import os
+from collections import deque
+import numpy as np
+from .dsp import decode_pcm, frame_signal, to_mono
+from .jobs import run_parallel
+
+FINGERPRINT_RATE = 5512
+FINGERPRINT_SECONDS = 120
+FRAME_SIZE = 2048
+HOP = 1024
+BAND_EDGES = np.geomspace(300, 2000, 18)  # 17 bands -> 16 bits per frame
+MAX_OFFSET = 10.0  # seconds of intro difference tolerated when comparing
+MAX_SHIFT = int(MAX_OFFSET * FINGERPRINT_RATE / HOP)  # the same, in frames
+MIN_OVERLAP = int(20 * FINGERPRINT_RATE / HOP)  # frames two songs must share at a shift
+NEAR_THRESHOLD = 0.8
+DURATION_TOLERANCE = MAX_OFFSET
+# Bit frames per stored fingerprint, and an FFT long enough to correlate two without wrapping
+MAX_FRAMES = (FINGERPRINT_RATE * FINGERPRINT_SECONDS - FRAME_SIZE) // HOP
+CORRELATION_SIZE = 1 << (2 * MAX_FRAMES).bit_length()
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """SHA-1 of the file bytes"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_fingerprint(samples, rate=FINGERPRINT_RATE):
+    """Bit signature of band-energy changes over time, as base64 of packed uint16 frames"""
+    samples = samples[:rate * FINGERPRINT_SECONDS]
+    frames = frame_signal(samples, FRAME_SIZE, HOP) * np.hanning(FRAME_SIZE)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / rate)
+    band_of_bin = np.digitize(freqs, BAND_EDGES) - 1
+    valid = (band_of_bin >= 0) & (band_of_bin < len(BAND_EDGES) - 1)
+    energy = np.zeros((len(frames), len(BAND_EDGES) - 1))
+    np.add.at(energy.T, band_of_bin[valid], power[:, valid].T)
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    packed = np.packbits(bits, axis=1).view('>u2').ravel()
+    return base64.b64encode(packed.tobytes()).decode('ascii')
+
+
+def fingerprint_bits(fingerprint):
+    """Unpack a stored fingerprint to a (frames, 16) bool array"""
+    packed = np.frombuffer(base64.b64decode(fingerprint), dtype='>u2')
+    return np.unpackbits(packed.view(np.uint8).reshape(-1, 2), axis=1).astype(bool)
+
+
+def fingerprint_spectrum(fingerprint):
+    """Decode a stored fingerprint once for similarity(): (frames, spectrum of its bits as +-1)"""
+    signs = np.where(fingerprint_bits(fingerprint)[:MAX_FRAMES], 1.0, -1.0)
+    return len(signs), np.fft.rfft(signs, CORRELATION_SIZE, axis=0)
+
+
+def similarity(spectrum_a, spectrum_b, max_shift=MAX_SHIFT):
+    """Fraction of matching bits at the best alignment within max_shift frames; ~0.5 for unrelated songs.
+
+    Takes fingerprint_spectrum() results. One cross-correlation scores
+    every shift: with bits as +-1, the sum of products over an overlap is
+    matches minus mismatches.
+    """
+    length_a, a = spectrum_a
+    length_b, b = spectrum_b
+    correlation = np.fft.irfft((a * np.conj(b)).sum(axis=1), CORRELATION_SIZE)
+    shifts = np.arange(-max_shift, max_shift + 1)
+    # A positive shift lines a[shift:] up with b, a negative one a with b[-shift:]
+    overlap = np.minimum(length_a - np.maximum(shifts, 0), length_b - np.maximum(-shifts, 0))
+    usable = overlap >= min(MIN_OVERLAP, max(1, min(length_a, length_b) // 2))
+    if not usable.any():
+        return 0.0
+    agreement = (correlation[shifts[usable] % CORRELATION_SIZE] / (overlap[usable] * a.shape[1]) + 1) / 2
+    return float(agreement.max())
+
+
+def fingerprint_song(mp3_path):
+    """Worker: content hash, audio fingerprint and duration of one file"""
+    samples = to_mono(decode_pcm(mp3_path, FINGERPRINT_RATE, 1))
+    return {
+        "content_hash": content_hash(mp3_path),
+        "fingerprint": compute_fingerprint(samples),
+        "duration": len(samples) / FINGERPRINT_RATE,
+    }
+
+
+def fingerprint_library(index, workers=None, progress=None):
+    """Fingerprint every indexed song that does not have one yet"""
+    index.scan()
+    pending = set(index.missing("content_hash")) | set(index.missing("fingerprint"))
+    for mp3_path, result in run_parallel(fingerprint_song, sorted(pending), workers, progress):
+        if result:
+            index.update(mp3_path, **result)
+
+
+def find_duplicates(index):
+    """Group songs by identical content or matching fingerprints.
+
+    Returns a list of (survivor, duplicates, exact) tuples where exact is
+    True when every duplicate has the same bytes as the survivor.
+    """
+    entries = {path: entry for path, entry in index.entries.items() if "fingerprint" in entry}
+    parent = {path: path for path in entries}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    by_hash = {}
+    for path, entry in entries.items():
+        by_hash.setdefault(entry["content_hash"], []).append(path)
+    for paths in by_hash.values():
+        for other in paths[1:]:
+            union(paths[0], other)
+
+    # Only songs of similar length can be near-duplicates, so compare within a sliding window.
+    # Spectra are decoded as songs enter it and dropped as they leave, so memory
+    # follows the window rather than the library
+    window = deque()  # (path, spectrum) of shorter songs still within DURATION_TOLERANCE
+    for path in sorted(entries, key=lambda path: entries[path]["duration"]):
+        duration = entries[path]["duration"]
+        while window and duration - entries[window[0][0]]["duration"] > DURATION_TOLERANCE:
+            window.popleft()
+        spectrum = fingerprint_spectrum(entries[path]["fingerprint"])
+        for other, other_spectrum in window:
+            if find(path) != find(other) and similarity(other_spectrum, spectrum) >= NEAR_THRESHOLD:
+                union(path, other)
+        window.append((path, spectrum))
+
+    groups = {}
+    for path in entries:
+        groups.setdefault(find(path), []).append(path)
+
+    result = []
+    for paths in groups.values():
+        if len(paths) < 2:
+            continue
+        paths.sort(key=lambda path: (entries[path].get("added", 0), len(path)))
+        survivor, duplicates = paths[0], paths[1:]
+        exact = all(entries[d]["content_hash"] == entries[survivor]["content_hash"] for d in duplicates)
+        result.append((survivor, duplicates, exact))
+    return result
+
+
+def merge_duplicates(groups, index, playlist_manager):
+    """Point playlist entries at each group's survivor and delete byte-identical copies"""
+    freed = 0
+    for survivor, duplicates, _ in groups:
+        survivor_song = (survivor, index.get(survivor)["lrc_path"])
+        for duplicate in duplicates:
+            duplicate_song = (duplicate, index.get(duplicate)["lrc_path"])
+            for name, playlist in playlist_manager.playlists.items():
+                if playlist.replace_song(duplicate_song, survivor_song):
+                    playlist_manager.mark_dirty(name)
+            if index.get(duplicate)["content_hash"] == index.get(survivor)["content_hash"]:
+                freed += index.get(duplicate).get("size", 0)
+                for path in duplicate_song:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                index.remove(duplicate)
+    return freed
+
+
+def run_dedupe(library_path, merge=False):
+    """Command line entry point: fingerprint the library and report or merge duplicates"""
+    from .library import LibraryIndex
+    from .persistence import PersistenceService
+    from .playlist import PlaylistManager
+
+    # Batch index writes; saving on every update rewrites the whole file per song
+    persistence = PersistenceService()
+    index = LibraryIndex(library_path, persistence)
+
+    def progress(done, total):
+        print(f"\rFingerprinting {done}/{total}", end="", flush=True)
+
+    try:
+        fingerprint_library(index, progress=progress)
+        print()
+        groups = find_duplicates(index)
+        if not groups:
+            print("No duplicates found")
+            return
+        for survivor, duplicates, exact in groups:
+            kind = "exact" if exact else "similar"
+            print(f"{os.path.basename(survivor)} ({kind})")
+            for duplicate in duplicates:
+                print(f"    {os.path.basename(duplicate)}")
+        if merge:
+            playlist_manager = PlaylistManager(library_path, persistence)
+            freed = merge_duplicates(groups, index, playlist_manager)
+            print(f"Merged {len(groups)} groups, freed {freed / (1 << 20):.1f} MB")
+    finally:
+        persistence.close()
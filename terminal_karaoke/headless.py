@@ -0,0 +1,193 @@
+import json
+import os
+import time
+import curses
+from .envelope import envelope_frame, load_envelope
+from .layout import CONTROLS
+from .lyrics import LyricsParser, current_line_index
+from .melody import load_melody
+from .pitch import LineScorer
+from .profiling import FrameProfiler, PhaseStats
+from .render import MemoryScreen
+from .text import TextLine
+from .ui import UI
+
+SEEK_STEP = 5.0
+
+
+class SimulatedClock:
+    """Stands in for time.time so frames land at exact, repeatable times"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class HeadlessSession:
+    """A playback session drawn by the real UI into a MemoryScreen, with no audio or TTY.
+
+    Holds the player state the UI reads and advances the song on a
+    simulated clock, one frame at a time. Every frame's draw time, writes
+    and estimated terminal bytes are collected, and frames can be compared
+    against golden snapshots.
+    """
+
+    def __init__(self, lrc_path, size=(24, 80), fps=30, keys=(), song_path=None,
+                 envelope_path=None, melody_path=None, total_time=None,
+                 link_rate=None, low_bandwidth=False):
+        self.clock = SimulatedClock()
+        self.screen = MemoryScreen(size[0], size[1], keys=keys, clock=self.clock, link_rate=link_rate)
+        self.ui = UI(self.screen, clock=self.clock, low_bandwidth=low_bandwidth)
+        self.frame_time = 1.0 / fps
+
+        self.song_path = song_path or os.path.splitext(lrc_path)[0] + ".mp3"
+        self.lyrics = LyricsParser().parse(lrc_path)
+        self.lyric_lines = [TextLine(text) for _, text in self.lyrics]
+        last = self.lyrics[-1][0] if self.lyrics else 0.0
+        self.total_time = total_time or last + 5.0
+        self.audio_tempo = 1.0
+        self.melody = load_melody(melody_path) if melody_path else None
+        self.envelope = load_envelope(envelope_path) if envelope_path else None
+        self.position = 0.0
+        self.paused = False
+        self.current_line_idx = 0
+        self.playlist_mode = False
+        self.current_playlist = None
+        self.controls = dict(CONTROLS)
+        self.is_recording = False
+        self.status_message = ""
+        self.status_timer = 0
+        self.analyzer = None
+        self.line_scorer = LineScorer()
+        self.profiler = FrameProfiler()
+
+        self.draw_ns = PhaseStats()
+        self.writes = PhaseStats(unit=1)
+        self.bytes = PhaseStats(unit=1)
+        self.changed = PhaseStats(unit=1)
+        self.skipped = 0
+
+    # What UI.draw asks a player for
+    def display_time(self):
+        return self.position
+
+    def envelope_frame(self):
+        if self.envelope is None:
+            return None
+        return envelope_frame(self.envelope, self.position * self.audio_tempo)
+
+    def set_status(self, message, duration=2):
+        self.status_message = message
+        self.status_timer = self.clock() + duration
+
+    def handle_input(self, key):
+        if key == ord('p'):
+            self.paused = not self.paused
+            self.set_status("Paused" if self.paused else "Playing", 1)
+        elif key in (curses.KEY_LEFT, curses.KEY_RIGHT):
+            step = SEEK_STEP if key == curses.KEY_RIGHT else -SEEK_STEP
+            self.position = max(0.0, min(self.total_time, self.position + step))
+            self.set_status(f"Seek → {self.ui.format_time(self.position)}", 1)
+        elif key == curses.KEY_RESIZE:
+            self.ui.invalidate_layout()
+
+    def step(self):
+        """Handle due keys, advance one frame and draw it"""
+        urgent = False
+        while True:
+            key = self.screen.getch()
+            if key == -1:
+                break
+            self.handle_input(key)
+            urgent = True
+        self.clock.advance(self.frame_time)
+        if not self.paused:
+            self.position = min(self.total_time, self.position + self.frame_time)
+        self.current_line_idx = current_line_index(self.lyrics, self.position)
+        frame = self.envelope_frame()
+        self.ui.update_animation(self.clock(), None if frame is None else int(frame[-1]))
+
+        drawn = len(self.screen.frames)
+        started = time.perf_counter_ns()
+        self.ui.draw(self, urgent=urgent)
+        self.draw_ns.add(time.perf_counter_ns() - started)
+        if len(self.screen.frames) == drawn:
+            self.skipped += 1  # throttled by the render governor
+            return
+        stats = self.screen.frames[-1]
+        self.writes.add(stats["writes"])
+        self.bytes.add(stats["bytes"])
+        self.changed.add(stats["changed"])
+
+    def run(self, seconds=None):
+        """Play for seconds of song time, or to the end. Returns the report"""
+        end = self.total_time if seconds is None else min(self.total_time, self.position + seconds)
+        while self.position < end:
+            self.step()
+        return self.report()
+
+    def report(self):
+        height, width = self.screen.getmaxyx()
+        return {
+            "size": [height, width],
+            "frames": self.draw_ns.count,
+            "frames_skipped": self.skipped,
+            "frames_at_level": self.ui.governor.frames_at_level,
+            "draw_us": self.draw_ns.summary(),
+            "writes": self.writes.summary(scale=1),
+            "changed_cells": self.changed.summary(scale=1),
+            "bytes": self.bytes.summary(scale=1),
+        }
+
+    def snapshot(self):
+        """The screen as last drawn, with the song time it shows"""
+        return {
+            "time": round(self.position, 3),
+            "text": self.screen.text(),
+            "attrs": self.screen.attr_runs(),
+        }
+
+    def snapshots(self, times):
+        """Play to each song time in turn and snapshot the frame drawn there"""
+        shots = []
+        for target in sorted(times):
+            while self.position < target and self.position < self.total_time:
+                self.step()
+            shots.append(self.snapshot())
+        return shots
+
+    def check_golden(self, path, times=None):
+        """Compare frames against the golden file at path, writing it if absent.
+
+        Snapshots are taken halfway through every lyric line unless times
+        is given. Returns the song times whose frames differ.
+        """
+        if times is None:
+            starts = [timestamp for timestamp, _ in self.lyrics]
+            times = [(a + b) / 2 for a, b in zip(starts, starts[1:] + [self.total_time])]
+        shots = self.snapshots(times)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                golden = json.load(f)
+        except FileNotFoundError:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(shots, f, indent=1, ensure_ascii=False)
+            print(f"Wrote {len(shots)} golden frames to {path}")
+            return []
+        expected = {shot["time"]: shot for shot in golden}
+        return [shot["time"] for shot in shots if expected.get(shot["time"]) != shot]
+
+
+def run_headless(lrc_path, golden_path=None, low_bandwidth=False):
+    """Command line entry point: play a song's lyrics headlessly and print the draw report"""
+    session = HeadlessSession(lrc_path, low_bandwidth=low_bandwidth)
+    if golden_path:
+        differing = session.check_golden(golden_path)
+        for seconds in differing:
+            print(f"Frame at {seconds:.2f}s differs from {golden_path}")
+    print(json.dumps(session.run(), indent=2))
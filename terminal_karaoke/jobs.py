@@ -0,0 +1,125 @@
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import wait as futures_wait
+
+IO_WORKERS = 4  # the three startup warm-ups and a download; takes and exports queue behind them
+
+
+def default_workers():
+    """Leave one core for the UI and audio threads"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def run_parallel(func, items, workers=None, progress=None, on_error=print):
+    """Map func over items in a process pool, yielding (item, result) as each finishes.
+
+    func must be a module-level function so it can be pickled. Items whose
+    call raises yield a result of None and are reported to on_error.
+    progress(done, total) is called after every item.
+    """
+    items = list(items)
+    total = len(items)
+    if not total:
+        return
+    with ProcessPoolExecutor(max_workers=workers or default_workers()) as pool:
+        futures = {pool.submit(func, item): item for item in items}
+        for done, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                on_error(f"Error processing {item}: {e}")
+                result = None
+            if progress:
+                progress(done, total)
+            yield item, result
+
+
+class BackgroundJobs:
+    """Process pool for work started from the player loop.
+
+    Jobs are de-duplicated by key. Completion callbacks are queued and run
+    by poll() on the caller's thread, so they may touch player state.
+    Network-bound work that does not pickle, and startup warm-up, runs on
+    a small thread pool through submit_io instead. Failed jobs, and errors
+    sent to report() from any thread, reach on_error from poll() too.
+    """
+
+    def __init__(self, workers=None, on_error=print):
+        self.workers = workers or default_workers()
+        self.on_error = on_error
+        self.pool = None
+        self.io_pool = None
+        self.running = {}  # key -> future
+        self.finished = queue.SimpleQueue()
+
+    def submit(self, key, func, arg, on_done=None):
+        """Run func(arg) in the pool unless a job with key is already running"""
+        if key in self.running:
+            return self.running[key]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self.pool.submit(func, arg)
+        self.running[key] = future
+        future.add_done_callback(lambda f: self.finished.put((key, f, on_done)))
+        return future
+
+    def submit_io(self, key, func, arg, on_done=None):
+        """Like submit, but on a worker thread, for downloads and other waiting on the network"""
+        if key in self.running:
+            return self.running[key]
+        if self.io_pool is None:
+            self.io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS)
+        future = self.io_pool.submit(func, arg)
+        self.running[key] = future
+        future.add_done_callback(lambda f: self.finished.put((key, f, on_done)))
+        return future
+
+    def post(self, func, *args):
+        """Run func(*args) from the next poll, for worker threads reporting progress"""
+        self.finished.put((None, None, lambda result: func(*args)))
+
+    def report(self, message):
+        """Hand an error message to on_error from the next poll. Safe from any thread"""
+        self.post(self.on_error, message)
+
+    def is_running(self, key):
+        return key in self.running
+
+    def wait(self, key, timeout=None):
+        """Block until the job with key is done, if one is running. Its callback still runs from poll"""
+        future = self.running.get(key)
+        if future is not None:
+            futures_wait([future], timeout)
+
+    def poll(self):
+        """Run callbacks for jobs that finished since the last call"""
+        while True:
+            try:
+                key, future, on_done = self.finished.get_nowait()
+            except queue.Empty:
+                return
+            if future is None:
+                on_done(None)
+                continue
+            self.running.pop(key, None)
+            error = None
+            try:
+                result = future.result()
+            except Exception as e:
+                error = f"Background job {key} failed: {e}"
+                result = None
+            if on_done:
+                on_done(result)
+            if error:
+                self.on_error(error)  # after on_done, so its status doesn't hide the error
+
+    def shutdown(self):
+        """Drop queued jobs and let running ones finish in the background"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        if self.io_pool is not None:
+            self.io_pool.shutdown(wait=False, cancel_futures=True)
+            self.io_pool = None
@@ -0,0 +1,118 @@
+import json
+import os
+import queue
+import time
+import numpy as np
+from .persistence import atomic_write_json
+
+CHIRP_SECONDS = 0.5
+LISTEN_SECONDS = 1.5  # chirp plus room for the round trip
+CHIRP_LOW = 200.0
+CHIRP_HIGH = 8000.0
+ATTEMPTS = 3
+MIN_CONFIDENCE = 20.0  # correlation peak over the spread of the rest; noise alone reaches about 10
+
+
+def make_chirp(rate, channels, seconds=CHIRP_SECONDS):
+    """Exponential sine sweep with faded ends, as int16 frames followed by silence"""
+    t = np.arange(int(seconds * rate)) / rate
+    ratio = np.log(CHIRP_HIGH / CHIRP_LOW)
+    sweep = np.sin(2 * np.pi * CHIRP_LOW * seconds / ratio * (np.exp(t / seconds * ratio) - 1))
+    fade = np.minimum(1.0, np.minimum(t, seconds - t) / 0.01)
+    signal = np.zeros(int(LISTEN_SECONDS * rate))
+    signal[:len(sweep)] = sweep * fade * 0.5
+    return (np.repeat(signal[:, None], channels, axis=1) * 32767).astype(np.int16)
+
+
+def find_delay(reference, recorded, max_lag):
+    """Lag in [0, max_lag] at which reference best lines up inside recorded.
+
+    Uses one FFT correlation. Returns (lag, confidence), where confidence
+    is the peak's distance from the median in units of the median
+    absolute deviation.
+    """
+    reference = reference - reference.mean()
+    recorded = recorded - recorded.mean()
+    size = 1 << int(np.ceil(np.log2(len(reference) + len(recorded))))
+    corr = np.fft.irfft(np.fft.rfft(recorded, size) * np.conj(np.fft.rfft(reference, size)), size)
+    corr = np.abs(corr[:max_lag + 1])
+    lag = int(np.argmax(corr))
+    median = np.median(corr)
+    spread = np.median(np.abs(corr - median)) + 1e-12
+    return lag, float((corr[lag] - median) / spread)
+
+
+def measure_round_trip(engine, attempts=ATTEMPTS):
+    """Frames from writing a chirp to hearing it back on the input, median of a few tries.
+
+    Needs the microphone to hear the speakers. Returns None if the chirp
+    could not be found.
+    """
+    chirp = make_chirp(engine.rate, engine.channels)
+    reference = chirp[:int(CHIRP_SECONDS * engine.rate), 0].astype(np.float32)
+    delays = []
+    for _ in range(attempts):
+        # Handed over with the chirp, so every block it gets was captured while the chirp played
+        input_queue = queue.SimpleQueue()
+        engine.play_test_signal(chirp, input_queue)
+        while engine.test_signal is not None:
+            time.sleep(0.05)
+        blocks = []
+        while True:
+            try:
+                blocks.append(input_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not blocks:
+            continue
+        first_frame = blocks[0][1]
+        recorded = np.frombuffer(b''.join(data for data, _ in blocks), dtype='<i2')
+        recorded = recorded.reshape(-1, engine.channels).mean(axis=1).astype(np.float32)
+        lag, confidence = find_delay(reference, recorded, len(recorded) - len(reference))
+        if confidence >= MIN_CONFIDENCE:
+            delays.append(first_frame + lag)
+        time.sleep(0.2)  # let the room go quiet
+    if not delays:
+        return None
+    return int(np.median(delays))
+
+
+def load_latency(path, device_key):
+    """Stored round trip in frames for a device, or None if never calibrated"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get(device_key)
+    except Exception:
+        return None
+
+
+def save_latency(path, device_key, frames):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    data[device_key] = frames
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write_json(path, data)
+
+
+def run_calibration(latency_path, profile="balanced"):
+    """Command line entry point: measure and store this machine's recording latency"""
+    from .engine import AudioEngine
+
+    engine = AudioEngine(profile=profile)
+    engine.start()
+    try:
+        if not engine.has_input:
+            print("No microphone input available; nothing to calibrate")
+            return
+        print("Calibrating: turn the speakers up so the microphone can hear them...")
+        frames = measure_round_trip(engine)
+        if frames is None:
+            print("Could not hear the test sweep. Check that the microphone can hear the speakers.")
+            return
+        save_latency(latency_path, engine.device_key(), frames)
+        print(f"Round-trip latency {frames / engine.rate * 1000:.1f} ms, saved for {engine.device_key()}")
+    finally:
+        engine.close()
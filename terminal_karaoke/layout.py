@@ -0,0 +1,137 @@
+import os
+from .melody import FPS, melody_strip
+from .text import center_x, display_width
+
+TITLE = " TERMINAL KARAOKE "
+REC_INDICATOR = " [●REC] "
+EMPTY_MESSAGE = "Load .mp3 and .lrc files to start"
+BOTTOM_ROWS = 5  # meter, progress time, bar, spare and controls below the lyrics
+
+# Keys shown along the bottom of the player
+CONTROLS = {
+    'p': "Pause/Play",
+    '←': "Back 5s",
+    '→': "Forward 5s",
+    'n': "Next Song",
+    'b': "Previous Song",
+    's': "Toggle Shuffle",
+    'v': "Vocals On/Off",
+    '+/-': "Key",
+    '[/]': "Tempo",
+    'l': "A-B Loop",
+    'm': "Mic Meter",
+    'r': "Record Take",
+    'e': "Export Mix",
+    'o': "Menu",
+    'q': "Quit"
+}
+
+
+def layout_key(size, player):
+    """Everything a Layout depends on; the layout is rebuilt only when this changes"""
+    playlist = None
+    if player.playlist_mode and player.current_playlist:
+        p = player.current_playlist
+        playlist = (p.name, p.current_index, len(p), p.shuffle_mode)
+    return (size, player.song_path, id(player.lyrics), player.current_line_idx,
+            player.total_time, playlist)
+
+
+class Layout:
+    """Positions and fixed strings of the main screen for one terminal size, song and line.
+
+    Built once per key change so the draw loop only emits precomputed text
+    at precomputed coordinates.
+    """
+
+    def __init__(self, size, player, visible_lines, bar_width, cat_frames):
+        height, width = size
+        self.height = height
+        self.width = width
+        self.title_x = center_x(TITLE, width)
+
+        self.playlist_info = None
+        if player.playlist_mode and player.current_playlist:
+            playlist = player.current_playlist
+            shuffle_icon = "🔀 " if playlist.shuffle_mode else ""
+            text = f"{shuffle_icon}Playlist: {playlist.name} [{playlist.current_index + 1}/{len(playlist)}]"
+            self.playlist_info = (center_x(text, width), text)
+            self.song_y = 2
+        else:
+            self.song_y = 1
+        self.song_text = f"Song: {os.path.basename(player.song_path)}" if player.song_path else None
+        self.rec_x = width - display_width(REC_INDICATOR) - 2
+        self.status_y = self.song_y + 1
+        self.lyrics_bottom = height - BOTTOM_ROWS  # rows from here down belong to the footer
+        self.visualizer_y = self.song_y + 2 if self.song_y + 2 < self.lyrics_bottom else None
+
+        self.lyric_rows = []  # (y, x, text, role) with role "past" or "future"
+        # Rows of the line being sung as (y, x, TextLine, cells of the line before it),
+        # with the line's start and end times and total width for the highlight wipe
+        self.current_rows = []
+        self.current_times = (0.0, 0.0)
+        self.current_width = 0
+        self.cat_rows = []  # (y, index of the frame's row)
+        self.cat_x = 0
+        self.melody_y = None
+        self.melody_key = None  # (contour, frame, width) the cached strip was drawn for
+        self.melody_text = ""
+        self.empty_message = (center_x(EMPTY_MESSAGE, width), height // 2)
+        if player.lyrics:
+            self._place_lyrics(player, visible_lines, cat_frames)
+
+        self.meter_y = height - 5
+        self.bar_width = max(0, min(bar_width, width - 3))
+        self.bar_x = (width - self.bar_width) // 2
+        self.bar_y = height - 3
+        self.time_y = self.bar_y - 1
+        self.controls = " | ".join(f"<{k}> {v}" for k, v in player.controls.items())
+        self.controls_x = max(0, center_x(self.controls, width))
+        self.controls_y = height - 1
+
+    def melody_strip(self, contour, seconds, width):
+        """melody_strip at seconds, redrawn only when the contour frame or width changes"""
+        key = (id(contour), max(0, int(seconds * FPS)), width)
+        if key != self.melody_key:
+            self.melody_text = melody_strip(contour, seconds, width)
+            self.melody_key = key
+        return self.melody_text
+
+    def _place_lyrics(self, player, visible_lines, cat_frames):
+        lyrics = player.lyrics
+        current = player.current_line_idx
+        start_idx = max(0, current - (visible_lines // 2))
+        end_idx = min(len(lyrics), start_idx + visible_lines)
+        if end_idx - start_idx < visible_lines and start_idx > 0:
+            start_idx = max(0, end_idx - visible_lines)
+        # Long lines wrap onto extra rows; the window still counts lyric lines
+        wrap_width = self.width - 2
+        wrapped = [player.lyric_lines[i].wrap(wrap_width) for i in range(start_idx, end_idx)]
+        row_count = sum(len(rows) for rows in wrapped)
+        top = (self.height - row_count) // 2
+
+        y = top
+        for i, rows in zip(range(start_idx, end_idx), wrapped):
+            if i == current:
+                end = lyrics[i + 1][0] if i < len(lyrics) - 1 else player.total_time
+                self.current_times = (lyrics[i][0], end)
+                self.current_width = sum(row.width for row in rows)
+            before = 0
+            for row in rows:
+                if 0 < y < self.lyrics_bottom:
+                    x = (self.width - row.width) // 2
+                    if i == current:
+                        self.current_rows.append((y, x, row, before))
+                    else:
+                        self.lyric_rows.append((y, x, row.text, "past" if i < current else "future"))
+                before += row.width
+                y += 1
+
+        melody_y = top + row_count + 1
+        if 0 < melody_y < self.lyrics_bottom:
+            self.melody_y = melody_y
+
+        cat_lines = cat_frames[0]
+        cat_y = top - 4
+        self.cat_x = (self.width - max(len(l) for l in cat_lines)) // 2
+        self.cat_rows = [(cat_y + i, i) for i in range(len(cat_lines)) if 0 < cat_y + i < self.lyrics_bottom]
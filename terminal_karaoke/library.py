@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from .persistence import atomic_write_json
+
+# Fields derived from file content; dropped when the mp3 changes on disk
+CONTENT_FIELDS = ("content_hash", "fingerprint", "duration", "loudness", "peak")
+
+
+def parse_song_name(mp3_path):
+    """Artist and title from an 'Artist - Title.mp3' file name, when it has that shape"""
+    name = os.path.basename(mp3_path)[:-4]
+    if ' - ' in name:
+        artist, title = name.split(' - ', 1)
+        return {"artist": artist.strip(), "title": title.strip()}
+    return {}
+
+
+class LibraryIndex:
+    """Per-song metadata for the library, keyed by mp3 path"""
+
+    def __init__(self, library_path, persistence=None, load=True, on_error=print):
+        self.library_path = library_path
+        self.on_error = on_error
+        self.persistence = persistence
+        self.index_path = os.path.join(library_path, "library_index.json")
+        self.entries = {}  # mp3_path -> dict of fields
+        self.lock = threading.RLock()
+        self.listeners = []  # callables taking (event, mp3_path, entry)
+        self.loaded = False  # saving waits for the file to be read, so it is never overwritten
+        if load:
+            self.load()
+
+    def load(self):
+        """Read the index file if there is one.
+
+        May run on a worker thread while the index is in use; songs added
+        before it finishes are kept over their entries in the file.
+        """
+        data = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                self.on_error(f"Error loading library index: {e}")
+        with self.lock:
+            entries = data.get("songs", {})
+            early = bool(self.entries)
+            entries.update(self.entries)
+            self.entries = entries
+            self.loaded = True
+        if early:
+            self.mark_dirty()
+
+    def save(self):
+        """Write the index to disk now"""
+        with self.lock:
+            if not self.loaded:
+                return
+            data = {"songs": {path: dict(entry) for path, entry in self.entries.items()}}
+        atomic_write_json(self.index_path, data)
+
+    def mark_dirty(self):
+        """Queue a save on the persistence thread, or save now without one"""
+        if self.persistence is None:
+            self.save()
+        else:
+            self.persistence.mark_dirty("library_index", self.save)
+
+    def add_listener(self, listener):
+        """Call listener(event, mp3_path, entry) on every 'add', 'update' and 'remove'"""
+        self.listeners.append(listener)
+
+    def _notify(self, event, mp3_path, entry):
+        for listener in self.listeners:
+            listener(event, mp3_path, entry)
+
+    def get(self, mp3_path):
+        """Get the entry for a song, or None"""
+        return self.entries.get(mp3_path)
+
+    def songs(self):
+        """All indexed (mp3_path, lrc_path) pairs"""
+        with self.lock:
+            return [(path, entry["lrc_path"]) for path, entry in self.entries.items()]
+
+    def update(self, mp3_path, **fields):
+        """Merge fields into a song's entry"""
+        with self.lock:
+            entry = self.entries.get(mp3_path)
+            if entry is None:
+                return None
+            entry.update(fields)
+        self.mark_dirty()
+        self._notify("update", mp3_path, entry)
+        return entry
+
+    def add(self, mp3_path, lrc_path):
+        """Index a song, refreshing it if the file changed since it was indexed"""
+        try:
+            stat = os.stat(mp3_path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(mp3_path)
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+                return entry
+            if entry is None:
+                entry = {"added": time.time()}
+                entry.update(parse_song_name(mp3_path))
+                self.entries[mp3_path] = entry
+            for field in CONTENT_FIELDS:
+                entry.pop(field, None)
+            entry.update(lrc_path=lrc_path, size=stat.st_size, mtime=stat.st_mtime)
+        self.mark_dirty()
+        self._notify("add", mp3_path, entry)
+        return entry
+
+    def remove(self, mp3_path):
+        """Drop a song from the index"""
+        with self.lock:
+            entry = self.entries.pop(mp3_path, None)
+        if entry is not None:
+            self.mark_dirty()
+            self._notify("remove", mp3_path, entry)
+        return entry
+
+    def find_songs(self):
+        """Walk the library and subfolders for mp3 files that have lyrics"""
+        found = []
+        for root, dirs, files in os.walk(self.library_path):
+            dirs[:] = [d for d in dirs if d != "playlists" and not d.startswith('.')]
+            for file in files:
+                if file.lower().endswith('.mp3'):
+                    mp3_path = os.path.join(root, file)
+                    lrc_path = mp3_path[:-4] + '.lrc'
+                    if os.path.exists(lrc_path):
+                        found.append((mp3_path, lrc_path))
+        return found
+
+    def scan(self):
+        """Bring the index in line with the library folder. Returns (added, removed) paths"""
+        found = self.find_songs()
+        added = []
+        for mp3_path, lrc_path in found:
+            known = mp3_path in self.entries
+            before = self.entries.get(mp3_path, {}).get("mtime")
+            entry = self.add(mp3_path, lrc_path)
+            if entry is not None and (not known or entry.get("mtime") != before):
+                added.append(mp3_path)
+        present = {mp3_path for mp3_path, _ in found}
+        removed = [path for path in list(self.entries) if path not in present]
+        for path in removed:
+            self.remove(path)
+        return added, removed
+
+    def missing(self, field):
+        """Paths of songs that have no value for field yet"""
+        with self.lock:
+            return [path for path, entry in self.entries.items() if field not in entry]
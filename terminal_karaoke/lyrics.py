@@ -28,4 +28,16 @@ class LyricsParser:
         except Exception as e:
             print(f"Error parsing LRC: {str(e)}")
         lyrics.sort(key=lambda x: x[0])
-        return lyrics
\ No newline at end of file
+        return lyrics
+
+
+def current_line_index(lyrics, current_time):
+    """Index of the lyric line being sung at current_time, 0 before the first"""
+    for i in range(len(lyrics)):
+        if i < len(lyrics) - 1:
+            if current_time >= lyrics[i][0] and current_time < lyrics[i+1][0]:
+                return i
+        else:
+            if current_time >= lyrics[i][0]:
+                return i
+    return 0
@@ -1,29 +1,86 @@
+import argparse
 import curses
+import os
 import time
-from .player import KaraokePlayer
+from .engine import LATENCY_PROFILES
+from .render import CursesScreen
 
-def main(stdscr):
+def main(stdscr, args, started_at):
+    # Imported here so the tool modes below don't load the player
+    from .player import KaraokePlayer
     curses.curs_set(0)
     curses.noecho()
     curses.cbreak()
     stdscr.keypad(True)
-    player = KaraokePlayer(stdscr)
+    player = KaraokePlayer(CursesScreen(stdscr), latency_profile=args.latency, frame_stats_path=args.frame_stats,
+                           low_bandwidth=args.low_bandwidth, started_at=started_at)
     try:
         player.run()
     finally:
         player.cleanup()
 
+def parse_args():
+    parser = argparse.ArgumentParser(prog="terminal-karaoke", description="A terminal-based karaoke player")
+    parser.add_argument("--latency", choices=sorted(LATENCY_PROFILES), default="balanced",
+                        help="audio buffer size: lower is tighter sync, higher avoids dropouts")
+    parser.add_argument("--dedupe", choices=["report", "merge"],
+                        help="fingerprint the library and report duplicate songs, or merge them into playlists")
+    parser.add_argument("--instrumentals", action="store_true",
+                        help="render vocal-reduced versions of every library song and exit")
+    parser.add_argument("--melodies", action="store_true",
+                        help="extract reference melodies of every library song for scoring and exit")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="measure recording latency with a test sweep through the speakers and exit")
+    parser.add_argument("--frame-stats", nargs="?", const="frame_stats.json", metavar="PATH",
+                        help="time each phase of the main loop, show an FPS overlay and write statistics to PATH on exit")
+    parser.add_argument("--low-bandwidth", action="store_true",
+                        help="draw fewer frames, no cat and coarser highlighting, for slow SSH links")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="sample CPU and memory use all session and write a report to DIR "
+                             "(default: profiles/<date-time>)")
+    parser.add_argument("--headless", metavar="LRC",
+                        help="play a lyrics file into an in-memory screen and print draw time and output per frame")
+    parser.add_argument("--golden", metavar="PATH",
+                        help="with --headless, compare frames against golden snapshots in PATH, writing it if missing")
+    return parser.parse_args()
+
 def run():
-    print("Terminal Karaoke - Loading...")
-    print("Controls:")
-    print("  p: Pause/Play")
-    print("  ←: Back 5s")
-    print("  →: Forward 5s")
-    print("  r: Toggle Recording (saves to recordings/ folder)")
-    print("  q: Quit")
-    print("\nStarting in 2 seconds...")
-    time.sleep(2)
-    curses.wrapper(main)
+    started_at = time.perf_counter()
+    args = parse_args()
+    library_path = os.path.join(os.getcwd(), "library")
+    if args.dedupe:
+        from .fingerprint import run_dedupe
+        run_dedupe(library_path, merge=args.dedupe == "merge")
+        return
+    if args.instrumentals:
+        from .vocals import render_library_instrumentals
+        render_library_instrumentals(library_path)
+        return
+    if args.calibrate:
+        from .latency import run_calibration
+        run_calibration(os.path.join("recordings", "latency.json"), args.latency)
+        return
+    if args.headless:
+        from .headless import run_headless
+        run_headless(args.headless, args.golden, args.low_bandwidth)
+        return
+    if args.melodies:
+        from .melody import extract_library_melodies
+        extract_library_melodies(library_path)
+        return
+
+    profiler = None
+    if args.profile is not None:
+        from .profiling import SamplingProfiler
+        report_dir = args.profile or os.path.join("profiles", time.strftime("%Y%m%d-%H%M%S"))
+        profiler = SamplingProfiler(report_dir)
+        profiler.start()
+    try:
+        curses.wrapper(main, args, started_at)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            print(f"Profile written to {report_dir}")
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,151 @@
+import math
+import os
+import numpy as np
+from .dsp import decode_pcm, frame_signal
+from .fingerprint import content_hash
+from .jobs import run_parallel
+from .pitch import yin_frames
+from .vocals import VOCAL_BAND, band_stop, instrumental_path
+
+RATE = 22050
+FPS = 50  # contour frames per second
+WINDOW = 1024
+BATCH = 512  # frames analysed per vectorised step, bounds memory use
+MIN_CONFIDENCE = 0.6
+CACHE_DIR = ".melody"
+LEVELS = "▁▂▃▄▅▆▇█"
+
+
+def melody_path(mp3_path, song_hash):
+    """Cache location for a song's pitch contour, next to the original"""
+    return os.path.join(os.path.dirname(mp3_path), CACHE_DIR, f"{song_hash}.npy")
+
+
+def vocal_estimate(mp3_path, song_hash):
+    """Mono signal dominated by the lead vocal.
+
+    With a rendered instrumental, the difference from the original is
+    roughly the vocal alone. Otherwise the centre channel limited to the
+    vocal band is the best guess.
+    """
+    instrumental = instrumental_path(mp3_path, song_hash)
+    original = decode_pcm(mp3_path, RATE, 2)
+    if os.path.exists(instrumental):
+        backing = decode_pcm(instrumental, RATE, 2)
+        length = min(len(original), len(backing))
+        return (original[:length] - backing[:length]).mean(axis=1)
+    mid = original.mean(axis=1)
+    return mid - band_stop(mid, RATE, *VOCAL_BAND)
+
+
+def pitch_contour(signal, rate=RATE):
+    """Fundamental frequency every 1/FPS seconds as float32 Hz, 0 where unvoiced"""
+    hop = rate // FPS
+    padded = np.pad(signal.astype(np.float32), (WINDOW // 2, WINDOW))
+    frames = frame_signal(padded, WINDOW, hop)
+    count = len(signal) // hop
+    contour = np.zeros(count, dtype=np.float32)
+    for first in range(0, count, BATCH):
+        block = frames[first:min(count, first + BATCH)]
+        hz, confidence = yin_frames(block, rate)
+        # Quiet frames are backing bleed, not singing
+        loud = np.sqrt(np.mean(block * block, axis=1)) > 0.01
+        contour[first:first + len(block)] = np.where((confidence >= MIN_CONFIDENCE) & loud, hz, 0.0)
+    return contour
+
+
+def extract_melody(mp3_path):
+    """Worker: extract and cache a song's reference melody. Returns (content_hash, path)"""
+    song_hash = content_hash(mp3_path)
+    out_path = melody_path(mp3_path, song_hash)
+    if os.path.exists(out_path):
+        return song_hash, out_path
+    contour = pitch_contour(vocal_estimate(mp3_path, song_hash))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = out_path + ".part"
+    with open(temp_path, 'wb') as f:
+        np.save(f, contour)
+    os.replace(temp_path, out_path)
+    return song_hash, out_path
+
+
+def cached_melody(mp3_path, entry):
+    """Path of an already extracted melody for an indexed song, or None"""
+    if not entry or "content_hash" not in entry:
+        return None
+    path = melody_path(mp3_path, entry["content_hash"])
+    return path if os.path.exists(path) else None
+
+
+def load_melody(path):
+    """Memory-mapped contour; only the frames that are looked at get read. None if unreadable"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except Exception:
+        return None  # lines are scored on singing at all instead
+
+
+def reference_pitch(contour, seconds):
+    """Reference Hz at a song time, 0 when the singer should be silent, None past the end"""
+    index = int(seconds * FPS)
+    if index < 0 or index >= len(contour):
+        return None
+    return float(contour[index])
+
+
+def semitone_error(sung, reference):
+    """Distance between two pitches in semitones, ignoring octave"""
+    offset = 12 * math.log2(sung / reference)
+    return abs((offset + 6) % 12 - 6)
+
+
+def melody_strip(contour, seconds, width, span=4.0):
+    """The next span seconds of melody as a row of width bar characters"""
+    start = max(0, int(seconds * FPS))
+    end = min(len(contour), start + int(span * FPS))
+    if end <= start or width <= 0:
+        return ""
+    window = np.asarray(contour[start:end])
+    columns = np.array_split(window, min(width, len(window)))
+    notes = [column[column > 0] for column in columns]
+    pitches = np.array([
+        12 * math.log2(np.median(column)) if len(column) else np.nan
+        for column in notes
+    ])
+    if np.all(np.isnan(pitches)):
+        return " " * len(columns)
+    low = np.nanmin(pitches)
+    high = max(np.nanmax(pitches), low + 12)  # at least an octave tall
+    chars = []
+    for value in pitches:
+        if np.isnan(value):
+            chars.append(" ")
+        else:
+            chars.append(LEVELS[int((value - low) / (high - low) * (len(LEVELS) - 1))])
+    return "".join(chars)
+
+
+def extract_library_melodies(library_path, workers=None):
+    """Command line entry point: extract reference melodies for every indexed song.
+
+    Songs that already have a contour are skipped, so an interrupted run
+    picks up where it stopped.
+    """
+    from .library import LibraryIndex
+    from .persistence import PersistenceService
+
+    persistence = PersistenceService()
+    index = LibraryIndex(library_path, persistence)
+
+    def progress(done, total):
+        print(f"\rExtracting melodies {done}/{total}", end="", flush=True)
+
+    try:
+        index.scan()
+        pending = [path for path in index.entries if not cached_melody(path, index.get(path))]
+        for mp3_path, result in run_parallel(extract_melody, pending, workers, progress):
+            if result:
+                index.update(mp3_path, content_hash=result[0])
+        print()
+    finally:
+        persistence.close()
@@ -1,209 +1,272 @@
 import curses
 import os
-import time
+from .text import center_x, fit
+
+ESC = 27
+ENTER_KEYS = (10, 13, curses.KEY_ENTER)
+BACKSPACE_KEYS = (127, 8, curses.KEY_BACKSPACE)
+
+
+def library_songs(player, with_lyrics=True):
+    """(name, mp3 path, lrc path) of the songs in the library folder"""
+    library_path = player.downloader.download_dir
+    songs = []
+    for file in sorted(os.listdir(library_path)):
+        if file.lower().endswith('.mp3'):
+            mp3_path = os.path.join(library_path, file)
+            lrc_path = mp3_path[:-4] + '.lrc'
+            if not with_lyrics or os.path.exists(lrc_path):
+                songs.append((file[:-4], mp3_path, lrc_path))
+    return songs
+
+
+def number_key(key):
+    """0-based item index for keys 1-9 and 0 (the tenth), or None"""
+    if ord('1') <= key <= ord('9'):
+        return key - ord('1')
+    if key == ord('0'):
+        return 9
+    return None
+
+
+class Menu:
+    """One screen of the menu overlay.
+
+    The menu on top of the MenuManager stack gets every key and is drawn
+    over the player each frame, so playback, downloads and background jobs
+    carry on while it is open.
+    """
+
+    title = ""
+    hint = "Esc: back"
+    centered = False  # center rows in the box instead of indenting them
+
+    def __init__(self, player):
+        self.player = player
+        self.manager = None  # set when pushed
+
+    def rows(self):
+        """[(text, color pair, extra attributes)] drawn down the box"""
+        return []
+
+    def handle_key(self, key):
+        if key in (ESC, ord('q')):
+            self.close()
+
+    def update(self, now):
+        """Called every frame while on top, with the UI clock"""
+
+    def resume(self):
+        """Called when the menu above this one closes"""
+
+    def close(self):
+        self.manager.pop(self)
+
+
+class MessageMenu(Menu):
+    """A message shown for a moment, or until a key is pressed"""
+
+    hint = "Any key: continue"
+    centered = True
+
+    def __init__(self, player, message, pair=4, seconds=1.5):
+        super().__init__(player)
+        self.message = message
+        self.pair = pair
+        self.seconds = seconds
+        self.until = None
+
+    def rows(self):
+        return [("", 7, 0), (self.message, self.pair, 0)]
+
+    def handle_key(self, key):
+        self.close()
+
+    def update(self, now):
+        if self.until is None:
+            self.until = now + self.seconds
+        elif now >= self.until:
+            self.close()
+
+
+class PromptMenu(Menu):
+    """Text fields filled in one after another; on_submit gets their values"""
+
+    hint = "Enter: next | Esc: cancel"
+
+    def __init__(self, player, title, labels, on_submit, help_rows=()):
+        super().__init__(player)
+        self.title = title
+        self.labels = labels
+        self.on_submit = on_submit
+        self.help_rows = list(help_rows)
+        self.values = [""] * len(labels)
+        self.field = 0
+
+    def rows(self):
+        rows = [(text, 7, 0) for text in self.help_rows]
+        if rows:
+            rows.append(("", 7, 0))
+        for i in range(self.field + 1):
+            value = self.values[i] + ("_" if i == self.field else "")
+            rows.append((f"{self.labels[i]} {value}", 2 if i == self.field else 7, 0))
+        return rows
+
+    def handle_key(self, key):
+        if key == ESC:
+            self.close()
+        elif key in ENTER_KEYS:
+            if self.field < len(self.labels) - 1:
+                self.field += 1
+            else:
+                self.close()
+                self.on_submit(*self.values)
+        elif key in BACKSPACE_KEYS:
+            self.values[self.field] = self.values[self.field][:-1]
+        elif 32 <= key <= 126:
+            self.values[self.field] += chr(key)
+
+
+class MainMenu(Menu):
+    title = " TERMINAL KARAOKE "
+    hint = "Select option | Esc: close"
+    centered = True
+    options = [
+        "1. Search and download song",
+        "2. Play from library",
+        "3. Playlists",
+        "4. Load local files",
+        "5. Quit"
+    ]
+
+    def rows(self):
+        return [(option, 7, 0) for option in self.options]
+
+    def handle_key(self, key):
+        player = self.player
+        if key == ord('1'):
+            self.manager.push(PromptMenu(
+                player, " SEARCH & DOWNLOAD SONG ", ["Song:"], self.search,
+                ["Enter 'artist - title' format: (e.g., 'Tame Impala - Let it Happen')",
+                 "or song name if its popular and unique"]))
+        elif key == ord('2'):
+            self.manager.push(LibraryMenu.open(player))
+        elif key == ord('3'):
+            from .playlist_ui import PlaylistSelectorMenu
+            self.manager.push(PlaylistSelectorMenu(player))
+        elif key == ord('4'):
+            self.manager.push(PromptMenu(
+                player, " LOAD LOCAL SONG AND LYRICS ",
+                ["Song file (.mp3):", "Lyrics file (.lrc):"], self.load_local,
+                ["Enter paths to your .mp3 and .lrc files", "Press ENTER after each path"]))
+        elif key == ord('5') or key == ord('q'):
+            player.quit_requested = True
+        elif key == ESC:
+            self.close()
+
+    def search(self, query):
+        if query and self.player.search_and_download(query):
+            self.manager.clear()
+
+    def load_local(self, song_path, lrc_path):
+        player = self.player
+        if song_path and lrc_path and player.load_song(song_path, lrc_path):
+            player.set_status("Now playing!", 2)
+            self.manager.clear()
+
+
+class LibraryMenu(Menu):
+    """Songs in the library folder; picking one switches to it"""
+
+    title = " SELECT SONG FROM LIBRARY "
+    hint = "Enter song number or 'q' to go back"
+
+    @classmethod
+    def open(cls, player):
+        """The library menu, or a message if there is nothing to pick from"""
+        if not os.path.exists(player.downloader.download_dir):
+            return MessageMenu(player, "Library folder not found", seconds=2)
+        songs = library_songs(player, with_lyrics=False)
+        if not songs:
+            return MessageMenu(player, "No songs found in library", seconds=2)
+        return cls(player, songs)
+
+    def __init__(self, player, songs):
+        super().__init__(player)
+        self.songs = songs
+
+    def rows(self):
+        rows = [("Available songs:", 7, 0), ("", 7, 0)]
+        rows += [(f"  {i+1}. {name}", 7, 0) for i, (name, _, _) in enumerate(self.songs[:10])]
+        return rows
+
+    def handle_key(self, key):
+        index = number_key(key)
+        if index is None:
+            return super().handle_key(key)
+        if index >= len(self.songs):
+            return
+        player = self.player
+        _, mp3_path, lrc_path = self.songs[index]
+        if not os.path.exists(lrc_path):
+            player.set_status("No lyrics file found", 3)
+        elif player.load_song(mp3_path, lrc_path):
+            player.set_status("Now playing!", 2)
+        self.manager.clear()
+
 
 class MenuManager:
+    """Stack of open menus; the top one gets the keys and is drawn over the player"""
+
     def __init__(self, stdscr):
         self.stdscr = stdscr
-        
-    def get_input(self, y, x, prompt=""):
-        """Get text input from user"""
-        if prompt:
-            self.stdscr.addstr(y, x, prompt, curses.color_pair(7))
-            y += 1
-            
-        user_input = ""
-        while True:
-            self.stdscr.addstr(y, x, " " * 50)
-            self.stdscr.addstr(y, x, user_input + "_", curses.color_pair(2))
-            self.stdscr.refresh()
-            key = self.stdscr.getch()
-            if key == 10:  # Enter
-                break
-            elif key in [127, 8, 263]:  # Backspace
-                user_input = user_input[:-1]
-            elif 32 <= key <= 126:
-                user_input += chr(key)
-        return user_input
-    
-    def show_file_loader(self, player):
-        """Show main menu"""
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        
-        title = " TERMINAL KARAOKE "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(1, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        options = [
-            "1. Search and download song",
-            "2. Play from library",
-            "3. Playlists",
-            "4. Load local files",
-            "5. Quit"
-        ]
-        
-        for i, option in enumerate(options):
-            y = 4 + i
-            x = (width - len(option)) // 2
-            self.stdscr.addstr(y, x, option, curses.color_pair(7))
-        
-        self.stdscr.addstr(10, (width - 20) // 2, "Select option: ", curses.color_pair(2))
-        self.stdscr.refresh()
-        
-        while True:
-            key = self.stdscr.getch()
-            if key == ord('1'):
-                self.show_search_menu(player)
-                break
-            elif key == ord('2'):
-                self.show_library_menu(player)
-                break
-            elif key == ord('3'):
-                from .playlist_ui import PlaylistUI
-                playlist_ui = PlaylistUI(self.stdscr)
-                playlist_ui.show_enhanced_playlist_selector(player)
-                break
-            elif key == ord('4'):
-                self.show_local_file_loader(player)
-                break
-            elif key == ord('5') or key == ord('q'):
-                return False
-        
-        return True
-    
-    def show_search_menu(self, player):
-        """Show search and download menu"""
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        title = " SEARCH & DOWNLOAD SONG "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(2, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        instructions = [
-            "Enter 'artist - title' format: (e.g., 'Tame Impala - Let it Happen')",
-            "or song name if its popular and unique",
-        ]
-        for i, text in enumerate(instructions):
-            y = 4 + i
-            x = (width - len(text)) // 2
-            if y < height - 2:
-                self.stdscr.addstr(y, x, text, curses.color_pair(7))
-        
-        query = self.get_input(7, (width//2) - 20)
-        if query:
-            player.search_and_download(query)
-        return True
-    
-    def show_library_menu(self, player):
-        """Show songs available in the library folder"""
-        library_path = player.downloader.download_dir
-        if not os.path.exists(library_path):
-            self.stdscr.clear()
-            height, width = self.stdscr.getmaxyx()
-            msg = "Library folder not found"
-            x = (width - len(msg)) // 2
-            self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-            self.stdscr.refresh()
-            time.sleep(2)
-            return False
-            
-        mp3_files = [f for f in os.listdir(library_path) if f.lower().endswith('.mp3')]
-        
-        if not mp3_files:
-            self.stdscr.clear()
-            height, width = self.stdscr.getmaxyx()
-            msg = "No songs found in library"
-            x = (width - len(msg)) // 2
-            self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-            self.stdscr.refresh()
-            time.sleep(2)
-            return False
-            
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        title = " SELECT SONG FROM LIBRARY "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(1, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        self.stdscr.addstr(3, 2, "Available songs:", curses.color_pair(7))
-        
-        for i, mp3_file in enumerate(mp3_files[:height-8]):
-            song_name = mp3_file[:-4]
-            self.stdscr.addstr(5 + i, 4, f"{i+1}. {song_name}", curses.color_pair(7))
-        
-        self.stdscr.addstr(height-2, 2, "Enter song number or 'q' to quit: ", curses.color_pair(2))
-        self.stdscr.refresh()
-        
-        while True:
-            key = self.stdscr.getch()
-            if key == ord('q'):
-                return False
-            elif ord('1') <= key <= ord('9'):
-                song_index = key - ord('1')
-                if song_index < len(mp3_files):
-                    mp3_file = mp3_files[song_index]
-                    mp3_path = os.path.join(library_path, mp3_file)
-                    lrc_path = mp3_path[:-4] + '.lrc'
-                    
-                    if not os.path.exists(lrc_path):
-                        player.set_status("No lyrics file found", 3)
-                        return False
-                    
-                    if player.load_song(mp3_path, lrc_path):
-                        player.seek_to(0.0)
-                        player.set_status("Now playing!", 2)
-                        return True
-            elif key == ord('0') and len(mp3_files) >= 10:
-                mp3_file = mp3_files[9]
-                mp3_path = os.path.join(library_path, mp3_file)
-                lrc_path = mp3_path[:-4] + '.lrc'
-                
-                if not os.path.exists(lrc_path):
-                    player.set_status("No lyrics file found", 3)
-                    return False
-                
-                if player.load_song(mp3_path, lrc_path):
-                    player.seek_to(0.0)
-                    player.set_status("Now playing!", 2)
-                    return True
-    
-    def show_local_file_loader(self, player):
-        """Load local MP3 and LRC files"""
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        title = " LOAD LOCAL SONG AND LYRICS "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(2, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        instructions = [
-            "Enter paths to your .mp3 and .lrc files",
-            "Press ENTER after each path",
-            "",
-            "Song file (.mp3): ",
-            "Lyrics file (.lrc): "
-        ]
-        for i, text in enumerate(instructions):
-            y = 5 + i
-            x = (width - len(text)) // 2
-            if y < height - 2:
-                self.stdscr.addstr(y, x, text, curses.color_pair(7))
-        
-        song_path = self.get_input(9, (width//2) - 10)
-        lrc_path = self.get_input(10, (width//2) - 10)
-        
-        if song_path and lrc_path:
-            if player.load_song(song_path, lrc_path):
-                player.seek_to(0.0)
-                player.set_status("Now playing!", 2)
-        return True
-    
-    def show_download_progress(self, message):
-        """Show download progress message"""
-        height, width = self.stdscr.getmaxyx()
-        self.stdscr.clear()
-        msg = f"Downloading: {message}"
-        x = (width - len(msg)) // 2
-        self.stdscr.addstr(height//2, x, msg, curses.color_pair(3))
-        self.stdscr.refresh()
+        self.stack = []
+
+    @property
+    def active(self):
+        return bool(self.stack)
+
+    def push(self, menu):
+        menu.manager = self
+        self.stack.append(menu)
+
+    def pop(self, menu=None):
+        """Close the top menu, or menu if given and still open"""
+        if menu is None and self.stack:
+            self.stack.pop()
+        elif menu in self.stack:
+            self.stack.remove(menu)
+        if self.stack:
+            self.stack[-1].resume()
+
+    def clear(self):
+        self.stack = []
+
+    def handle_key(self, key):
+        if self.stack:
+            self.stack[-1].handle_key(key)
 
+    def draw(self, ui, layout):
+        """Draw the top menu in a box over the lyrics area"""
+        self.stack[-1].update(ui.clock())
+        if not self.stack:
+            return
+        menu = self.stack[-1]
+        top, left = 1, 2
+        bottom = max(top + 3, layout.lyrics_bottom)
+        right = layout.width - 3
+        inner = right - left - 1
+        if inner < 4:
+            return
+        color = self.stdscr.color_pair(5)
+        ui.put(top, left, "┌" + "─" * inner + "┐", color)
+        for y in range(top + 1, bottom):
+            ui.put(y, left, "│" + " " * inner + "│", color)
+        ui.put(bottom, left, "└" + "─" * inner + "┘", color)
+        if menu.title:
+            title = fit(menu.title, inner)
+            ui.put(top, left + 1 + center_x(title, inner), title, self.stdscr.color_pair(1) | curses.A_BOLD)
+        for i, (text, pair, attr) in enumerate(menu.rows()[:bottom - top - 2]):
+            text = fit(text, inner - 2)
+            x = left + 1 + center_x(text, inner) if menu.centered else left + 2
+            ui.put(top + 2 + i, x, text, self.stdscr.color_pair(pair) | attr)
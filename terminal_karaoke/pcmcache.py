@@ -0,0 +1,200 @@
+import hashlib
+import json
+import mmap
+import os
+import subprocess
+import threading
+import time
+import numpy as np
+from .dsp import ffmpeg_decode_command
+from .persistence import atomic_write_json, remove_file
+
+FILL_BLOCK = 1 << 16  # frames decoded per write into the map
+HEADROOM_SECONDS = 2  # container durations are estimates; leave room past them
+
+
+class DecodedPCM:
+    """A song as raw little-endian s16 PCM in a memory-mapped file, filled by a background decoder.
+
+    Frames below filled are final, so playback, seeks and loops inside that
+    range are plain offsets into the map.
+    """
+
+    def __init__(self, path, source_path, rate, channels, expected_frames=0, length=None, on_complete=None):
+        self.path = path
+        self.source_path = source_path
+        self.rate = rate
+        self.channels = channels
+        self.on_complete = on_complete
+        self.process = None
+        self.closed = False
+        if length is not None:
+            # Already decoded on an earlier run
+            self.capacity = self.filled = self.length = length
+            self.complete = True
+            with open(path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if length else None
+            self.thread = None
+        else:
+            self.capacity = expected_frames + HEADROOM_SECONDS * rate
+            self.filled = 0
+            self.length = None
+            self.complete = False
+            with open(path, 'wb+') as f:
+                f.truncate(self.capacity * channels * 2)
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE)
+            self.thread = threading.Thread(target=self._fill, name="pcm-fill", daemon=True)
+            self.thread.start()
+        self.frames = np.frombuffer(self.map, dtype='<i2').reshape(-1, channels) if self.map else \
+            np.zeros((0, channels), dtype='<i2')
+
+    def _fill(self):
+        try:
+            self.process = subprocess.Popen(
+                ffmpeg_decode_command(self.source_path, self.rate, self.channels),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception:
+            self.length = self.filled  # stays incomplete, so it is never reused
+            return
+        frame_bytes = self.channels * 2
+        pending = b''
+        while not self.closed and self.filled < self.capacity:
+            data = self.process.stdout.read(FILL_BLOCK * frame_bytes)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % frame_bytes
+            pending = data[usable:]
+            count = min(usable // frame_bytes, self.capacity - self.filled)
+            start = self.filled * frame_bytes
+            self.map[start:start + count * frame_bytes] = data[:count * frame_bytes]
+            self.filled += count
+        self.process.kill()
+        self.process.wait()
+        if self.closed:
+            return
+        self.map.flush()
+        self.length = self.filled
+        self.complete = True
+        if self.on_complete:
+            self.on_complete(self)
+
+    def close(self):
+        self.closed = True
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.frames = None
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # a reader still holds a view; the map is freed with it
+
+
+class PCMCache:
+    """Decoded-PCM files for recently played songs, kept under a disk budget with LRU eviction.
+
+    Evicted files are deleted through discard(path), which the player
+    hands to an IO worker so eviction never blocks a frame.
+    """
+
+    def __init__(self, cache_dir, rate, channels, budget_bytes=1 << 30, persistence=None, discard=remove_file):
+        self.cache_dir = cache_dir
+        self.rate = rate
+        self.channels = channels
+        self.budget_bytes = budget_bytes
+        self.persistence = persistence
+        self.discard = discard
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.lock = threading.RLock()
+        self.open_items = {}  # key -> DecodedPCM
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)  # key -> {"size", "last_used", "length"}
+        except Exception:
+            self.entries = {}
+
+    def key(self, source_path):
+        stat = os.stat(source_path)
+        ident = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime}|{self.rate}|{self.channels}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:20]
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def open(self, source_path, duration):
+        """Decoded PCM for a song, starting a background decode if it is not cached"""
+        key = self.key(source_path)
+        with self.lock:
+            item = self.open_items.get(key)
+            if item is not None:
+                self._touch(key)
+                return item
+            entry = self.entries.get(key)
+            path = self.path_for(key)
+            if entry and entry.get("length") is not None and os.path.exists(path):
+                item = DecodedPCM(path, source_path, self.rate, self.channels, length=entry["length"])
+            else:
+                self._evict(int(duration * self.rate) * self.channels * 2)
+                item = DecodedPCM(
+                    path, source_path, self.rate, self.channels,
+                    expected_frames=int(duration * self.rate),
+                    on_complete=lambda done, key=key: self._completed(key, done),
+                )
+                self.entries[key] = {"size": item.capacity * self.channels * 2, "length": None}
+            self.open_items[key] = item
+            self._touch(key)
+        return item
+
+    def release(self, keep):
+        """Close open items other than those in keep"""
+        with self.lock:
+            stale = [key for key, item in self.open_items.items() if item not in keep]
+            items = [self.open_items.pop(key) for key in stale]
+        for key, item in zip(stale, items):
+            item.close()
+            if not item.complete:
+                # Half-decoded files are not worth keeping
+                with self.lock:
+                    self.entries.pop(key, None)
+                self.discard(item.path)
+        self.mark_dirty()
+
+    def _completed(self, key, item):
+        with self.lock:
+            entry = self.entries.setdefault(key, {})
+            entry["length"] = item.length
+            entry["size"] = item.capacity * self.channels * 2
+        self.mark_dirty()
+
+    def _touch(self, key):
+        self.entries.setdefault(key, {})["last_used"] = time.time()
+        self.mark_dirty()
+
+    def _evict(self, incoming_bytes):
+        """Remove least recently used files until incoming_bytes fits the budget"""
+        total = sum(entry.get("size", 0) for entry in self.entries.values()) + incoming_bytes
+        for key in sorted(self.entries, key=lambda k: self.entries[k].get("last_used", 0)):
+            if total <= self.budget_bytes:
+                break
+            if key in self.open_items:
+                continue
+            total -= self.entries.pop(key).get("size", 0)
+            self.discard(self.path_for(key))
+
+    def save(self):
+        with self.lock:
+            data = {key: dict(entry) for key, entry in self.entries.items()}
+        atomic_write_json(self.manifest_path, data)
+
+    def mark_dirty(self):
+        if self.persistence is None:
+            self.save()
+        else:
+            self.persistence.mark_dirty("pcm_cache", self.save)
+
+    def close(self):
+        self.release(keep=())
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def atomic_write(path, data):
+    """Replace a file through a fsynced temp file so readers never see a partial write"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data):
+    """Serialise data as JSON and write it atomically"""
+    atomic_write(path, json.dumps(data))
+
+
+def remove_file(path):
+    """Delete a file, if it is still there"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def append_lines(path, lines):
+    """Append text lines to a file and fsync it"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class PersistenceService:
+    """Coalesces dirty state and writes it from a background thread.
+
+    Failed writes go to on_error, called on the writer thread; the player
+    passes one that hands them to its main loop, since curses owns the
+    terminal.
+    """
+
+    def __init__(self, delay=0.5, max_delay=5.0, on_error=print):
+        self.on_error = on_error
+        self.delay = delay  # quiet period before a flush
+        self.max_delay = max_delay  # upper bound while edits keep arriving
+        self.pending = {}  # key -> writer callable
+        self.first_dirty = 0
+        self.last_dirty = 0
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self.thread.start()
+
+    def mark_dirty(self, key, writer):
+        """Schedule writer to run after the debounce delay; later calls for key replace it"""
+        with self.condition:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_dirty = now
+            self.pending[key] = writer
+            self.last_dirty = now
+            self.condition.notify()
+
+    def cancel(self, key):
+        """Drop the writer queued for key, if it hasn't started"""
+        with self.condition:
+            self.pending.pop(key, None)
+
+    def _due_at(self):
+        return min(self.last_dirty + self.delay, self.first_dirty + self.max_delay)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                timeout = self._due_at() - time.monotonic()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+            self.flush()
+
+    def flush(self):
+        """Run every pending writer now"""
+        with self.write_lock:
+            with self.condition:
+                pending, self.pending = self.pending, {}
+            for key, writer in pending.items():
+                try:
+                    writer()
+                except Exception as e:
+                    self.on_error(f"Error saving {key}: {e}")
+
+    def close(self):
+        """Stop the background thread and write whatever is still dirty"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
@@ -0,0 +1,183 @@
+import math
+import queue
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+
+FMIN = 70.0
+FMAX = 1000.0
+YIN_THRESHOLD = 0.15
+SILENCE_DB = -60.0
+VOICED_DB = -45.0  # quieter input is treated as not singing
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# One analysis result. Replaced whole, never mutated, so readers need no lock
+PitchSnapshot = namedtuple("PitchSnapshot", "seq time frequency confidence level_db")
+
+
+def yin_frames(frames, rate, fmin=FMIN, fmax=FMAX, threshold=YIN_THRESHOLD):
+    """YIN over the rows of a (count, size) array. Returns (hz, confidence) arrays; hz is 0 if unvoiced"""
+    count, size = frames.shape
+    max_lag = int(rate / fmin)
+    min_lag = max(2, int(rate / fmax))
+    width = size - max_lag
+    if width < max_lag:
+        return np.zeros(count), np.zeros(count)
+    x = frames.astype(np.float64)
+    fft_size = 1 << int(math.ceil(math.log2(size + width)))
+    # Correlation of each row's first width samples against every lag, via one FFT product
+    spectrum = np.fft.rfft(x, fft_size, axis=1) * np.conj(np.fft.rfft(x[:, :width], fft_size, axis=1))
+    corr = np.fft.irfft(spectrum, fft_size, axis=1)[:, :max_lag + 1]
+    energy = np.concatenate([np.zeros((count, 1)), np.cumsum(x * x, axis=1)], axis=1)
+    lags = np.arange(max_lag + 1)
+    window_energy = energy[:, lags + width] - energy[:, lags]
+    diff = np.maximum(window_energy[:, :1] + window_energy - 2 * corr, 0.0)
+    # Cumulative mean normalized difference
+    cmnd = np.ones((count, max_lag + 1))
+    cmnd[:, 1:] = diff[:, 1:] * lags[1:] / np.maximum(np.cumsum(diff[:, 1:], axis=1), 1e-12)
+
+    # The pitch period is the minimum of the first dip under the threshold
+    search = cmnd[:, min_lag:max_lag]
+    below = search < threshold
+    voiced = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+    after_first = np.arange(search.shape[1]) >= first[:, None]
+    dip = below & after_first & (np.cumsum(~below & after_first, axis=1) == 0)
+    tau = np.argmin(np.where(dip, search, np.inf), axis=1) + min_lag
+
+    rows = np.arange(count)
+    a, b, c = cmnd[rows, tau - 1], cmnd[rows, tau], cmnd[rows, tau + 1]
+    denominator = a - 2 * b + c
+    shift = np.where(denominator > 0, 0.5 * (a - c) / np.where(denominator > 0, denominator, 1), 0.0)
+    hz = np.where(voiced, rate / (tau + shift), 0.0)
+    confidence = np.where(voiced, 1.0 - b, 0.0)
+    return hz, confidence
+
+
+def detect_pitch(samples, rate, fmin=FMIN, fmax=FMAX, threshold=YIN_THRESHOLD):
+    """YIN fundamental frequency of a mono block. Returns (hz, confidence); hz is 0 if unvoiced"""
+    hz, confidence = yin_frames(samples[None, :], rate, fmin, fmax, threshold)
+    return float(hz[0]), float(confidence[0])
+
+
+def level_db(samples):
+    """RMS level of a block in dBFS"""
+    if not len(samples):
+        return SILENCE_DB
+    rms = math.sqrt(float(np.mean(samples * samples)))
+    return max(SILENCE_DB, 20 * math.log10(rms + 1e-9))
+
+
+def note_name(frequency):
+    """Nearest note and the offset from it in cents, e.g. ('A4', 12)"""
+    midi = 69 + 12 * math.log2(frequency / 440.0)
+    nearest = int(round(midi))
+    return f"{NOTE_NAMES[nearest % 12]}{nearest // 12 - 1}", int(round((midi - nearest) * 100))
+
+
+class LiveAnalyzer:
+    """Pitch and level of the microphone, analysed on its own thread within a CPU budget.
+
+    The engine's audio callback only enqueues input blocks, so analysis can
+    fall behind without ever causing an input overrun. When it is slower
+    than budget (a fraction of real time) it skips blocks instead.
+    """
+
+    def __init__(self, engine, budget=0.25, window=2048):
+        self.engine = engine
+        self.budget = budget
+        self.window = window
+        self.rate = engine.rate
+        self.channels = engine.channels
+        self.snapshot = PitchSnapshot(0, 0.0, 0.0, 0.0, SILENCE_DB)
+        self.history = np.zeros(window, np.float32)
+        self.cost = 0.0  # smoothed seconds per analysis
+        self.input_queue = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """Begin analysing; False if the engine has no input"""
+        if self.running:
+            return True
+        if not self.engine.has_input:
+            return False
+        self.input_queue = queue.SimpleQueue()
+        self.running = True
+        self.engine.add_input_queue(self.input_queue)
+        self.thread = threading.Thread(target=self._run, name="pitch", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.engine.remove_input_queue(self.input_queue)
+        self.thread.join()
+        self.snapshot = PitchSnapshot(self.snapshot.seq + 1, self.snapshot.time, 0.0, 0.0, SILENCE_DB)
+
+    def _mono(self, data):
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+        return samples.reshape(-1, self.channels).mean(axis=1)
+
+    def _run(self):
+        skip = 0
+        while self.running:
+            try:
+                data, song_frame = self.input_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            blocks = [data]
+            # A meter only cares about the newest audio, so fold in whatever queued up
+            while True:
+                try:
+                    data, song_frame = self.input_queue.get_nowait()
+                except queue.Empty:
+                    break
+                blocks.append(data)
+            samples = self._mono(b''.join(blocks))
+            self.history = np.concatenate([self.history, samples])[-self.window:]
+            if skip:
+                skip -= 1
+                continue
+            started = time.perf_counter()
+            level = level_db(samples)
+            frequency, confidence = 0.0, 0.0
+            if level > VOICED_DB:
+                # Pairwise averaging halves the rate, plenty for a singing voice
+                half = self.history[:len(self.history) // 2 * 2].reshape(-1, 2).mean(axis=1)
+                frequency, confidence = detect_pitch(half, self.rate / 2)
+            elapsed = time.perf_counter() - started
+            self.cost = 0.8 * self.cost + 0.2 * elapsed
+            skip = int(self.cost / (self.budget * len(samples) / self.rate))
+            self.snapshot = PitchSnapshot(
+                self.snapshot.seq + 1,
+                song_frame / self.rate,
+                frequency,
+                confidence,
+                level,
+            )
+
+
+class LineScorer:
+    """Share of sampled moments in each lyric line where the singer hit"""
+
+    def __init__(self):
+        self.counts = {}  # line index -> [hits, samples]
+
+    def add(self, line_idx, hit):
+        counts = self.counts.setdefault(line_idx, [0, 0])
+        counts[0] += 1 if hit else 0
+        counts[1] += 1
+
+    def score(self, line_idx):
+        """Percentage for a line, or None if it was never sampled"""
+        hits, samples = self.counts.get(line_idx, (0, 0))
+        if not samples:
+            return None
+        return int(round(100 * hits / samples))
+
+    def reset(self):
+        self.counts = {}
@@ -1,62 +1,179 @@
-import pygame
 import time
 import os
+import json
+from collections import deque
 from .ui import UI
-from .lyrics import LyricsParser
+from .lyrics import LyricsParser, current_line_index
 from .audio import AudioManager
 from .downloader import SongDownloader
 from .playlist import PlaylistManager
+from .library import LibraryIndex
+from .jobs import BackgroundJobs
+from .vocals import cached_instrumental, make_instrumental
+from .loudness import analyze_loudness, normalization_gain
+from .envelope import cached_envelope, envelope_frame, load_envelope, render_envelope
+from .melody import cached_melody, load_melody, reference_pitch, semitone_error
+from .variants import MAX_SEMITONES, MAX_TEMPO, MIN_TEMPO, VariantCache, render_variant
+from .persistence import PersistenceService, atomic_write_json, remove_file
+from .dsp import probe_duration
 from .recorder import AudioRecorder
+from .pitch import LineScorer, LiveAnalyzer
+from .profiling import STARTUP_BUDGET, FrameProfiler
+from .text import TextLine
+from .layout import CONTROLS
+from .menus import MainMenu
 import curses
 
+SEEK_STEP = 5.0
+SEEK_SETTLE = 0.15  # quiet time before a burst of seek keys reaches the audio
+SEEK_KEYS = (curses.KEY_LEFT, curses.KEY_RIGHT)
+
 class KaraokePlayer:
-    def __init__(self, stdscr):
+    def __init__(self, stdscr, latency_profile="balanced", frame_stats_path=None, low_bandwidth=False,
+                 started_at=None):
         self.stdscr = stdscr
+        self.started_at = time.perf_counter() if started_at is None else started_at  # launch, for startup timing
         self.song_path = ""
+        self.audio_path = ""  # file actually playing: song_path or a rendering of it
+        self.use_instrumental = False
+        self.semitones = 0
+        self.tempo = 1.0
+        self.audio_tempo = 1.0  # tempo of the rendering that is playing
         self.lrc_path = ""
-        self.lyrics = []  # [(timestamp, line)]
+        self.base_lyrics = []  # [(timestamp, line)] as in the LRC file
+        self.lyrics = []  # base_lyrics scaled to the playing tempo
+        self.lyric_lines = []  # TextLine of each lyric, split into clusters once per song
+        self.loop_points = []  # A-B loop in song seconds at the original tempo
+        self.melody = None  # memory-mapped reference pitch contour, if extracted
+        self.envelope = None  # memory-mapped band levels and beats for the visualizer
         self.total_time = 0.0
         self.paused = False
         self.current_line_idx = 0
+        self.pending_seek = None  # net target of seek keys not yet applied
+        self.pending_seek_at = 0.0
+        self.loading = None  # song whose length is being probed before it loads
         self.status_message = ""
         self.status_timer = 0
-        self.controls = {
-            'p': "Pause/Play",
-            '←': "Back 5s",
-            '→': "Forward 5s",
-            'n': "Next Song",
-            'b': "Previous Song",
-            's': "Toggle Shuffle",
-            'r': "Record",
-            'q': "Quit"
-        }
+        self.quit_requested = False  # set by the menu's Quit option
+        self.input_seen = False  # keys arrived this frame
+        self.controls = dict(CONTROLS)
         
-        # Timing
-        self.seek_offset = 0.0
-        self.playback_start_time = 0
-        self.last_update_time = 0
+        # Per-phase loop timing, only with --frame-stats
+        self.frame_stats_path = frame_stats_path
+        self.profiler = FrameProfiler(enabled=frame_stats_path is not None)
         
         # Recording
         self.is_recording = False
         
         # Components
-        self.ui = UI(stdscr)
-        self.audio_manager = AudioManager()
+        self.ui = UI(stdscr, low_bandwidth=low_bandwidth)
         self.lyrics_parser = LyricsParser()
-        self.downloader = SongDownloader()
-        self.playlist_manager = PlaylistManager(self.downloader.download_dir)
+        # Errors from worker threads reach the status line through poll(), never stdout
+        self.jobs = BackgroundJobs(on_error=self.show_error)
+        self.downloader = SongDownloader(on_error=self.jobs.report)
+        self.persistence = PersistenceService(on_error=self.jobs.report)
+        self.audio_manager = AudioManager(
+            latency_profile, os.path.join(self.downloader.download_dir, ".pcm"), self.persistence,
+            on_error=self.jobs.report, discard=self.discard_file
+        )
+        # Playlists and the library index are read by warm_up, off the main thread
+        self.playlist_manager = PlaylistManager(self.downloader.download_dir, self.persistence, load=False)
+        self.variant_cache = VariantCache(
+            os.path.join(self.downloader.download_dir, ".variants"), persistence=self.persistence,
+            discard=self.discard_file
+        )
+        self.library_index = LibraryIndex(
+            self.downloader.download_dir, self.persistence, load=False, on_error=self.jobs.report
+        )
+        self.last_expiry_check = 0
+        self.state_path = os.path.join(self.downloader.download_dir, "player_state.json")
+        
+        # Shuffle skips songs sung this recently, across sessions
+        self.no_repeat_window = 20
+        self.recent_songs = deque(self.load_state().get("recent_songs", []), maxlen=self.no_repeat_window)
         
         # Playlist state
         self.current_playlist = None
         self.playlist_mode = False
-        self.recorder = AudioRecorder()
         
-        # Initialize pygame mixer
-        self.audio_manager.init_mixer()
+        self.recorder = AudioRecorder(self.audio_manager.engine, on_error=self.jobs.report)
+        
+        # Live singing analysis, off until asked for
+        self.analyzer = LiveAnalyzer(self.audio_manager.engine)
+        self.line_scorer = LineScorer()
+        self.last_pitch_seq = 0
+        
+        self.warming = set()  # subsystems warm_up is still bringing up
+        self.warm_up()
+
+    def warm_up(self):
+        """Open the audio device and read playlists and the library index on worker threads.
+
+        The menu is usable meanwhile. Each part is taken in by the main loop
+        once ready, and how long it took since launch is noted for
+        --frame-stats.
+        """
+        self.warming = {"audio", "playlists", "library"}
+        self.jobs.submit_io(("warm_up", "audio"), self.start_audio, None, self.audio_ready)
+        self.jobs.submit_io(("warm_up", "playlists"), self.read_playlists, None, self.playlists_ready)
+        self.jobs.submit_io(("warm_up", "library"), self.scan_library, None, self.library_ready)
+
+    def discard_file(self, path):
+        """Delete an evicted cache file on a worker thread"""
+        self.jobs.submit_io(("remove", path), remove_file, path)
+
+    def warmed_up(self, name):
+        self.warming.discard(name)
+        self.profiler.startup[name] = time.perf_counter() - self.started_at
+
+    def start_audio(self, _):
+        """Worker thread: open the audio stream. Returns None, or what went wrong"""
+        try:
+            self.audio_manager.init_mixer()
+            return None
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    def audio_ready(self, error):
+        self.warmed_up("audio")
+        if error:
+            self.set_status(f"No audio output: {error}", 5)
+        else:
+            self.recorder.load_round_trip()
+
+    def read_playlists(self, _):
+        """Worker thread: read playlist snapshots and journals"""
+        return self.playlist_manager.read_playlists()
+
+    def playlists_ready(self, loaded):
+        self.warmed_up("playlists")
+        if loaded:
+            self.playlist_manager.add_loaded(loaded)
+
+    def scan_library(self, _):
+        """Worker thread: read the library index and bring it in line with the library folder.
+
+        Nothing listens to the index yet, so the scan's changes are only
+        taken in by library_ready on the main loop.
+        """
+        self.library_index.load()
+        return self.library_index.scan()
+
+    def library_ready(self, result):
+        self.warmed_up("library")
+        self.playlist_manager.attach_index(self.library_index)
+        self.library_index.add_listener(self.on_index_event)
+        # The loudness pass also records durations, for smart playlist queries
+        missing = self.library_index.missing("loudness") + self.library_index.missing("duration")
+        for mp3_path in dict.fromkeys(missing):
+            self.request_loudness(mp3_path)
 
     def set_status(self, message, duration=1):
         self.status_message = message
         self.status_timer = time.time() + duration
+    
+    def show_error(self, message):
+        self.set_status(message, 3)
 
     def extract_artist_title(self, query):
         """Extract artist and title from query"""
@@ -72,119 +189,420 @@ class KaraokePlayer:
         return "Unknown Artist", query
 
     def search_and_download(self, query):
-        """Search for and download a song with lyrics"""
+        """Start searching for and downloading a song with lyrics in the background.
+
+        Returns False if a download is already running. The song is loaded
+        once it is ready, by finish_download on the main loop.
+        """
+        if self.jobs.is_running("download"):
+            self.set_status("A download is already running", 2)
+            return False
         # Extract artist and title
         artist, title = self.extract_artist_title(query)
+        self.set_status(f"Searching for: {artist} {title}", 60)
+        self.jobs.submit_io("download", self.fetch_song, (artist, title), self.finish_download)
+        return True
+
+    def fetch_song(self, request):
+        """Worker thread: find, download and fetch lyrics for a song. Returns a result dict"""
+        artist, title = request
         search_query = f"{artist} {title}"
-        
-        self.ui.show_download_progress(f"Searching for: {search_query}")
-        
-        # Search YouTube
-        youtube_url = self.downloader.search_youtube(search_query)
-        if not youtube_url:
-            self.set_status("Song not found", 3)
-            return False
-        
-        self.ui.show_download_progress("Downloading audio...")
-        
-        # Download audio
-        mp3_path = self.downloader.download_audio(youtube_url, search_query)
-        if not mp3_path:
-            self.set_status("Download failed", 3)
-            return False
-        
-        self.ui.show_download_progress("Fetching lyrics...")
-        
-        # Try to get real lyrics
         try:
-            # Get song duration
-            temp_sound = pygame.mixer.Sound(mp3_path)
-            duration = temp_sound.get_length()
-            del temp_sound
+            # Search YouTube
+            youtube_url = self.downloader.search_youtube(search_query)
+            if not youtube_url:
+                return {"error": "Song not found"}
+            
+            self.jobs.post(self.set_status, "Downloading audio...", 60)
+            
+            # Download audio
+            mp3_path = self.downloader.download_audio(youtube_url, search_query)
+            if not mp3_path:
+                return {"error": "Download failed"}
+            
+            self.jobs.post(self.set_status, "Fetching lyrics...", 60)
             
-            # Try to fetch lyrics
+            # Get song duration and try to fetch lyrics
+            duration = probe_duration(mp3_path)
             lyrics_fetcher = self.downloader.lyrics_fetcher
             lrc_content = lyrics_fetcher.get_lyrics_by_metadata(artist, title, duration=duration)
             
-            # If no lyrics found, inform user and don't create LRC file
+            # If no lyrics found, don't create LRC file
             if not lrc_content:
-                self.set_status("Lyrics not found in database", 3)
                 # Clean up downloaded MP3 file since we can't use it without lyrics
                 try:
                     os.remove(mp3_path)
                 except:
                     pass
-                return False
+                return {"error": "Lyrics not found in database"}
             
             # Save LRC file
             lrc_path = self.downloader.save_lrc_file(lrc_content, mp3_path)
-            
-            if lrc_path and self.load_song(mp3_path, lrc_path):
-                self.seek_to(0.0)
-                self.set_status("Downloaded and ready!", 2)
-                return True
-            else:
-                self.set_status("Failed to process lyrics", 3)
-                return False
+            if not lrc_path:
+                return {"error": "Failed to process lyrics"}
+            return {"mp3_path": mp3_path, "lrc_path": lrc_path, "artist": artist, "title": title, "duration": duration}
         except Exception as e:
-            self.set_status(f"Error: {str(e)}", 3)
-            return False
+            return {"error": f"Error: {str(e)}"}
+
+    def finish_download(self, result):
+        """Index and play a downloaded song"""
+        if not result:
+            self.set_status("Download failed", 3)
+            return
+        if "error" in result:
+            self.set_status(result["error"], 3)
+            return
+        mp3_path, lrc_path = result["mp3_path"], result["lrc_path"]
+        self.library_index.add(mp3_path, lrc_path)
+        self.library_index.update(mp3_path, artist=result["artist"], title=result["title"],
+                                  duration=result["duration"])
+        if self.load_song(mp3_path, lrc_path):
+            self.set_status("Downloaded and ready!", 2)
+        else:
+            self.set_status("Failed to process lyrics", 3)
 
-    def load_song(self, song_path, lrc_path):
+    def load_song(self, song_path, lrc_path, song_duration=None):
+        """Make song_path the current song and play it from the start. Returns False if it can't be.
+
+        A song the library hasn't measured is probed on a worker thread
+        first, and loaded from poll() once its length is known, rather than
+        stall the frame on ffprobe.
+        """
+        audio_path, tempo = self.desired_audio(song_path)
+        if song_duration is None:
+            duration = self.known_duration(song_path, tempo)
+        else:
+            duration = song_duration / tempo
+        if duration is None:
+            def done(duration):
+                if self.loading != song_path:
+                    return  # another song was picked meanwhile
+                self.loading = None
+                if duration:
+                    self.load_song(song_path, lrc_path, duration * tempo)
+            
+            self.loading = song_path
+            self.jobs.submit_io(("load", audio_path), probe_duration, audio_path, done)
+            self.set_status(f"Loading: {os.path.basename(song_path)}", 3)
+            return True
+        self.loading = None
         self.song_path = song_path
         self.lrc_path = lrc_path
         
         try:
-            success, length = self.audio_manager.load_song(song_path)
+            gain = normalization_gain(self.library_index.get(song_path))
+            success, length = self.audio_manager.load_song(audio_path, gain, duration)
             if not success:
                 self.set_status("Error loading song", 3)
                 return False
                 
+            self.audio_path = audio_path
+            self.audio_tempo = tempo
             self.total_time = length
+            self.paused = False
+            self.loop_points = []
+            self.pending_seek = None
+            self.line_scorer.reset()
             self.set_status(f"Loaded: {os.path.basename(song_path)}", 2)
             
-            # Reset timing
-            self.seek_offset = 0.0
-            self.playback_start_time = 0
-            self.last_update_time = time.time()
-            
         except Exception as e:
             self.set_status(f"Error loading song: {str(e)}", 3)
             return False
         
-        self.lyrics = self.lyrics_parser.parse(lrc_path)
+        melody_file = cached_melody(song_path, self.library_index.get(song_path))
+        self.melody = load_melody(melody_file) if melody_file else None
+        self.load_song_envelope(song_path)
+        
+        self.base_lyrics = self.lyrics_parser.parse(lrc_path)
+        self.lyric_lines = [TextLine(text) for _, text in self.base_lyrics]
+        self.scale_lyrics()
         if not self.lyrics:
             self.set_status("Warning: No lyrics found in LRC file", 2)
         
+        entry = self.library_index.get(song_path)
+        if entry is not None:
+            self.library_index.update(
+                song_path,
+                duration=self.total_time * tempo,
+                play_count=entry.get("play_count", 0) + 1,
+                last_played=time.time(),
+            )
+        self.save_state()
+        self.seek_to(0.0)
         return True
 
-    def current_time(self):
-        """Get the accurate current playback time in seconds"""
-        if self.paused:
-            return self.seek_offset
+    def scale_lyrics(self):
+        """Fit lyric timestamps to the tempo of the audio that is playing"""
+        if self.audio_tempo == 1.0:
+            self.lyrics = self.base_lyrics
+        else:
+            self.lyrics = [(timestamp / self.audio_tempo, text) for timestamp, text in self.base_lyrics]
+
+    def desired_audio(self, song_path, request=True):
+        """Best rendering of song_path available now for the vocal, key and tempo settings.
+
+        Returns (path, tempo). Missing renderings are queued in the background
+        when request is set, and picked up by refresh_audio once ready.
+        """
+        base = song_path
+        if self.use_instrumental:
+            instrumental = cached_instrumental(song_path, self.library_index.get(song_path))
+            if instrumental:
+                base = instrumental
+            else:
+                if request:
+                    self.request_instrumental(song_path)
+                return song_path, 1.0
+        if self.semitones == 0 and self.tempo == 1.0:
+            return base, 1.0
+        key = self.variant_cache.key(base, self.semitones, self.tempo)
+        path = self.variant_cache.get(key) if key else None
+        if path:
+            return path, self.tempo
+        if key and request:
+            self.request_variant(song_path, base, key)
+        return base, 1.0
+
+    def refresh_audio(self):
+        """Switch the current song to its best available rendering"""
+        if not self.song_path:
+            return
+        path, tempo = self.desired_audio(self.song_path)
+        if path != self.audio_path:
+            self.switch_audio(path, tempo)
+
+    def request_instrumental(self, mp3_path):
+        """Render the instrumental in the background"""
+        def done(result):
+            if not result:
+                if self.song_path == mp3_path:
+                    self.set_status("Could not make instrumental", 2)
+                return
+            self.library_index.update(mp3_path, content_hash=result[0])
+            if self.song_path == mp3_path:
+                self.refresh_audio()
+            else:
+                # Queue any key or tempo variant that was waiting on it
+                self.desired_audio(mp3_path)
         
-        pos_ms = self.audio_manager.get_position()
-        if pos_ms >= 0:
-            return self.seek_offset + pos_ms / 1000.0
+        self.jobs.submit(("instrumental", mp3_path), make_instrumental, mp3_path, done)
+
+    def on_index_event(self, event, mp3_path, entry):
+        if event == "add" and ("loudness" not in entry or "duration" not in entry):
+            self.request_loudness(mp3_path)
+
+    def request_loudness(self, mp3_path):
+        """Measure a song's loudness in the background, for volume normalization"""
+        def done(result):
+            if result and self.library_index.get(mp3_path) is not None:
+                self.library_index.update(mp3_path, **result)
         
-        # Fallback
-        elapsed = time.time() - self.playback_start_time
-        return min(self.total_time, self.seek_offset + elapsed)
+        self.jobs.submit(("loudness", mp3_path), analyze_loudness, mp3_path, done)
+
+    def load_song_envelope(self, song_path):
+        """Open the song's visualizer envelope, computing it in the background if needed"""
+        path = cached_envelope(song_path, self.library_index.get(song_path))
+        self.envelope = load_envelope(path) if path else None
+        if path:
+            return
+        
+        def done(result):
+            if not result:
+                return
+            self.library_index.update(song_path, content_hash=result[0])
+            if self.song_path == song_path:
+                self.envelope = load_envelope(result[1])
+        
+        self.jobs.submit(("envelope", song_path), render_envelope, song_path, done)
+
+    def envelope_frame(self):
+        """Visualizer levels and beat count at the displayed time, or None"""
+        if self.envelope is None:
+            return None
+        return envelope_frame(self.envelope, self.display_time() * self.audio_tempo)
+
+    def request_variant(self, song_path, source_path, key):
+        """Render a key/tempo variant of source_path in the background"""
+        def done(result):
+            if result and self.variant_cache.put(key) and self.song_path == song_path:
+                self.refresh_audio()
+        
+        job = (source_path, self.semitones, self.tempo, self.variant_cache.path_for(key))
+        self.jobs.submit(("variant", key), render_variant, job, done)
+
+    def prepare_upcoming(self):
+        """Pre-render what the next playlist song will need while this one plays"""
+        if self.playlist_mode and self.current_playlist:
+            song = self.current_playlist.peek_next(avoid=set(self.recent_songs))
+            if song and song[0] != self.song_path:
+                path, tempo = self.desired_audio(song[0])
+                duration = self.known_duration(song[0], tempo)
+                if duration is not None:
+                    self.audio_manager.prefetch(path, duration)
+                else:
+                    # Not measured yet: probe on a worker thread rather than stall the frame
+                    def done(duration):
+                        if duration:
+                            self.audio_manager.prefetch(path, duration)
+                    
+                    self.jobs.submit_io(("probe", path), probe_duration, path, done)
+
+    def known_duration(self, song_path, tempo=1.0):
+        """Length in seconds of song_path's audio at tempo, from the library index, or None"""
+        entry = self.library_index.get(song_path)
+        if not entry or not entry.get("duration"):
+            return None
+        return entry["duration"] / tempo
+
+    def toggle_instrumental(self):
+        """Swap between the original and the vocal-reduced track at the same position"""
+        if not self.song_path:
+            self.set_status("Load a song first", 2)
+            return
+        self.use_instrumental = not self.use_instrumental
+        self.refresh_audio()
+        if not self.use_instrumental:
+            self.set_status("Original vocals", 2)
+        elif cached_instrumental(self.song_path, self.library_index.get(self.song_path)):
+            self.set_status("Instrumental", 2)
+        else:
+            self.set_status("Preparing instrumental...", 3)
+
+    def change_variant(self, semitones=0, tempo=0.0):
+        """Adjust key by semitones and tempo by a step, then play the matching variant"""
+        if not self.song_path:
+            self.set_status("Load a song first", 2)
+            return
+        self.semitones = max(-MAX_SEMITONES, min(MAX_SEMITONES, self.semitones + semitones))
+        self.tempo = round(max(MIN_TEMPO, min(MAX_TEMPO, self.tempo + tempo)), 2)
+        self.refresh_audio()
+        self.prepare_upcoming()
+        label = f"Key {self.semitones:+d}, tempo {int(self.tempo * 100)}%"
+        if self.audio_tempo != self.tempo or (self.semitones and self.audio_path == self.song_path):
+            label += " (rendering...)"
+        self.set_status(label, 2)
+
+    def switch_audio(self, path, tempo=1.0):
+        """Play a different rendering of the current song from the same point in the song"""
+        song_position = self.current_time() * self.audio_tempo
+        duration = self.known_duration(self.song_path, tempo)
+        if duration is None:
+            duration = self.total_time * self.audio_tempo / tempo  # same song, so no need to probe
+        success, length = self.audio_manager.load_song(path, duration=duration)
+        if not success:
+            self.set_status("Error loading audio", 3)
+            return False
+        self.audio_path = path
+        self.audio_tempo = tempo
+        self.total_time = length
+        self.scale_lyrics()
+        self.seek_to(song_position / tempo)
+        if len(self.loop_points) == 2:
+            self.audio_manager.set_loop(self.loop_points[0] / tempo, self.loop_points[1] / tempo)
+        return True
+
+    def take_saved(self, take):
+        if take:
+            self.set_status(f"Take {take['id']} saved, <e> to export the mix", 2)
+        else:
+            self.set_status("Failed to save recording", 2)
+
+    def export_mix(self):
+        """Mix the takes over the current track in the background; mix_exported reports the file"""
+        session = self.recorder.session_for(self.audio_path)
+        key = ("mixdown", session.dir)
+        if self.jobs.is_running(key):
+            self.set_status("Already mixing takes", 2)
+            return
+        self.set_status("Mixing takes...", 60)
+        self.jobs.submit_io(key, self.recorder.export_mix, session, self.mix_exported)
+
+    def mix_exported(self, output_path):
+        if output_path:
+            self.set_status(f"Saved: {os.path.basename(output_path)}", 2)
+        else:
+            self.set_status("No takes to mix for this track", 2)
+
+    def toggle_loop(self):
+        """First press marks A, second marks B and starts looping, third clears"""
+        if not self.song_path:
+            self.set_status("Load a song first", 2)
+            return
+        song_time = self.current_time() * self.audio_tempo
+        if len(self.loop_points) == 2:
+            self.loop_points = []
+            self.audio_manager.clear_loop()
+            self.set_status("Loop off", 1)
+        elif not self.loop_points:
+            self.loop_points = [song_time]
+            self.set_status(f"Loop A {self.ui.format_time(song_time)}", 2)
+        elif self.audio_manager.set_loop(self.loop_points[0] / self.audio_tempo, self.current_time()):
+            self.loop_points.append(song_time)
+            self.set_status(f"Looping {self.ui.format_time(self.loop_points[0])}-{self.ui.format_time(song_time)}", 2)
+        else:
+            self.loop_points = []
+            self.set_status("Loop end must be after start", 2)
+
+    def load_state(self):
+        """Read the state saved by the last session"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_state(self):
+        """Queue the current song and playlist position for writing"""
+        state = {
+            "song_path": self.song_path,
+            "lrc_path": self.lrc_path,
+            "playlist": self.current_playlist.name if self.current_playlist else None,
+            "playlist_index": self.current_playlist.current_index if self.current_playlist else 0,
+            "recent_songs": list(self.recent_songs),
+        }
+        self.persistence.mark_dirty("player_state", lambda: atomic_write_json(self.state_path, state))
+
+    def current_time(self):
+        """Get the accurate current playback time in seconds"""
+        return min(self.total_time, self.audio_manager.get_time())
+
+    def toggle_analyzer(self):
+        if self.analyzer.running:
+            self.analyzer.stop()
+            self.set_status("Mic meter off", 1)
+        elif self.analyzer.start():
+            self.set_status("Mic meter on", 1)
+        else:
+            self.set_status("No microphone input", 2)
+
+    def update_scoring(self):
+        """Fold the newest pitch snapshot into the current line's score"""
+        snapshot = self.analyzer.snapshot
+        if not self.analyzer.running or snapshot.seq == self.last_pitch_seq or self.paused or not self.lyrics:
+            return
+        self.last_pitch_seq = snapshot.seq
+        reference = None
+        if self.melody is not None:
+            reference = reference_pitch(self.melody, snapshot.time * self.audio_tempo)
+        if reference is None:
+            # No reference melody: score whether the singer is singing at all
+            self.line_scorer.add(self.current_line_idx, snapshot.frequency > 0)
+        elif reference > 0:
+            if self.audio_path.startswith(self.variant_cache.cache_dir):
+                reference *= 2.0 ** (self.semitones / 12.0)
+            hit = snapshot.frequency > 0 and semitone_error(snapshot.frequency, reference) <= 1.0
+            self.line_scorer.add(self.current_line_idx, hit)
+
+    def display_time(self):
+        """Time to show: a pending seek target, previewed before the audio gets there"""
+        if self.pending_seek is not None:
+            return self.pending_seek
+        return self.current_time()
 
     def update_current_line(self):
         if not self.lyrics:
             return
-        current_time = self.current_time()
-        for i in range(len(self.lyrics)):
-            if i < len(self.lyrics) - 1:
-                if current_time >= self.lyrics[i][0] and current_time < self.lyrics[i+1][0]:
-                    self.current_line_idx = i
-                    return
-            else:
-                if current_time >= self.lyrics[i][0]:
-                    self.current_line_idx = i
-                    return
-        self.current_line_idx = 0
+        self.current_line_idx = current_line_index(self.lyrics, self.display_time())
 
     def seek_to(self, seconds):
         if seconds < 0:
@@ -193,12 +611,60 @@ class KaraokePlayer:
             seconds = self.total_time
         
         self.audio_manager.seek(seconds)
-        
-        self.seek_offset = seconds
-        self.playback_start_time = time.time()
-        self.last_update_time = time.time()
+        if self.paused:
+            self.audio_manager.pause()
         self.set_status(f"Seek → {self.ui.format_time(seconds)}", 1)
 
+    def queue_seek(self, delta):
+        """Move the pending seek target; the audio follows once keys settle"""
+        base = self.pending_seek if self.pending_seek is not None else self.current_time()
+        self.pending_seek = max(0.0, min(self.total_time, base + delta))
+        self.pending_seek_at = time.time() + SEEK_SETTLE
+        self.set_status(f"Seek → {self.ui.format_time(self.pending_seek)}", 1)
+
+    def apply_pending_seek(self, force=False):
+        """Send the pending seek to the audio once settled, or now if force is set"""
+        if self.pending_seek is None or (not force and time.time() < self.pending_seek_at):
+            return
+        target, self.pending_seek = self.pending_seek, None
+        self.seek_to(target)
+
+    def note_startup(self):
+        """Record how long the first menu took to reach the screen, flagging a miss of the budget"""
+        seconds = time.perf_counter() - self.started_at
+        self.profiler.startup["first_menu"] = seconds
+        if seconds > STARTUP_BUDGET:
+            self.set_status(f"Slow start: menu took {seconds * 1000:.0f} ms", 3)
+
+    def open_menu(self):
+        """Show the main menu over the player without stopping playback"""
+        self.ui.menu_manager.push(MainMenu(self))
+
+    def drain_input(self):
+        """Handle every key queued since the last frame. Returns False to quit"""
+        self.input_seen = False
+        while True:
+            key = self.stdscr.getch()
+            if key == -1:
+                break
+            self.input_seen = True  # answer keys with a frame even when rendering is throttled
+            if key == curses.KEY_RESIZE:
+                self.ui.invalidate_layout()
+                continue
+            if self.ui.menu_manager.active:
+                # An open menu takes every key; playback carries on underneath
+                self.ui.menu_manager.handle_key(key)
+                if self.quit_requested:
+                    return False
+                continue
+            if key not in SEEK_KEYS:
+                # Keep order: anything else acts on the position the user seeked to
+                self.apply_pending_seek(force=True)
+            if not self.handle_input(key):
+                return False
+        self.apply_pending_seek()
+        return True
+
     def handle_input(self, key):
         if key == ord('q'):
             return False
@@ -207,23 +673,19 @@ class KaraokePlayer:
             if self.paused:
                 self.audio_manager.unpause()
                 self.paused = False
-                self.playback_start_time = time.time()
                 self.set_status("Playing", 1)
             else:
                 self.audio_manager.pause()
                 self.paused = True
-                self.seek_offset = self.current_time()
                 self.set_status("Paused", 1)
         
         elif key == curses.KEY_LEFT:
             if not self.paused:
-                new_pos = max(0, self.current_time() - 5)
-                self.seek_to(new_pos)
+                self.queue_seek(-SEEK_STEP)
         
         elif key == curses.KEY_RIGHT:
             if not self.paused:
-                new_pos = min(self.total_time, self.current_time() + 5)
-                self.seek_to(new_pos)
+                self.queue_seek(SEEK_STEP)
         
         elif key == ord('n'):
             # Next song in playlist
@@ -241,17 +703,38 @@ class KaraokePlayer:
                 shuffle_state = self.current_playlist.toggle_shuffle()
                 mode = "ON" if shuffle_state else "OFF"
                 self.set_status(f"Shuffle {mode}", 2)
-                self.playlist_manager.save_playlist(self.current_playlist.name)
+                self.playlist_manager.mark_dirty(self.current_playlist.name)
+        elif key == ord('v'):
+            self.toggle_instrumental()
+        elif key in (ord('+'), ord('=')):
+            self.change_variant(semitones=1)
+        elif key == ord('-'):
+            self.change_variant(semitones=-1)
+        elif key == ord(']'):
+            self.change_variant(tempo=0.05)
+        elif key == ord('['):
+            self.change_variant(tempo=-0.05)
+        elif key == ord('o'):
+            self.open_menu()
+        elif key == ord('l'):
+            self.toggle_loop()
+        elif key == ord('m'):
+            self.toggle_analyzer()
+        elif key == ord('e'):
+            if not self.song_path:
+                self.set_status("Load a song first", 2)
+            else:
+                self.export_mix()
         elif key == ord('r'):
             if not self.song_path:
                 self.set_status("Load a song first", 2)
             elif self.is_recording:
                 # Stop recording
                 self.is_recording = False
-                self.set_status("Saving recording...", 1)
-                output_path = self.recorder.stop_recording(self.song_path, self.current_time())
-                if output_path:
-                    self.set_status(f"Saved: {os.path.basename(output_path)}", 2)
+                capture = self.recorder.stop_recording(self.audio_path, self.current_time())
+                if capture:
+                    self.set_status("Saving take...", 60)
+                    self.jobs.submit_io(("take", id(capture)), self.recorder.save_take, capture, self.take_saved)
                 else:
                     self.set_status("Failed to save recording", 2)
             else:
@@ -282,13 +765,15 @@ class KaraokePlayer:
             return False
         
         mp3_path, lrc_path = song
+        if self.no_repeat_window:
+            self.recent_songs.append(mp3_path)
         if self.load_song(mp3_path, lrc_path):
-            self.seek_to(0.0)
             song_name = os.path.basename(mp3_path)[:-4]
             shuffle_indicator = "🔀 " if self.current_playlist.shuffle_mode else ""
             song_num = self.current_playlist.current_index + 1
-            total_songs = len(self.current_playlist.songs)
+            total_songs = len(self.current_playlist)
             self.set_status(f"{shuffle_indicator}[{song_num}/{total_songs}] {song_name}", 3)
+            self.prepare_upcoming()
             return True
         return False
     
@@ -298,7 +783,7 @@ class KaraokePlayer:
             return False
         
         self.audio_manager.stop()
-        self.current_playlist.next_song()
+        self.current_playlist.next_song(avoid=set(self.recent_songs))
         return self.play_current_in_playlist()
     
     def play_previous_in_playlist(self):
@@ -312,18 +797,34 @@ class KaraokePlayer:
     
     def check_song_ended(self):
         """Check if current song has ended and auto-play next"""
-        if self.playlist_mode and self.current_playlist:
+        # The length from load is the container's estimate; take the real one once decoded
+        length = self.audio_manager.get_length()
+        if length is not None:
+            self.total_time = length
+        if self.playlist_mode and self.current_playlist and self.pending_seek is None and self.loading is None:
             current_time = self.current_time()
-            if current_time >= self.total_time - 0.5:  # 0.5s buffer
+            if self.audio_manager.finished() or current_time >= self.total_time - 0.5:  # 0.5s buffer
                 time.sleep(0.5)  # Brief pause between songs
                 self.play_next_in_playlist()
     
     def cleanup(self):
         # Stop recording if active
         if self.is_recording:
-            self.recorder.stop_recording(self.song_path, self.current_time())
+            capture = self.recorder.stop_recording(self.audio_path, self.current_time())
+            if capture:
+                self.recorder.save_take(capture)
         self.recorder.cleanup()
+        self.analyzer.stop()
+        # A stream still being opened would outlive the engine closing below,
+        # and shutdown would cancel a take or export still queued
+        self.jobs.wait(("warm_up", "audio"))
+        for key in [key for key in self.jobs.running if key[0] in ("take", "mixdown")]:
+            self.jobs.wait(key)
+        self.jobs.shutdown()
         self.audio_manager.cleanup()
+        self.persistence.close()
+        if self.frame_stats_path:
+            self.profiler.dump(self.frame_stats_path)
         curses.nocbreak()
         self.stdscr.keypad(False)
         curses.echo()
@@ -332,25 +833,45 @@ class KaraokePlayer:
     def run(self):
         self.stdscr.nodelay(True)
         self.stdscr.timeout(50)
-        self.ui.show_file_loader(self)
+        self.open_menu()
         
+        profiler = self.profiler
         while True:
+            profiler.start_frame()
             current_time = time.time()
             
+            # Input first, so held keys never queue up behind frame work
+            with profiler.phase("input"):
+                if not self.drain_input():
+                    break
+            
             # Check if song ended and auto-play next
-            self.check_song_ended()
+            with profiler.phase("song_end"):
+                self.check_song_ended()
+            
+            # Apply results of finished background jobs
+            with profiler.phase("jobs"):
+                self.jobs.poll()
+            
+            # Age songs out of time-limited smart playlists
+            if current_time - self.last_expiry_check > 1.0:
+                with profiler.phase("expiry"):
+                    self.playlist_manager.expire_smart_playlists()
+                self.last_expiry_check = current_time
             
             # Update animation
-            self.ui.update_animation(current_time)
+            with profiler.phase("animation"):
+                frame = self.envelope_frame()
+                self.ui.update_animation(current_time, None if frame is None else int(frame[-1]))
             
             # Update current line
-            self.update_current_line()
-            
-            # Handle input
-            key = self.stdscr.getch()
-            if key != -1:
-                if not self.handle_input(key):
-                    break
+            with profiler.phase("lyrics"):
+                self.update_current_line()
+                self.update_scoring()
             
-            self.ui.draw(self)
-            time.sleep(0.02)  # 50 FPS cap
+            with profiler.phase("draw", output=True):
+                self.ui.draw(self, urgent=self.input_seen)
+            if "first_menu" not in profiler.startup:
+                self.note_startup()
+            with profiler.phase("sleep"):
+                time.sleep(0.02)  # 50 FPS cap
@@ -1,69 +1,245 @@
 import os
-import random
 import json
+import heapq
+import time
 from pathlib import Path
+from .persistence import append_lines, atomic_write_json
+from .shuffle import ShuffleEngine
+from .smart import SmartQuery
 
 class Playlist:
+    """Ordered playlist with a hash index for membership and position lookups"""
+    __slots__ = (
+        "name", "current_index", "shuffle_mode", "shuffle",
+        "_entries", "_index", "_next_id", "_songs", "_positions",
+        "_journal", "snapshot_stale",
+    )
+
     def __init__(self, name, songs=None):
         self.name = name
-        self.songs = songs or []  # List of (mp3_path, lrc_path) tuples
         self.current_index = 0
         self.shuffle_mode = False
-        self.shuffle_order = []
-        
+        self.shuffle = ShuffleEngine()
+        self._entries = {}  # entry id -> (mp3_path, lrc_path), in playlist order
+        self._index = {}  # (mp3_path, lrc_path) -> entry id
+        self._next_id = 0
+        self._songs = None  # list view of _entries, rebuilt lazily after edits
+        self._positions = None  # entry id -> position, rebuilt with _songs
+        self._journal = []  # edits not yet appended to disk
+        self.snapshot_stale = True
+        for mp3_path, lrc_path in songs or []:
+            self._insert(self._next_id, (mp3_path, lrc_path))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, song):
+        return tuple(song) in self._index
+
+    @property
+    def songs(self):
+        """Songs in playlist order as (mp3_path, lrc_path) tuples"""
+        if self._songs is None:
+            self._build_view()
+        return self._songs
+
+    def _build_view(self):
+        self._songs = list(self._entries.values())
+        self._positions = {entry_id: pos for pos, entry_id in enumerate(self._entries)}
+
+    def _insert(self, entry_id, song):
+        if song in self._index:
+            return self._index[song]
+        self._entries[entry_id] = song
+        self._index[song] = entry_id
+        self._next_id = max(self._next_id, entry_id + 1)
+        self._songs = None
+        return entry_id
+
+    def _delete(self, entry_id):
+        song = self._entries.pop(entry_id, None)
+        if song is None:
+            return None
+        del self._index[song]
+        self._songs = None
+        return song
+
+    def entry_id(self, mp3_path, lrc_path):
+        """Get the stable entry id of a song, or None if it is not in the playlist"""
+        return self._index.get((mp3_path, lrc_path))
+
+    def position(self, mp3_path, lrc_path):
+        """Get the position of a song in the playlist, or -1"""
+        entry_id = self._index.get((mp3_path, lrc_path))
+        if entry_id is None:
+            return -1
+        if self._songs is None:
+            self._build_view()
+        return self._positions[entry_id]
+
     def add_song(self, mp3_path, lrc_path):
         """Add a song to the playlist"""
-        self.songs.append((mp3_path, lrc_path))
-        
+        song = (mp3_path, lrc_path)
+        if song in self._index:
+            return self._index[song]
+        entry_id = self._insert(self._next_id, song)
+        self._journal.append({"op": "add", "id": entry_id, "song": list(song)})
+        return entry_id
+
+    def discard_song(self, mp3_path, lrc_path):
+        """Remove a song from the playlist if present"""
+        entry_id = self._index.get((mp3_path, lrc_path))
+        if entry_id is None:
+            return False
+        self._delete(entry_id)
+        self._journal.append({"op": "remove", "id": entry_id})
+        return True
+
+    def toggle_song(self, mp3_path, lrc_path):
+        """Add the song if missing, remove it otherwise. Returns True if now present"""
+        if self.discard_song(mp3_path, lrc_path):
+            return False
+        self.add_song(mp3_path, lrc_path)
+        return True
+
+    def replace_song(self, old_song, new_song):
+        """Point old_song's entry at new_song, keeping its id and position"""
+        old_song, new_song = tuple(old_song), tuple(new_song)
+        entry_id = self._index.get(old_song)
+        if entry_id is None:
+            return False
+        if new_song in self._index:
+            return self.discard_song(*old_song)
+        self._set_entry(entry_id, new_song)
+        self._journal.append({"op": "replace", "id": entry_id, "song": list(new_song)})
+        return True
+
+    def _set_entry(self, entry_id, song):
+        del self._index[self._entries[entry_id]]
+        self._entries[entry_id] = song
+        self._index[song] = entry_id
+        self._songs = None
+
     def remove_song(self, index):
         """Remove a song from the playlist"""
-        if 0 <= index < len(self.songs):
-            del self.songs[index]
+        if 0 <= index < len(self._entries):
+            self.discard_song(*self.songs[index])
+
+    def apply_journal_entry(self, entry):
+        """Replay one persisted edit without journaling it again"""
+        op = entry.get("op")
+        if op == "add":
+            self._insert(entry["id"], tuple(entry["song"]))
+        elif op == "remove":
+            self._delete(entry["id"])
+        elif op == "replace" and entry["id"] in self._entries:
+            self._set_entry(entry["id"], tuple(entry["song"]))
+        elif op == "shuffle":
+            self.shuffle_mode = entry["value"]
+
+    def drain_journal(self):
+        """Take the edits made since the last call"""
+        journal, self._journal = self._journal, []
+        return journal
+
+    def snapshot(self):
+        """Full serialisable state of the playlist"""
+        entries = self._entries.copy()
+        return {
+            "name": self.name,
+            "songs": list(entries.values()),
+            "ids": list(entries),
+            "next_id": self._next_id,
+            "shuffle_mode": self.shuffle_mode,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Build a playlist from snapshot() output or the older songs-only format"""
+        playlist = cls(data["name"])
+        songs = data.get("songs", [])
+        ids = data.get("ids") or range(len(songs))
+        for entry_id, (mp3_path, lrc_path) in zip(ids, songs):
+            playlist._insert(entry_id, (mp3_path, lrc_path))
+        playlist._next_id = max(playlist._next_id, data.get("next_id", 0))
+        playlist.shuffle_mode = data.get("shuffle_mode", False)
+        playlist.snapshot_stale = "ids" not in data
+        return playlist
             
     def get_current_song(self):
         """Get the current song"""
-        if not self.songs:
+        if not self._entries:
             return None
         if self.shuffle_mode:
-            if not self.shuffle_order:
-                self.regenerate_shuffle()
-            if self.current_index < len(self.shuffle_order):
-                return self.songs[self.shuffle_order[self.current_index]]
-            return None
+            song = self._entries.get(self.shuffle.current())
+            if song is None:
+                # Nothing drawn yet, or the playing entry was removed
+                song = self._entries[self.shuffle.next(self._entries, self._next_id)]
+                self.current_index = self.shuffle.position - 1
+            return song
         else:
-            if self.current_index < len(self.songs):
-                return self.songs[self.current_index]
+            songs = self.songs
+            if self.current_index < len(songs):
+                return songs[self.current_index]
             return None
             
-    def next_song(self):
-        """Move to next song"""
-        if not self.songs:
+    def next_song(self, avoid=()):
+        """Move to next song, passing over songs in avoid when shuffling"""
+        if not self._entries:
             return None
+        if self.shuffle_mode:
+            self.shuffle.next(self._entries, self._next_id, avoid)
+            self.current_index = self.shuffle.position - 1
+            return self.get_current_song()
         self.current_index += 1
-        if self.current_index >= len(self.songs):
+        if self.current_index >= len(self._entries):
             self.current_index = 0
         return self.get_current_song()
         
+    def peek_next(self, avoid=()):
+        """The song next_song() will move to, without moving"""
+        if not self._entries:
+            return None
+        if self.shuffle_mode:
+            return self._entries.get(self.shuffle.peek(self._entries, self._next_id, avoid))
+        songs = self.songs
+        return songs[(self.current_index + 1) % len(songs)]
+        
     def previous_song(self):
-        """Move to previous song"""
-        if not self.songs:
+        """Move to previous song, retracing play history when shuffling"""
+        if not self._entries:
             return None
+        if self.shuffle_mode:
+            self.shuffle.previous(self._entries)
+            self.current_index = self.shuffle.position - 1
+            return self.get_current_song()
         self.current_index -= 1
         if self.current_index < 0:
-            self.current_index = len(self.songs) - 1
+            self.current_index = len(self._entries) - 1
         return self.get_current_song()
+
+    def _current_entry_id(self):
+        songs = self.songs
+        if 0 <= self.current_index < len(songs):
+            return self._index[songs[self.current_index]]
+        return None
         
     def toggle_shuffle(self):
-        """Toggle shuffle mode"""
-        self.shuffle_mode = not self.shuffle_mode
+        """Toggle shuffle mode, keeping the current song current"""
         if self.shuffle_mode:
-            self.regenerate_shuffle()
+            current = self._entries.get(self.shuffle.current())
+            self.shuffle_mode = False
+            self.current_index = max(0, self.position(*current)) if current else 0
+        else:
+            self.shuffle_mode = True
+            self.shuffle.restart(self._next_id, self._current_entry_id())
+            self.current_index = 0
+        self._journal.append({"op": "shuffle", "value": self.shuffle_mode})
         return self.shuffle_mode
         
     def regenerate_shuffle(self):
-        """Generate new shuffle order"""
-        self.shuffle_order = list(range(len(self.songs)))
-        random.shuffle(self.shuffle_order)
+        """Start a new shuffle order"""
+        self.shuffle.restart(self._next_id)
         
     def reset(self):
         """Reset to first song"""
@@ -72,32 +248,131 @@ class Playlist:
             self.regenerate_shuffle()
 
 
+class SmartPlaylist(Playlist):
+    """Playlist holding the library songs that match a query, kept current incrementally"""
+    __slots__ = ("query", "expiry", "expires")
+
+    def __init__(self, name, query):
+        super().__init__(name)
+        self.query = query
+        self.expiry = []  # heap of (expires_at, mp3_path, lrc_path) for time-limited matches
+        self.expires = {}  # (mp3_path, lrc_path) -> expires_at of its live heap item
+
+    def evaluate(self, mp3_path, entry, now=None):
+        """Re-check one indexed song after it was added or updated; removals go through drop()"""
+        now = now or time.time()
+        if self.query.matches(mp3_path, entry, now):
+            song = (mp3_path, entry["lrc_path"])
+            self._insert(self._next_id, song)
+            expires_at = self.query.expires_at(entry)
+            # Most updates (play counts, loudness) leave the expiry as it was
+            if expires_at is not None and self.expires.get(song) != expires_at:
+                self.expires[song] = expires_at
+                heapq.heappush(self.expiry, (expires_at, mp3_path, entry["lrc_path"]))
+        else:
+            self.drop(mp3_path, entry["lrc_path"])
+
+    def drop(self, mp3_path, lrc_path):
+        """Remove a song that left the library"""
+        self.expires.pop((mp3_path, lrc_path), None)
+        entry_id = self._index.get((mp3_path, lrc_path))
+        if entry_id is not None:
+            self._delete(entry_id)
+        if len(self.expiry) > 2 * len(self.expires) + 64:
+            # Mostly items of songs since dropped or re-timed
+            self.expiry = [(expires_at, *song) for song, expires_at in self.expires.items()]
+            heapq.heapify(self.expiry)
+
+    def expire(self, now=None):
+        """Drop songs whose time window has passed. Returns True if any were dropped"""
+        now = now or time.time()
+        changed = False
+        while self.expiry and self.expiry[0][0] <= now:
+            expires_at, mp3_path, lrc_path = heapq.heappop(self.expiry)
+            song = (mp3_path, lrc_path)
+            if self.expires.get(song) != expires_at:
+                continue  # superseded by a later item for the song
+            del self.expires[song]
+            entry_id = self._index.get(song)
+            if entry_id is not None:
+                self._delete(entry_id)
+                changed = True
+        return changed
+
+    def rebuild(self, index):
+        """Evaluate the query against every indexed song, keeping the ids of songs that still match"""
+        self.expiry = []
+        self.expires = {}
+        now = time.time()
+        with index.lock:
+            entries = list(index.entries.items())
+        for mp3_path, entry in entries:
+            self.evaluate(mp3_path, entry, now)
+        indexed = {(mp3_path, entry["lrc_path"]) for mp3_path, entry in entries}
+        for entry_id, song in list(self._entries.items()):
+            if song not in indexed:
+                self._delete(entry_id)
+
+    def snapshot(self):
+        """Smart playlists persist their definition, never their songs"""
+        return {
+            "name": self.name,
+            "query": self.query.to_dict(),
+            "shuffle_mode": self.shuffle_mode,
+        }
+
+    @classmethod
+    def from_definition(cls, data):
+        playlist = cls(data["name"], SmartQuery.from_dict(data.get("query", {})))
+        playlist.shuffle_mode = data.get("shuffle_mode", False)
+        return playlist
+
+
 class PlaylistManager:
-    def __init__(self, library_path):
+    # The journal is folded into the snapshot once it holds more edits than
+    # this or than the playlist has songs, keeping appends amortised O(1)
+    COMPACT_MIN_OPS = 64
+
+    def __init__(self, library_path, persistence=None, load=True):
         self.library_path = library_path
+        self.persistence = persistence
         self.playlists = {}
         self.current_playlist = None
+        self.journal_lengths = {}
+        self.load_errors = []
+        self.index = None
         self.playlists_dir = os.path.join(library_path, "playlists")
         os.makedirs(self.playlists_dir, exist_ok=True)
-        self.load_playlists()
+        if load:
+            self.load_playlists()
         
     def create_playlist(self, name):
         """Create a new playlist"""
         if name in self.playlists:
             return False
         self.playlists[name] = Playlist(name)
-        self.save_playlist(name)
+        self.mark_dirty(name)
         return True
         
     def delete_playlist(self, name):
         """Delete a playlist"""
         if name in self.playlists:
             del self.playlists[name]
-            playlist_file = os.path.join(self.playlists_dir, f"{name}.json")
-            if os.path.exists(playlist_file):
-                os.remove(playlist_file)
+            self.journal_lengths.pop(name, None)
+            if self.persistence is None:
+                self.remove_playlist_files(name)
+            else:
+                # On the writer thread, so a save already running can't write the files back
+                self.persistence.cancel(f"playlist:{name}")
+                self.persistence.mark_dirty(f"delete:{name}", lambda: self.remove_playlist_files(name))
             return True
         return False
+
+    def remove_playlist_files(self, name):
+        """Delete a playlist's snapshot, journal and smart definition"""
+        for playlist_file in (self._snapshot_path(name), self._journal_path(name), self._smart_path(name)):
+            if os.path.exists(playlist_file):
+                os.remove(playlist_file)
         
     def get_playlist(self, name):
         """Get a playlist by name"""
@@ -129,59 +404,188 @@ class PlaylistManager:
             
         playlist = Playlist(playlist_name, mp3_files)
         self.playlists[playlist_name] = playlist
-        self.save_playlist(playlist_name)
+        self.mark_dirty(playlist_name)
         return playlist
         
     def create_playlist_from_library(self):
-        """Create a playlist from all songs in the main library"""
-        return self.create_playlist_from_folder(self.library_path, "All Songs")
+        """All Songs: a smart playlist over the library index once one is attached.
+
+        Libraries from before smart playlists have a static All Songs saved;
+        it is replaced by the smart one, keeping its shuffle setting.
+        """
+        existing = self.playlists.get("All Songs")
+        if self.index is None:
+            return existing or self.create_playlist_from_folder(self.library_path, "All Songs")
+        if isinstance(existing, SmartPlaylist):
+            return existing
+        if existing is not None:
+            self.delete_playlist("All Songs")  # queued before the smart definition's save
+        playlist = self.create_smart_playlist("All Songs", SmartQuery())
+        if playlist is not None and existing is not None and existing.shuffle_mode:
+            playlist.shuffle_mode = True
+            self.mark_dirty("All Songs")
+        return playlist
+
+    def create_smart_playlist(self, name, query):
+        """Create a playlist defined by a query over the library index"""
+        if name in self.playlists or self.index is None:
+            return None
+        playlist = SmartPlaylist(name, query)
+        playlist.rebuild(self.index)
+        self.playlists[name] = playlist
+        self.mark_dirty(name)
+        return playlist
+
+    def attach_index(self, index):
+        """Materialise smart playlists from the library index and follow its changes"""
+        self.index = index
+        index.add_listener(self._on_index_event)
+        for playlist in self.playlists.values():
+            if isinstance(playlist, SmartPlaylist):
+                playlist.rebuild(index)
+
+    def _on_index_event(self, event, mp3_path, entry):
+        now = time.time()
+        for playlist in list(self.playlists.values()):
+            if isinstance(playlist, SmartPlaylist):
+                if event == "remove":
+                    playlist.drop(mp3_path, entry["lrc_path"])
+                else:
+                    playlist.evaluate(mp3_path, entry, now)
+
+    def expire_smart_playlists(self, now=None):
+        """Drop songs that aged out of time-limited smart playlists"""
+        for playlist in self.playlists.values():
+            if isinstance(playlist, SmartPlaylist):
+                playlist.expire(now)
         
+    def _snapshot_path(self, name):
+        return os.path.join(self.playlists_dir, f"{name}.json")
+
+    def _journal_path(self, name):
+        return os.path.join(self.playlists_dir, f"{name}.journal")
+
+    def _smart_path(self, name):
+        return os.path.join(self.playlists_dir, f"{name}.smart")
+
+    def mark_dirty(self, name):
+        """Queue a playlist save on the persistence thread, or save now without one"""
+        if self.persistence is None:
+            return self.save_playlist(name)
+        self.persistence.mark_dirty(f"playlist:{name}", lambda: self.save_playlist(name))
+        return True
+
     def save_playlist(self, name):
-        """Save playlist to JSON file"""
-        if name not in self.playlists:
+        """Append pending edits to the playlist journal, compacting it when it grows"""
+        playlist = self.playlists.get(name)
+        if playlist is None:
             return False
             
-        playlist = self.playlists[name]
-        playlist_file = os.path.join(self.playlists_dir, f"{name}.json")
-        
-        data = {
-            "name": playlist.name,
-            "songs": playlist.songs,
-            "shuffle_mode": playlist.shuffle_mode
-        }
+        ops = playlist.drain_journal()
+        if isinstance(playlist, SmartPlaylist):
+            try:
+                atomic_write_json(self._smart_path(name), playlist.snapshot())
+                return True
+            except Exception:
+                return False
+        journal_length = self.journal_lengths.get(name, 0) + len(ops)
         
         try:
-            with open(playlist_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            if playlist.snapshot_stale or journal_length > max(self.COMPACT_MIN_OPS, len(playlist)):
+                self.compact_playlist(name)
+            elif ops:
+                append_lines(self._journal_path(name), [json.dumps(op) for op in ops])
+                self.journal_lengths[name] = journal_length
             return True
         except Exception:
+            # The drained edits are gone; rewrite the full snapshot next time
+            playlist.snapshot_stale = True
             return False
+
+    def compact_playlist(self, name):
+        """Rewrite the playlist snapshot and drop its journal"""
+        playlist = self.playlists[name]
+        atomic_write_json(self._snapshot_path(name), playlist.snapshot())
+        journal_file = self._journal_path(name)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+        playlist.snapshot_stale = False
+        self.journal_lengths[name] = 0
             
     def load_playlists(self):
-        """Load all playlists from JSON files"""
+        """Load all playlists from their snapshots and journals"""
+        self.add_loaded(self.read_playlists())
+
+    def add_loaded(self, loaded):
+        """Take in read_playlists output. Playlists already in memory win over their files"""
+        playlists, journal_lengths, errors = loaded
+        for name, playlist in playlists.items():
+            if name in self.playlists:
+                continue
+            self.playlists[name] = playlist
+            if name in journal_lengths:
+                self.journal_lengths[name] = journal_lengths[name]
+            if self.index is not None and isinstance(playlist, SmartPlaylist):
+                playlist.rebuild(self.index)
+        self.load_errors.extend(errors)
+
+    def read_playlists(self):
+        """Read every playlist from disk without touching the loaded ones.
+
+        Safe to call from a worker thread. Returns (playlists by name,
+        journal lengths by name, [(file, error)]) for add_loaded.
+        """
+        playlists = {}
+        journal_lengths = {}
+        errors = []
         if not os.path.exists(self.playlists_dir):
-            return
+            return playlists, journal_lengths, errors
             
-        for file in os.listdir(self.playlists_dir):
-            if file.endswith('.json'):
+        for file in sorted(os.listdir(self.playlists_dir)):
+            if file.endswith('.smart'):
+                try:
+                    with open(os.path.join(self.playlists_dir, file), 'r', encoding='utf-8') as f:
+                        playlist = SmartPlaylist.from_definition(json.load(f))
+                    playlists[playlist.name] = playlist
+                except Exception as e:
+                    errors.append((file, str(e)))
+            elif file.endswith('.json'):
+                if os.path.exists(self._smart_path(file[:-5])):
+                    continue  # a static copy left behind when the playlist became smart
                 playlist_file = os.path.join(self.playlists_dir, file)
                 try:
                     with open(playlist_file, 'r', encoding='utf-8') as f:
                         data = json.load(f)
+                    playlist = Playlist.from_snapshot(data)
+                    
+                    journal_length = 0
+                    journal_file = self._journal_path(file[:-5])
+                    if os.path.exists(journal_file):
+                        with open(journal_file, 'r', encoding='utf-8') as f:
+                            for line in f:
+                                try:
+                                    playlist.apply_journal_entry(json.loads(line))
+                                except (ValueError, KeyError):
+                                    # Torn final line from an interrupted append. Appending
+                                    # after it would glue the next edit onto the fragment,
+                                    # so the next save rewrites the snapshot instead
+                                    playlist.snapshot_stale = True
+                                    continue
+                                journal_length += 1
                     
                     # Verify all songs still exist
-                    valid_songs = []
-                    for mp3_path, lrc_path in data.get("songs", []):
-                        if os.path.exists(mp3_path) and os.path.exists(lrc_path):
-                            valid_songs.append((mp3_path, lrc_path))
+                    for mp3_path, lrc_path in list(playlist.songs):
+                        if not (os.path.exists(mp3_path) and os.path.exists(lrc_path)):
+                            playlist.discard_song(mp3_path, lrc_path)
                     
-                    if valid_songs:
-                        playlist = Playlist(data["name"], valid_songs)
-                        playlist.shuffle_mode = data.get("shuffle_mode", False)
-                        self.playlists[data["name"]] = playlist
-                except Exception:
+                    if len(playlist):
+                        playlists[playlist.name] = playlist
+                        journal_lengths[playlist.name] = journal_length
+                except Exception as e:
+                    errors.append((file, str(e)))
                     continue
-                    
+        return playlists, journal_lengths, errors
+
     def scan_library_folders(self):
         """Scan library for subfolders and create playlists"""
         playlists_created = []
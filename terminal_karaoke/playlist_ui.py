@@ -1,274 +1,201 @@
 import curses
 import os
-import time
+from .playlist import SmartPlaylist
+from .smart import SmartQuery
+from .menus import ESC, Menu, MessageMenu, PromptMenu, library_songs, number_key
 
-class PlaylistUI:
-    def __init__(self, stdscr):
-        self.stdscr = stdscr
-    
-    def get_input(self, y, x, prompt=""):
-        """Get text input from user"""
-        if prompt:
-            self.stdscr.addstr(y, x, prompt, curses.color_pair(7))
-            y += 1
-            
-        user_input = ""
-        while True:
-            self.stdscr.addstr(y, x, " " * 50)
-            self.stdscr.addstr(y, x, user_input + "_", curses.color_pair(2))
-            self.stdscr.refresh()
-            key = self.stdscr.getch()
-            if key == 10:  # Enter
-                break
-            elif key in [127, 8, 263]:  # Backspace
-                user_input = user_input[:-1]
-            elif 32 <= key <= 126:
-                user_input += chr(key)
-        return user_input
-    
-    def show_enhanced_playlist_selector(self, player):
-        """Show playlists with All Songs as default option"""
-        all_songs = player.playlist_manager.get_playlist("All Songs")
-        if not all_songs:
-            all_songs = player.playlist_manager.create_playlist_from_library()
-        
-        playlists = player.playlist_manager.list_playlists()
-        
+
+class PlaylistSelectorMenu(Menu):
+    """Playlists with All Songs as the default option"""
+
+    title = " SELECT PLAYLIST "
+
+    def __init__(self, player):
+        super().__init__(player)
+        self.editing = False  # waiting for the number of a playlist to edit
+        self.resume()
+
+    def resume(self):
+        manager = self.player.playlist_manager
+        # All Songs follows the library index, so it waits for the index to load
+        self.loading = bool(self.player.warming & {"playlists", "library"})
+        if not self.loading and not isinstance(manager.get_playlist("All Songs"), SmartPlaylist):
+            manager.create_playlist_from_library()
+        playlists = manager.list_playlists()
         if "All Songs" in playlists:
             playlists.remove("All Songs")
             playlists.insert(0, "All Songs")
-        
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        
-        title = " SELECT PLAYLIST "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(1, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        instruction = "Press 'c' to create | 'e' to edit"
-        self.stdscr.addstr(1, width - len(instruction) - 2, instruction, curses.color_pair(5))
-        
-        if not playlists:
-            msg = "No songs in library. Download or add songs first!"
-            x = (width - len(msg)) // 2
-            self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-            self.stdscr.addstr(height-2, 2, "Press 'c' to create playlist or 'q' to go back", curses.color_pair(2))
-            self.stdscr.refresh()
-            while True:
-                key = self.stdscr.getch()
-                if key == ord('q'):
-                    return False
-                elif key == ord('c'):
-                    self.show_create_playlist(player)
-                    return False
-            return False
-        
-        self.stdscr.addstr(3, 2, "Available playlists:", curses.color_pair(7))
-        
-        for i, playlist_name in enumerate(playlists[:height-10]):
-            playlist = player.playlist_manager.get_playlist(playlist_name)
-            song_count = len(playlist.songs)
+        self.playlists = playlists
+        self.editing = False
+
+    @property
+    def hint(self):
+        if self.editing:
+            return "Enter playlist number to edit"
+        if not self.playlists:
+            return "Press 'c' to create playlist or 'q' to go back"
+        return "Enter number, 'c' to create, 'm' for smart, 'e' to edit, or 'q' to go back"
+
+    def update(self, now):
+        if self.loading and not self.player.warming & {"playlists", "library"}:
+            self.resume()
+
+    def rows(self):
+        if not self.playlists and self.loading:
+            return [("", 7, 0), ("Loading library...", 8, 0)]
+        if not self.playlists:
+            return [("", 7, 0), ("No songs in library. Download or add songs first!", 4, 0)]
+        rows = [("Available playlists:", 7, 0), ("", 7, 0)]
+        manager = self.player.playlist_manager
+        for i, playlist_name in enumerate(self.playlists[:9]):
+            playlist = manager.get_playlist(playlist_name)
+            song_count = len(playlist)
             if playlist_name == "All Songs":
-                display = f"{i+1}. {playlist_name} ({song_count} songs) [Default]"
-                self.stdscr.addstr(5 + i, 4, display, curses.color_pair(3) | curses.A_BOLD)
+                rows.append((f"  {i+1}. {playlist_name} ({song_count} songs) [Default]", 3, curses.A_BOLD))
+            elif isinstance(playlist, SmartPlaylist):
+                rows.append((f"  {i+1}. {playlist_name} ({song_count} songs) [Smart]", 8, 0))
             else:
-                display = f"{i+1}. {playlist_name} ({song_count} songs)"
-                self.stdscr.addstr(5 + i, 4, display, curses.color_pair(7))
-        
-        self.stdscr.addstr(height-2, 2, "Enter number, 'c' to create, 'e' to edit, or 'q' to go back: ", curses.color_pair(2))
-        self.stdscr.refresh()
-        
-        while True:
-            key = self.stdscr.getch()
-            if key == ord('q'):
-                return False
-            elif key == ord('c'):
-                self.show_create_playlist(player)
-                return self.show_enhanced_playlist_selector(player)
-            elif key == ord('e'):
-                self.stdscr.addstr(height-1, 2, "Enter playlist number to edit: ", curses.color_pair(3))
-                self.stdscr.refresh()
-                edit_key = self.stdscr.getch()
-                if ord('1') <= edit_key <= ord('9'):
-                    idx = edit_key - ord('1')
-                    if idx < len(playlists):
-                        playlist = player.playlist_manager.get_playlist(playlists[idx])
-                        if playlist and playlist.name != "All Songs":
-                            self.edit_playlist(player, playlist)
-                            return self.show_enhanced_playlist_selector(player)
-                        elif playlist and playlist.name == "All Songs":
-                            self.stdscr.clear()
-                            msg = "Cannot edit 'All Songs' playlist"
-                            x = (width - len(msg)) // 2
-                            self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-                            self.stdscr.refresh()
-                            time.sleep(1.5)
-                            return self.show_enhanced_playlist_selector(player)
-            elif ord('1') <= key <= ord('9'):
-                idx = key - ord('1')
-                if idx < len(playlists):
-                    playlist = player.playlist_manager.get_playlist(playlists[idx])
-                    if playlist:
-                        player.load_playlist(playlist)
-                        return True
-        return False
-    
-    def show_create_playlist(self, player):
-        """Create a new playlist by selecting songs"""
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
-        
-        title = " CREATE NEW PLAYLIST "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(2, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-        
-        self.stdscr.addstr(5, (width - 40) // 2, "Enter playlist name:", curses.color_pair(7))
-        playlist_name = self.get_input(6, (width - 30) // 2)
-        
+                rows.append((f"  {i+1}. {playlist_name} ({song_count} songs)", 7, 0))
+        return rows
+
+    def handle_key(self, key):
+        player = self.player
+        index = number_key(key)
+        if self.editing:
+            self.editing = False
+            if index is not None and index < min(9, len(self.playlists)):
+                playlist = player.playlist_manager.get_playlist(self.playlists[index])
+                if playlist and playlist.name != "All Songs" and not isinstance(playlist, SmartPlaylist):
+                    self.manager.push(EditPlaylistMenu(player, playlist))
+                elif playlist:
+                    self.manager.push(MessageMenu(
+                        player, f"Cannot edit '{playlist.name}' playlist, it updates from the library"))
+        elif key == ord('c'):
+            self.manager.push(create_playlist_menu(player))
+        elif key == ord('m') and self.playlists:
+            self.manager.push(create_smart_playlist_menu(player))
+        elif key == ord('e') and self.playlists:
+            self.editing = True
+        elif index is not None and index < min(9, len(self.playlists)):
+            playlist = player.playlist_manager.get_playlist(self.playlists[index])
+            if playlist:
+                player.load_playlist(playlist)
+                self.manager.clear()
+        else:
+            super().handle_key(key)
+
+
+def create_playlist_menu(player):
+    """Name prompt for a new playlist, then the song picker for it"""
+    def create(playlist_name):
         if not playlist_name:
-            return False
-        
+            return
+        manager = prompt.manager
         if player.playlist_manager.get_playlist(playlist_name):
-            self.stdscr.clear()
-            msg = "Playlist already exists!"
-            x = (width - len(msg)) // 2
-            self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-            self.stdscr.refresh()
-            time.sleep(2)
-            return False
-        
-        if player.playlist_manager.create_playlist(playlist_name):
-            playlist = player.playlist_manager.get_playlist(playlist_name)
-            self.add_songs_to_playlist(player, playlist)
-            player.playlist_manager.save_playlist(playlist_name)
+            manager.push(MessageMenu(player, "Playlist already exists!", seconds=2))
+        elif player.playlist_manager.create_playlist(playlist_name):
+            manager.push(AddSongsMenu(player, player.playlist_manager.get_playlist(playlist_name)))
+
+    prompt = PromptMenu(player, " CREATE NEW PLAYLIST ", ["Enter playlist name:"], create)
+    return prompt
+
+
+def create_smart_playlist_menu(player):
+    """Name and query prompts for a playlist defined by a query over the library"""
+    def create(playlist_name, query_text):
+        if not playlist_name:
+            return
+        try:
+            query = SmartQuery.parse(query_text)
+        except ValueError:
+            query = None
+        playlist = player.playlist_manager.create_smart_playlist(playlist_name, query) if query else None
+        if playlist:
+            prompt.manager.push(MessageMenu(player, f"Created {playlist_name} ({len(playlist)} songs)", pair=3))
             player.set_status(f"Created: {playlist_name}", 2)
+        else:
+            prompt.manager.push(MessageMenu(player, "Could not create smart playlist"))
+
+    prompt = PromptMenu(
+        player, " CREATE SMART PLAYLIST ", ["Enter playlist name:", "Enter query:"], create,
+        ["Filters: artist:NAME title:TEXT min:3:00 max:4:00",
+         "days:30 (added within) plays:5 maxplays:0 words:love,night"])
+    return prompt
+
+
+class AddSongsMenu(Menu):
+    """Toggle library songs in or out of a new playlist"""
+
+    hint = "Enter number to toggle, 'd' when done"
+
+    def __init__(self, player, playlist):
+        super().__init__(player)
+        self.playlist = playlist
+        self.songs = library_songs(player) if os.path.exists(player.downloader.download_dir) else []
+
+    @property
+    def title(self):
+        return f" ADD SONGS TO: {self.playlist.name} "
+
+    def rows(self):
+        rows = [(f"Songs in playlist: {len(self.playlist)}", 3, 0), ("Available songs:", 7, 0), ("", 7, 0)]
+        for i, (name, mp3_path, lrc_path) in enumerate(self.songs[:9]):
+            in_playlist = (mp3_path, lrc_path) in self.playlist
+            marker = "[+] " if in_playlist else "[ ] "
+            rows.append((f"  {i+1}. {marker}{name}", 3 if in_playlist else 7, 0))
+        return rows
+
+    def toggle(self, key):
+        index = number_key(key)
+        if index is not None and index < min(9, len(self.songs)):
+            _, mp3_path, lrc_path = self.songs[index]
+            self.playlist.toggle_song(mp3_path, lrc_path)
             return True
         return False
-    
-    def add_songs_to_playlist(self, player, playlist):
-        """Add songs from library to a playlist"""
-        library_path = player.downloader.download_dir
-        if not os.path.exists(library_path):
-            return
-        
-        mp3_files = []
-        for file in os.listdir(library_path):
-            if file.lower().endswith('.mp3'):
-                mp3_path = os.path.join(library_path, file)
-                lrc_path = mp3_path[:-4] + '.lrc'
-                if os.path.exists(lrc_path):
-                    mp3_files.append((file[:-4], mp3_path, lrc_path))
-        
-        if not mp3_files:
-            return
-        
-        while True:
-            self.stdscr.clear()
-            height, width = self.stdscr.getmaxyx()
-            
-            title = f" ADD SONGS TO: {playlist.name} "
-            title_x = (width - len(title)) // 2
-            self.stdscr.addstr(1, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-            
-            self.stdscr.addstr(3, 2, f"Songs in playlist: {len(playlist.songs)}", curses.color_pair(3))
-            self.stdscr.addstr(4, 2, "Available songs:", curses.color_pair(7))
-            
-            for i, (name, mp3_path, lrc_path) in enumerate(mp3_files[:height-10]):
-                in_playlist = (mp3_path, lrc_path) in playlist.songs
-                marker = "[+] " if in_playlist else "[ ] "
-                display = f"{i+1}. {marker}{name}"
-                color = curses.color_pair(3) if in_playlist else curses.color_pair(7)
-                self.stdscr.addstr(6 + i, 4, display, color)
-            
-            self.stdscr.addstr(height-3, 2, "Enter number to toggle, 'd' when done: ", curses.color_pair(2))
-            self.stdscr.refresh()
-            
-            key = self.stdscr.getch()
-            if key == ord('d'):
-                break
-            elif key == ord('q'):
-                break
-            elif ord('1') <= key <= ord('9'):
-                idx = key - ord('1')
-                if idx < len(mp3_files):
-                    name, mp3_path, lrc_path = mp3_files[idx]
-                    if (mp3_path, lrc_path) in playlist.songs:
-                        playlist.songs.remove((mp3_path, lrc_path))
-                    else:
-                        playlist.add_song(mp3_path, lrc_path)
-    
-    def edit_playlist(self, player, playlist):
-        """Edit an existing playlist - add/remove songs"""
-        library_path = player.downloader.download_dir
-        if not os.path.exists(library_path):
-            return
-        
-        mp3_files = []
-        for file in os.listdir(library_path):
-            if file.lower().endswith('.mp3'):
-                mp3_path = os.path.join(library_path, file)
-                lrc_path = mp3_path[:-4] + '.lrc'
-                if os.path.exists(lrc_path):
-                    mp3_files.append((file[:-4], mp3_path, lrc_path))
-        
-        if not mp3_files:
+
+    def handle_key(self, key):
+        if self.toggle(key):
             return
-        
-        while True:
-            self.stdscr.clear()
-            height, width = self.stdscr.getmaxyx()
-            
-            title = f" EDIT: {playlist.name} "
-            title_x = (width - len(title)) // 2
-            self.stdscr.addstr(1, title_x, title, curses.color_pair(1) | curses.A_BOLD)
-            
-            delete_instr = "Press 'd' to delete this playlist"
-            self.stdscr.addstr(1, width - len(delete_instr) - 2, delete_instr, curses.color_pair(4))
-            
-            self.stdscr.addstr(3, 2, f"Songs in playlist: {len(playlist.songs)}", curses.color_pair(3))
-            self.stdscr.addstr(4, 2, "Available songs (toggle with numbers):", curses.color_pair(7))
-            
-            for i, (name, mp3_path, lrc_path) in enumerate(mp3_files[:height-10]):
-                in_playlist = (mp3_path, lrc_path) in playlist.songs
-                marker = "[+] " if in_playlist else "[ ] "
-                display = f"{i+1}. {marker}{name}"
-                color = curses.color_pair(3) if in_playlist else curses.color_pair(7)
-                self.stdscr.addstr(6 + i, 4, display, color)
-            
-            self.stdscr.addstr(height-3, 2, "Toggle songs, 'd' to delete playlist, 's' to save & exit: ", curses.color_pair(2))
-            self.stdscr.refresh()
-            
-            key = self.stdscr.getch()
-            if key == ord('s'):
-                player.playlist_manager.save_playlist(playlist.name)
-                self.stdscr.clear()
-                msg = f"Saved {playlist.name}!"
-                x = (width - len(msg)) // 2
-                self.stdscr.addstr(height//2, x, msg, curses.color_pair(3))
-                self.stdscr.refresh()
-                time.sleep(1)
-                break
-            elif key == ord('q'):
-                break
-            elif key == ord('d'):
-                self.stdscr.addstr(height-2, 2, f"Delete '{playlist.name}'? (y/n): ", curses.color_pair(4) | curses.A_BOLD)
-                self.stdscr.refresh()
-                confirm = self.stdscr.getch()
-                if confirm == ord('y'):
-                    player.playlist_manager.delete_playlist(playlist.name)
-                    self.stdscr.clear()
-                    msg = f"Deleted {playlist.name}"
-                    x = (width - len(msg)) // 2
-                    self.stdscr.addstr(height//2, x, msg, curses.color_pair(4))
-                    self.stdscr.refresh()
-                    time.sleep(1)
-                    break
-            elif ord('1') <= key <= ord('9'):
-                idx = key - ord('1')
-                if idx < len(mp3_files):
-                    name, mp3_path, lrc_path = mp3_files[idx]
-                    if (mp3_path, lrc_path) in playlist.songs:
-                        playlist.songs.remove((mp3_path, lrc_path))
-                    else:
-                        playlist.add_song(mp3_path, lrc_path)
+        if key in (ord('d'), ord('q'), ESC):
+            self.player.playlist_manager.mark_dirty(self.playlist.name)
+            self.player.set_status(f"Created: {self.playlist.name}", 2)
+            self.close()
+
+
+class EditPlaylistMenu(AddSongsMenu):
+    """Add or remove songs of an existing playlist, or delete it"""
+
+    def __init__(self, player, playlist):
+        super().__init__(player, playlist)
+        self.confirm_delete = False
+
+    @property
+    def title(self):
+        return f" EDIT: {self.playlist.name} "
+
+    @property
+    def hint(self):
+        if self.confirm_delete:
+            return f"Delete '{self.playlist.name}'? (y/n)"
+        return "Toggle songs, 'd' to delete playlist, 's' to save & exit"
 
+    def handle_key(self, key):
+        player = self.player
+        if self.confirm_delete:
+            self.confirm_delete = False
+            if key == ord('y'):
+                player.playlist_manager.delete_playlist(self.playlist.name)
+                self.close()
+                self.manager.push(MessageMenu(player, f"Deleted {self.playlist.name}", seconds=1))
+        elif self.toggle(key):
+            pass
+        elif key == ord('s'):
+            player.playlist_manager.mark_dirty(self.playlist.name)
+            self.close()
+            self.manager.push(MessageMenu(player, f"Saved {self.playlist.name}!", pair=3, seconds=1))
+        elif key == ord('d'):
+            self.confirm_delete = True
+        elif key in (ord('q'), ESC):
+            # Toggles already changed the playlist, so leaving keeps them too
+            player.playlist_manager.mark_dirty(self.playlist.name)
+            self.close()
@@ -0,0 +1,494 @@
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+FRAME_BUDGET = 1 / 30  # seconds a frame may take for smooth lyrics
+STARTUP_BUDGET = 0.5  # seconds from launch to the first menu on screen
+WINDOW = 600  # recent samples kept for percentiles
+BUCKETS = 24  # power-of-two microsecond histogram buckets, up to ~8 s
+
+# --profile. tracemalloc slows allocation-heavy code several times over, so it
+# only runs for a short window of each snapshot period
+SAMPLE_INTERVAL = 0.01  # seconds between stack samples
+SNAPSHOT_EVERY = 60.0  # seconds between memory snapshots and report rewrites
+TRACE_WINDOW = 5.0  # seconds of allocation tracing before each snapshot
+TRACE_FRAMES = 1  # frames kept per traced allocation
+MAX_DEPTH = 64  # frames kept per stack sample
+IDLE_SHARE = 0.02  # CPU share under which a thread that hasn't moved is waiting
+TOP = 25
+FOCUS_MODULES = ("player", "recorder", "downloader")  # get their own hot-line sections
+
+
+class PhaseStats:
+    """Running totals, a power-of-two histogram and a rolling window of one measurement"""
+
+    __slots__ = ("unit", "count", "total", "max", "histogram", "recent")
+
+    def __init__(self, unit=1000):
+        self.unit = unit  # histogram buckets count in these (ns per µs by default)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.histogram = [0] * BUCKETS
+        self.recent = deque(maxlen=WINDOW)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.histogram[min(BUCKETS - 1, max(0, int(value) // self.unit).bit_length())] += 1
+        self.recent.append(value)
+
+    def recent_mean(self):
+        return sum(self.recent) / len(self.recent) if self.recent else 0
+
+    def summary(self, scale=1e-3):
+        """Totals and recent percentiles, scaled from ns to µs by default"""
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * scale, 1) if recent else 0
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, 1) if self.count else 0,
+            "max": round(self.max * scale, 1),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            # Each bucket counts values under its key, in units, and at least half of it
+            "histogram": {str(1 << n): c for n, c in enumerate(self.histogram) if c},
+        }
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "output", "started", "written")
+
+    def __init__(self, profiler, name, output):
+        self.profiler = profiler
+        self.name = name
+        self.output = output
+
+    def __enter__(self):
+        if self.output:
+            self.written = self.profiler.written_bytes()
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.started
+        profiler = self.profiler
+        stats = profiler.phases.get(self.name)
+        if stats is None:
+            stats = profiler.phases[self.name] = PhaseStats()
+        stats.add(elapsed)
+        if self.output and self.written is not None:
+            profiler.output.add(profiler.written_bytes() - self.written)
+        return False
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class FrameProfiler:
+    """Opt-in timing of each phase of the player loop.
+
+    Disabled, phase() hands back a shared no-op context so the loop pays
+    next to nothing. Enabled, every phase is timed with perf_counter_ns and
+    the main thread's terminal output is counted from /proc/thread-self/io.
+    """
+
+    def __init__(self, enabled=False, budget=FRAME_BUDGET):
+        self.enabled = enabled
+        self.budget_ns = int(budget * 1e9)
+        self.phases = {}  # name -> PhaseStats
+        self.frames = PhaseStats()
+        self.output = PhaseStats(unit=1)  # bytes written per frame
+        self.frame_started = None
+        self.over_budget = 0
+        self.startup = {}  # milestone -> seconds since launch, recorded even when disabled
+        self.io = None
+        if enabled:
+            try:
+                self.io = open("/proc/thread-self/io", "rb", buffering=0)
+            except OSError:
+                self.io = None  # not Linux; output goes unmeasured
+
+    def phase(self, name, output=False):
+        """Context timing one phase; output=True also counts bytes written inside it"""
+        if not self.enabled:
+            return _NO_PHASE
+        return _Phase(self, name, output)
+
+    def start_frame(self):
+        """Mark a frame boundary; the time since the previous one is that frame's length"""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self.frame_started is not None:
+            elapsed = now - self.frame_started
+            self.frames.add(elapsed)
+            if elapsed > self.budget_ns:
+                self.over_budget += 1
+        self.frame_started = now
+
+    def written_bytes(self):
+        """Bytes this thread has passed to write() so far, or None where unavailable"""
+        if self.io is None:
+            return None
+        self.io.seek(0)
+        for line in self.io.read().split(b"\n"):
+            if line.startswith(b"wchar:"):
+                return int(line.split()[1])
+        return None
+
+    def overlay_text(self):
+        """One-line FPS, frame time against budget, and output per frame"""
+        mean = self.frames.recent_mean()
+        fps = 1e9 / mean if mean else 0
+        text = f" {fps:4.1f} FPS  {mean / 1e6:5.1f}/{self.budget_ns / 1e6:.0f} ms "
+        if self.output.recent:
+            text += f" {self.output.recent_mean() / 1024:5.1f} KB/frame "
+        return text
+
+    def summary(self):
+        data = {
+            "budget_ms": round(self.budget_ns / 1e6, 2),
+            "frames_over_budget": self.over_budget,
+            "frame_us": self.frames.summary(),
+            "phases_us": {name: stats.summary() for name, stats in self.phases.items()},
+        }
+        if self.output.count:
+            data["output_bytes"] = self.output.summary(scale=1)
+        if self.startup:
+            data["startup_budget_ms"] = round(STARTUP_BUDGET * 1000)
+            data["startup_ms"] = {name: round(seconds * 1000, 1) for name, seconds in self.startup.items()}
+        return data
+
+    def dump(self, path):
+        """Write per-phase statistics as JSON"""
+        if not self.enabled:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.summary(), f, indent=2)
+        except Exception as e:
+            print(f"Error writing frame statistics: {e}")
+        if self.io is not None:
+            self.io.close()
+
+
+def _where(code, line):
+    """Short 'package/module.py:line function' label for a frame"""
+    parts = code.co_filename.replace(os.sep, "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{line} {code.co_name}"
+
+
+def _module(code):
+    return os.path.splitext(os.path.basename(code.co_filename))[0]
+
+
+def _top(counts, n=TOP):
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def resident_bytes():
+    """Resident set size of this process, or its peak where the current size isn't available"""
+    try:
+        with open("/proc/self/statm", 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+class SamplingProfiler:
+    """Whole-session CPU and memory profile for --profile, cheap enough to leave on.
+
+    A daemon thread reads every thread's Python stack with
+    sys._current_frames() each interval. Where a thread is found again at
+    the same instruction without having used CPU in between, that spot is
+    a wait (a sleep, a queue get, a blocking read) and samples there are
+    dropped from then on. Each thread's measured CPU time is spread over
+    its remaining stacks, so the main loop's work isn't charged to the
+    sleep it wakes from.
+
+    Every snapshot_every seconds it records resident memory and live
+    objects by type. tracemalloc runs for trace_window seconds before
+    each snapshot, which then shows where the memory allocated in that
+    window and still held comes from. Lines that keep showing up there,
+    window after window, are where memory grows.
+
+    The report directory is rewritten at every snapshot and on stop, so
+    it survives a crash. It holds summary.json (threads, hotspots,
+    per-module hot lines and memory), report.txt (the same, for reading),
+    stacks.txt (collapsed stacks in CPU microseconds, for flame graph
+    tools) and memory-NNN.json per snapshot.
+    """
+
+    def __init__(self, report_dir, interval=SAMPLE_INTERVAL, snapshot_every=SNAPSHOT_EVERY,
+                 trace_window=TRACE_WINDOW, trace_frames=TRACE_FRAMES):
+        self.report_dir = report_dir
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.trace_window = min(trace_window, snapshot_every)
+        self.trace_frames = trace_frames
+        self.stacks = {}  # (thread name, ((code, line), ...) innermost first) -> busy samples
+        self.threads = {}  # thread name -> [samples, busy samples, CPU ns]
+        self.idle = set()  # (code, instruction) where threads were seen waiting
+        self.samples = 0
+        self.sample_ns = 0  # time spent taking samples and snapshots, for the overhead figure
+        self.last_sample_ns = 0
+        self.thread_names = {}  # ident -> name of the threads seen in the last sample
+        self.last_seen = {}  # ident -> (CPU clock id, CPU ns, (code, instruction)) at the last sample
+        self.memory = []  # {"elapsed_s", "rss_mb", "objects", "window_kept_kb"} per snapshot
+        self.first_types = None  # live objects by type at the first snapshot
+        self.kept = {}  # line -> [bytes kept over all windows, windows it kept memory in]
+        self.last_kept = {}  # line -> bytes kept from the latest window
+        self.last_snapshot = None
+        self.started = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        os.makedirs(self.report_dir, exist_ok=True)
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling and write the final report"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.snapshot()
+        self.write_report()
+
+    def _run(self):
+        next_snapshot = time.perf_counter() + self.snapshot_every
+        while not self.stopping.wait(self.interval):
+            self.sample()
+            now = time.perf_counter()
+            if not tracemalloc.is_tracing() and now >= next_snapshot - self.trace_window:
+                tracemalloc.start(self.trace_frames)
+            if now >= next_snapshot:
+                self.snapshot()
+                self.write_report()
+                next_snapshot = time.perf_counter() + self.snapshot_every
+
+    def _cpu_now(self, ident):
+        """(clock id, CPU ns) of a thread, or None where threads can't be timed"""
+        seen = self.last_seen.get(ident)
+        try:
+            clock_id = seen[0] if seen else time.pthread_getcpuclockid(ident)
+            return clock_id, time.clock_gettime_ns(clock_id)
+        except (AttributeError, OSError, TypeError):
+            return None  # not POSIX, or the thread has gone
+
+    def sample(self):
+        """Count the current stack of every thread but this one that isn't waiting"""
+        started = time.perf_counter_ns()
+        wall = started - self.last_sample_ns if self.last_sample_ns else 0
+        self.last_sample_ns = started
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        if frames.keys() != self.thread_names.keys():
+            # Threads came or went: rename, and forget the ones that ended
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.thread_names = {ident: names.get(ident, str(ident)) for ident in frames}
+            self.last_seen = {ident: seen for ident, seen in self.last_seen.items() if ident in frames}
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            name = self.thread_names[ident]
+            where = (frame.f_code, frame.f_lasti)
+            clock = self._cpu_now(ident)
+            seen = self.last_seen.get(ident)
+            cpu = None
+            if clock is not None:
+                cpu = max(0, clock[1] - seen[1]) if seen and seen[1] is not None else 0
+                if seen and seen[2] == where and wall and cpu < IDLE_SHARE * wall:
+                    self.idle.add(where)  # sat here without using the CPU: a wait
+            self.last_seen[ident] = (clock[0], clock[1], where) if clock else (None, None, where)
+            totals = self.threads.get(name)
+            if totals is None:
+                totals = self.threads[name] = [0, 0, 0]
+            totals[0] += 1
+            totals[2] += int(self.interval * 1e9) if cpu is None else cpu  # wall time stands in for CPU
+            if where in self.idle:
+                continue
+            totals[1] += 1
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            key = (name, tuple(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+        self.sample_ns += time.perf_counter_ns() - started
+
+    def snapshot_traces(self):
+        """Stop tracing and return {line: bytes} allocated during the window and still held"""
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        kept = {}
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            label = f"{'/'.join(frame.filename.replace(os.sep, '/').split('/')[-2:])}:{frame.lineno}"
+            kept[label] = stat.size
+        for label, size in kept.items():
+            totals = self.kept.setdefault(label, [0, 0])
+            totals[0] += size
+            totals[1] += 1
+        return kept
+
+    def snapshot(self):
+        """Record memory use, live objects by type and the traced window, and write them out"""
+        started = time.perf_counter_ns()
+        kept = self.snapshot_traces() if tracemalloc.is_tracing() else None
+        if kept is not None:
+            self.last_kept = kept
+        types = Counter(type(obj).__name__ for obj in gc.get_objects())
+        if self.first_types is None:
+            self.first_types = types
+        totals = {
+            "elapsed_s": round(time.perf_counter() - self.started, 1),
+            "rss_mb": round(resident_bytes() / 2**20, 1),
+            "objects": sum(types.values()),
+            "window_kept_kb": None if kept is None else round(sum(kept.values()) / 1024, 1),
+        }
+        growth = {name: count - self.first_types.get(name, 0) for name, count in types.items()}
+        report = dict(totals)
+        report["window_s"] = self.trace_window
+        report["kept_from_window"] = [
+            {"line": label, "kb": round(size / 1024, 1)} for label, size in _top(self.last_kept)
+        ]
+        report["object_growth"] = [{"type": name, "count": count} for name, count in _top(growth) if count > 0]
+        self.memory.append(totals)
+        self.last_snapshot = report
+        with open(os.path.join(self.report_dir, f"memory-{len(self.memory):03d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        self.sample_ns += time.perf_counter_ns() - started
+
+    def stack_cpu(self):
+        """[((thread name, stack), estimated CPU ns)], sharing each thread's CPU among its busy samples"""
+        per_sample = {name: cpu / busy if busy else 0 for name, (_, busy, cpu) in list(self.threads.items())}
+        return [(key, samples * per_sample.get(key[0], 0)) for key, samples in list(self.stacks.items())]
+
+    def summary(self):
+        """Threads, CPU hotspots, hot lines in FOCUS_MODULES and memory over the session"""
+        elapsed = time.perf_counter() - self.started
+        own = {}  # innermost line -> cpu ns
+        functions = {}  # function -> cpu ns, counted once per stack
+        focus = {module: {} for module in FOCUS_MODULES}
+        for (name, stack), cpu in self.stack_cpu():
+            if not stack:
+                continue
+            label = _where(*stack[0])
+            own[label] = own.get(label, 0) + cpu
+            seen = set()
+            charged = set()
+            for code, line in stack:
+                if code not in seen:
+                    seen.add(code)
+                    function = _where(code, code.co_firstlineno)
+                    functions[function] = functions.get(function, 0) + cpu
+                # Charge the innermost line of each focus module on the stack
+                module = _module(code)
+                if module in focus and module not in charged:
+                    charged.add(module)
+                    label = _where(code, line)
+                    focus[module][label] = focus[module].get(label, 0) + cpu
+
+        def ms(counts):
+            return [{"where": label, "cpu_ms": round(cpu / 1e6, 1)} for label, cpu in _top(counts) if cpu]
+
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "samples": self.samples,
+            "sample_interval_ms": self.interval * 1000,
+            "profiler_overhead_percent": round(self.sample_ns / 1e9 / elapsed * 100, 2) if elapsed else 0,
+            "threads": {name: {"samples": samples, "busy_samples": busy, "cpu_ms": round(cpu / 1e6, 1)}
+                        for name, (samples, busy, cpu) in sorted(self.threads.items(), key=lambda item: -item[1][2])},
+            "hot_lines": ms(own),
+            "hot_functions": ms(functions),
+            "modules": {module: ms(counts) for module, counts in focus.items()},
+            "memory": self.memory,
+            # Lines that held on to memory from the most trace windows, then the most bytes
+            "repeat_allocators": [
+                {"line": label, "windows": windows, "kb": round(size / 1024, 1)}
+                for label, (size, windows) in sorted(self.kept.items(), key=lambda item: (-item[1][1], -item[1][0]))[:TOP]
+            ],
+            "last_snapshot": self.last_snapshot,
+        }
+
+    def write_report(self):
+        """Rewrite summary.json, stacks.txt and report.txt. Called from the sampler thread, or after it stops"""
+        data = self.summary()
+        with open(os.path.join(self.report_dir, "summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        with open(os.path.join(self.report_dir, "stacks.txt"), 'w', encoding='utf-8') as f:
+            for (name, stack), cpu in self.stack_cpu():
+                if cpu >= 1000:
+                    frames = ";".join(f"{_module(code)}.{code.co_name}" for code, _ in reversed(stack))
+                    f.write(f"{name};{frames} {int(cpu // 1000)}\n")
+        with open(os.path.join(self.report_dir, "report.txt"), 'w', encoding='utf-8') as f:
+            f.write(self.format_report(data))
+
+    def format_report(self, data):
+        lines = [
+            f"Profile of {data['elapsed_s']} s, {data['samples']} samples every {data['sample_interval_ms']:g} ms, "
+            f"{data['profiler_overhead_percent']}% of the time spent profiling",
+            "",
+            "CPU by thread:",
+        ]
+        lines += [f"  {info['cpu_ms']:10.1f} ms  {name}" for name, info in data["threads"].items()]
+        sections = [("Hot lines", data["hot_lines"]), ("Hot functions, with callees", data["hot_functions"])]
+        sections += [(f"Hot lines in {module}.py, with callees", rows) for module, rows in data["modules"].items()]
+        for title, rows in sections:
+            lines += ["", f"{title}:"]
+            lines += [f"  {row['cpu_ms']:10.1f} ms  {row['where']}" for row in rows] or ["  (no samples)"]
+        if data["memory"]:
+            lines += ["", "Memory over time:"]
+            for m in data["memory"]:
+                row = f"  {m['elapsed_s']:8.1f} s  {m['rss_mb']:8.1f} MB resident  {m['objects']:9d} objects"
+                if m["window_kept_kb"] is not None:
+                    row += f"  {m['window_kept_kb']:9.1f} KB kept from trace window"
+                lines.append(row)
+        lines += ["", "Lines keeping memory from the most trace windows:"]
+        lines += [f"  {row['windows']:4d} windows  {row['kb']:10.1f} KB  {row['line']}"
+                  for row in data["repeat_allocators"]] or ["  (none)"]
+        last = data["last_snapshot"]
+        if last:
+            lines += ["", f"Kept from the latest {last['window_s']:g} s trace window:"]
+            lines += [f"  {row['kb']:10.1f} KB  {row['line']}" for row in last["kept_from_window"]] or ["  (none)"]
+            lines += ["", "Object types grown since the first snapshot:"]
+            lines += [f"  {row['count']:+10d}  {row['type']}" for row in last["object_growth"]] or ["  (none)"]
+        return "\n".join(lines) + "\n"
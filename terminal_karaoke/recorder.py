@@ -1,41 +1,65 @@
-import pyaudio
+import queue
 import wave
 import threading
 import os
-from datetime import datetime
-from pydub import AudioSegment
+from .latency import load_latency
+from .sessions import RecordingSession
 
 class AudioRecorder:
-    def __init__(self):
+    def __init__(self, engine=None, on_error=print):
+        self.engine = engine  # duplex AudioEngine to capture from, if it has input
+        self.on_error = on_error  # the capture thread can't print while curses owns the terminal
         self.is_recording = False
         self.recording_thread = None
         self.frames = []
         self.audio = None
         self.stream = None
+        self.input_queue = None
         self.recording_start_time = 0
         self.recording_end_time = 0
+        self.session = None
         
         # Audio settings
         self.chunk = 1024
-        self.format = pyaudio.paInt16
-        self.channels = 2
-        self.rate = 44100
+        self.channels = engine.channels if engine else 2
+        self.rate = engine.rate if engine else 44100
         
-        # Create recordings directory
+        # Sessions create the recordings directory when a take is saved
         self.recordings_dir = "recordings"
-        os.makedirs(self.recordings_dir, exist_ok=True)
+        
+        # Round trip measured by --calibrate for these devices, in frames
+        self.latency_path = os.path.join(self.recordings_dir, "latency.json")
+        self.round_trip = None
+        self.load_round_trip()
+    
+    def load_round_trip(self):
+        """Read the calibrated latency for the engine's devices, once its stream is open"""
+        if self.engine is not None and self.engine.audio is not None:
+            self.round_trip = load_latency(self.latency_path, self.engine.device_key())
     
     def start_recording(self, current_time):
         """Start recording audio from the microphone"""
         if self.is_recording:
             return False
         
+        if self.engine and self.engine.has_input:
+            # Share the playback stream's clock; the start time comes from the first block
+            self.frames = []
+            self.recording_start_time = None
+            self.input_queue = queue.SimpleQueue()
+            self.engine.add_input_queue(self.input_queue)
+            self.is_recording = True
+            self.recording_thread = threading.Thread(target=self._collect_engine_input)
+            self.recording_thread.start()
+            return True
+        
         try:
             self.frames = []
             self.recording_start_time = current_time
+            import pyaudio
             self.audio = pyaudio.PyAudio()
             self.stream = self.audio.open(
-                format=self.format,
+                format=pyaudio.paInt16,
                 channels=self.channels,
                 rate=self.rate,
                 input=True,
@@ -47,7 +71,7 @@ class AudioRecorder:
             self.recording_thread.start()
             return True
         except Exception as e:
-            print(f"Error starting recording: {e}")
+            self.on_error(f"Error starting recording: {e}")
             return False
     
     def _record_audio(self):
@@ -57,100 +81,93 @@ class AudioRecorder:
                 data = self.stream.read(self.chunk, exception_on_overflow=False)
                 self.frames.append(data)
             except Exception as e:
-                print(f"Error during recording: {e}")
+                self.on_error(f"Error during recording: {e}")
                 break
     
-    def stop_recording(self, song_path, current_time):
-        """Stop recording and merge with the song audio"""
-        if not self.is_recording:
-            return None
-        
+    def _collect_engine_input(self):
+        """Gather input blocks from the engine, noting the song frame of the first"""
+        while self.is_recording or not self.input_queue.empty():
+            try:
+                data, song_frame = self.input_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.recording_start_time is None:
+                self.recording_start_time = song_frame / self.rate
+            self.frames.append(data)
+    
+    def _stop_capture(self, current_time):
+        """Stop whichever capture path is running"""
+        if self.input_queue is not None:
+            self.engine.remove_input_queue(self.input_queue)
         self.is_recording = False
-        self.recording_end_time = current_time
         
         # Wait for recording thread to finish
         if self.recording_thread:
             self.recording_thread.join()
         
+        if self.input_queue is not None:
+            self.input_queue = None
+            captured = sum(len(data) for data in self.frames) // (self.channels * 2)
+            if self.recording_start_time is None:
+                self.recording_start_time = current_time
+            self.recording_end_time = self.recording_start_time + captured / self.rate
+            return
+        
+        self.recording_end_time = current_time
         # Close the stream
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
+            self.stream = None
         if self.audio:
             self.audio.terminate()
-        
-        # Save the recorded audio to a temporary file
-        temp_mic_file = os.path.join(self.recordings_dir, "temp_mic.wav")
-        try:
-            wf = wave.open(temp_mic_file, 'wb')
-            wf.setnchannels(self.channels)
-            wf.setsampwidth(self.audio.get_sample_size(self.format) if self.audio else 2)
-            wf.setframerate(self.rate)
-            wf.writeframes(b''.join(self.frames))
-            wf.close()
-        except Exception as e:
-            print(f"Error saving recorded audio: {e}")
+    
+    def stop_recording(self, song_path, current_time):
+        """Stop recording. Returns the capture for save_take, or None if nothing was recording"""
+        if not self.is_recording:
             return None
         
-        # Merge the recorded audio with the song
-        output_path = self._merge_audio(song_path, temp_mic_file)
-        
-        # Clean up temporary file
-        try:
-            os.remove(temp_mic_file)
-        except:
-            pass
-        
-        return output_path
+        self._stop_capture(current_time)
+        pcm, self.frames = b''.join(self.frames), []
+        return {
+            "session": self.session_for(song_path),
+            "pcm": pcm,
+            "start": self.recording_start_time,
+            "offset": self.latency_offset(),
+        }
     
-    def _merge_audio(self, song_path, mic_path):
-        """Merge the song audio and microphone audio"""
-        try:
-            # Load audio files
-            song = AudioSegment.from_file(song_path)
-            mic = AudioSegment.from_wav(mic_path)
-            
-            # Extract only the segment of the song that was playing during recording
-            start_ms = int(self.recording_start_time * 1000)
-            end_ms = int(self.recording_end_time * 1000)
-            song_segment = song[start_ms:end_ms]
-            
-            # Match the length - if mic is shorter, pad it; if longer, trim it
-            if len(mic) < len(song_segment):
-                silence = AudioSegment.silent(duration=len(song_segment) - len(mic))
-                mic = mic + silence
-            elif len(mic) > len(song_segment):
-                mic = mic[:len(song_segment)]
-            
-            # Boost mic volume by 6dB to make it louder
-            mic = mic + 6
-            
-            # Overlay the microphone audio on the song segment
-            merged = song_segment.overlay(mic)
-            
-            # Generate output filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            song_name = os.path.splitext(os.path.basename(song_path))[0]
-            output_filename = f"{song_name}_karaoke_{timestamp}.mp3"
-            output_path = os.path.join(self.recordings_dir, output_filename)
-            
-            # Export the merged audio
-            merged.export(output_path, format="mp3")
-            
-            return output_path
-        except Exception as e:
-            print(f"Error merging audio: {e}")
-            return None
+    def save_take(self, capture):
+        """Keep a capture from stop_recording as a take in its session. Returns the take.
+
+        Runs on a worker thread; errors are left for the job to report.
+        """
+        return capture["session"].add_take(capture["pcm"], capture["start"], capture["offset"])
+    
+    def latency_offset(self):
+        """Frames by which captured audio trails the song frame it was tagged with"""
+        if self.round_trip is None:
+            return 0
+        if self.engine is not None and self.engine.has_input:
+            # Engine tags already allow for output latency; the rest is input side
+            return max(0, self.round_trip - self.engine.output_latency_frames)
+        return self.round_trip
+    
+    def session_for(self, song_path):
+        """Recording session for a backing track, opened once and kept"""
+        if self.session is None or self.session.song_path != song_path:
+            self.session = RecordingSession(song_path, self.recordings_dir, self.rate, self.channels)
+        return self.session
+    
+    def export_mix(self, session):
+        """Mix a session's takes over its backing track, at the playback gain.
+
+        Runs on a worker thread; errors are left for the job to report.
+        """
+        gain = self.engine.gain if self.engine is not None else 1.0
+        return session.mixdown(gain)
     
     def cleanup(self):
         """Cleanup resources"""
         if self.is_recording:
-            self.is_recording = False
-            if self.recording_thread:
-                self.recording_thread.join()
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-            if self.audio:
-                self.audio.terminate()
+            self._stop_capture(0)
 
@@ -0,0 +1,247 @@
+import curses
+import struct
+import sys
+from .text import graphemes
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # not a Unix terminal; backpressure is judged from write time alone
+    fcntl = termios = None
+
+# Rough cost in bytes of what a terminal is sent, used to compare frames in MemoryScreen
+MOVE_BYTES = 8  # ESC [ row ; col H
+ATTR_BYTES = 10  # ESC [ 0 ; 1 ; 3x m
+CLEAR_BYTES = 7  # ESC [ H ESC [ 2 J
+
+
+class CursesScreen:
+    """The real terminal: the subset of a curses window the UI uses"""
+
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        try:
+            self.out_fd = sys.stdout.fileno()
+        except (AttributeError, OSError, ValueError):
+            self.out_fd = None
+
+    def init_colors(self, pairs):
+        """Set up color pairs from [(pair, foreground, fallback foreground)]"""
+        curses.start_color()
+        curses.use_default_colors()
+        for pair, color, fallback in pairs:
+            try:
+                curses.init_pair(pair, color, -1)
+            except (curses.error, ValueError):  # ValueError: color past COLORS-1 on 8-color terminals
+                curses.init_pair(pair, fallback, -1)
+
+    def color_pair(self, pair):
+        return curses.color_pair(pair)
+
+    def getmaxyx(self):
+        return self.stdscr.getmaxyx()
+
+    def addstr(self, y, x, text, attr=0):
+        self.stdscr.addstr(y, x, text, attr)
+
+    def clear(self):
+        self.stdscr.clear()
+
+    def erase(self):
+        self.stdscr.erase()
+
+    def refresh(self):
+        self.stdscr.refresh()
+
+    def pending_output(self):
+        """Bytes written to the terminal that it hasn't taken yet (TIOCOUTQ), 0 if unknown"""
+        if termios is None or self.out_fd is None or not hasattr(termios, "TIOCOUTQ"):
+            return 0
+        try:
+            return struct.unpack("i", fcntl.ioctl(self.out_fd, termios.TIOCOUTQ, b"\0" * 4))[0]
+        except OSError:
+            return 0
+
+    def getch(self):
+        key = self.stdscr.getch()
+        if key == curses.KEY_RESIZE:
+            curses.update_lines_cols()
+        return key
+
+    def nodelay(self, flag):
+        self.stdscr.nodelay(flag)
+
+    def timeout(self, delay):
+        self.stdscr.timeout(delay)
+
+    def keypad(self, flag):
+        self.stdscr.keypad(flag)
+
+
+class MemoryScreen:
+    """An in-memory screen buffer with the CursesScreen interface, for tests and benchmarks.
+
+    Keeps the characters and attributes of every cell and, on each refresh,
+    records how many writes and cells the frame took and an estimate of
+    the bytes a terminal would have been sent to show the changes.
+    Keys come from a script of (time, key) pairs read against clock.
+    With link_rate (bytes per second) and a clock, output queues up behind
+    a simulated slow link, as pending_output reports.
+    """
+
+    def __init__(self, height=24, width=80, keys=(), clock=None, link_rate=None):
+        self.height = height
+        self.width = width
+        self.keys = sorted(keys, key=lambda k: k[0])
+        self.clock = clock
+        self.link_rate = link_rate
+        self.queued = 0
+        self.drained_at = None
+        self.pairs = {}
+        self.chars = self._blank()
+        self.attrs = [[0] * width for _ in range(height)]
+        # What the terminal shows: the buffers as of the last refresh
+        self.shown_chars = self._blank()
+        self.shown_attrs = [[0] * width for _ in range(height)]
+        self.full_repaint = True
+        self.writes = 0
+        self.cells = 0
+        self.frames = []  # {"writes", "cells", "changed", "bytes"} per refresh
+
+    def _blank(self):
+        return [[" "] * self.width for _ in range(self.height)]
+
+    def init_colors(self, pairs):
+        self.pairs = {pair: color for pair, color, _ in pairs}
+
+    def color_pair(self, pair):
+        return pair << 8  # the same encoding as ncurses' COLOR_PAIR
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def resize(self, height, width):
+        """Simulate a terminal resize; the next getch returns KEY_RESIZE"""
+        self.height = height
+        self.width = width
+        self.chars = self._blank()
+        self.attrs = [[0] * width for _ in range(height)]
+        self.shown_chars = self._blank()
+        self.shown_attrs = [[0] * width for _ in range(height)]
+        self.full_repaint = True
+        self.keys.insert(0, (float("-inf"), curses.KEY_RESIZE))
+
+    def addstr(self, y, x, text, attr=0):
+        """Write text like curses: wrapping at the right edge, failing past the last cell"""
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("addstr() returned ERR")
+        self.writes += 1
+        for cluster, width in graphemes(text):
+            if x + width > self.width:
+                y += 1
+                x = 0
+            if y >= self.height:
+                raise curses.error("addstr() returned ERR")
+            row = self.chars[y]
+            # Overwriting half of a wide character blanks the other half, as curses does
+            if row[x] == "" and x > 0:
+                row[x - 1] = " "
+            end = x + max(1, width)
+            if end < self.width and row[end] == "":
+                row[end] = " "
+            row[x] = cluster
+            self.attrs[y][x] = attr
+            if width == 2:
+                self.chars[y][x + 1] = ""  # covered by the wide character
+                self.attrs[y][x + 1] = attr
+            self.cells += max(1, width)
+            x += max(1, width)
+            if x >= self.width:
+                if y == self.height - 1:
+                    raise curses.error("addstr() returned ERR")  # cursor can't move past the end
+                y += 1
+                x = 0
+
+    def erase(self):
+        self.chars = self._blank()
+        self.attrs = [[0] * self.width for _ in range(self.height)]
+
+    def clear(self):
+        """Erase and make the next refresh repaint everything, as curses does"""
+        self.erase()
+        self.full_repaint = True
+
+    def refresh(self):
+        changed = 0
+        sent = CLEAR_BYTES if self.full_repaint else 0
+        attr = 0
+        for y in range(self.height):
+            row, row_attrs = self.chars[y], self.attrs[y]
+            shown, shown_attrs = self.shown_chars[y], self.shown_attrs[y]
+            cursor = None  # column the terminal cursor is at after the last byte sent
+            for x in range(self.width):
+                if self.full_repaint:
+                    # The screen was cleared, so only non-blank cells need sending
+                    dirty = row[x] != " " or row_attrs[x] != 0
+                else:
+                    dirty = row[x] != shown[x] or row_attrs[x] != shown_attrs[x]
+                if not dirty:
+                    continue
+                changed += 1
+                if cursor != x:
+                    sent += MOVE_BYTES
+                if row_attrs[x] != attr:
+                    sent += ATTR_BYTES
+                    attr = row_attrs[x]
+                sent += len(row[x].encode('utf-8'))
+                cursor = x + 1
+        self.pending_output()  # drain the link up to now before queueing this frame
+        self.queued += sent
+        self.frames.append({"writes": self.writes, "cells": self.cells, "changed": changed, "bytes": sent})
+        self.shown_chars = [row[:] for row in self.chars]
+        self.shown_attrs = [row[:] for row in self.attrs]
+        self.full_repaint = False
+        self.writes = 0
+        self.cells = 0
+
+    def pending_output(self):
+        """Bytes still on their way over the simulated link"""
+        if self.link_rate is None or self.clock is None:
+            self.queued = 0
+            return 0
+        now = self.clock()
+        if self.drained_at is not None:
+            self.queued = max(0, self.queued - int((now - self.drained_at) * self.link_rate))
+        self.drained_at = now
+        return self.queued
+
+    def getch(self):
+        if self.keys and (self.clock is None or self.keys[0][0] <= self.clock()):
+            return self.keys.pop(0)[1]
+        return -1
+
+    def nodelay(self, flag):
+        pass
+
+    def timeout(self, delay):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def text(self):
+        """Rows of the screen as shown at the last refresh"""
+        return ["".join(row).rstrip() for row in self.shown_chars]
+
+    def attr_runs(self):
+        """Attributes of each shown row as [[attr, count], ...] runs"""
+        rows = []
+        for row in self.shown_attrs:
+            runs = []
+            for attr in row:
+                if runs and runs[-1][0] == attr:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([attr, 1])
+            rows.append(runs)
+        return rows
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import wave
+from datetime import datetime
+import numpy as np
+from .dsp import decode_pcm
+from .latency import MIN_CONFIDENCE, find_delay
+from .persistence import atomic_write_json
+
+REGION_SECONDS = 5.0  # mixdown is cached in regions this long
+MIC_GAIN = 2.0  # +6 dB so the voice sits over a mastered backing track
+SESSIONS_DIR = "sessions"
+ALIGN_SECONDS = 20.0  # take audio used to find the alignment
+ALIGN_SEARCH = 0.25  # seconds either side of the calibrated position
+
+
+def read_clip(path, start_frame, count):
+    """Float frames [start_frame, start_frame + count) of a 16-bit WAV clip"""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        wf.setpos(start_frame)
+        data = wf.readframes(count)
+    return np.frombuffer(data, dtype='<i2').astype(np.float32).reshape(-1, channels) / 32768.0
+
+
+class RecordingSession:
+    """Takes sung over one backing track, kept as raw mic clips with their song-time offsets.
+
+    Later takes cover earlier ones where they overlap, so re-recording a
+    range punches in over it. Mixdown renders fixed regions and caches each
+    under a key of everything it depends on, so only regions whose takes
+    changed are rendered again. Mixdowns run on a worker thread, so changes
+    to the takes hold the session's lock.
+    """
+
+    def __init__(self, song_path, recordings_dir, rate=44100, channels=2):
+        self.song_path = song_path
+        self.rate = rate
+        self.channels = channels
+        self.region_frames = int(REGION_SECONDS * rate)
+        name = os.path.splitext(os.path.basename(song_path))[0]
+        key = hashlib.sha1(os.path.abspath(song_path).encode('utf-8')).hexdigest()[:10]
+        self.dir = os.path.join(recordings_dir, SESSIONS_DIR, f"{name}-{key}")
+        self.mix_dir = os.path.join(self.dir, "mix")
+        self.recordings_dir = recordings_dir
+        self.manifest_path = os.path.join(self.dir, "session.json")
+        # {"id", "clip", "start", "offset", "frames", "created", "aligned"} in recording order.
+        # start is the song frame the capture was tagged with; the audio really
+        # lines up offset frames earlier
+        self.takes = []
+        self.next_id = 1
+        self.last_mix = None  # {"regions": [keys], "path"} of the latest export
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        self.takes = data.get("takes", [])
+        self.next_id = data.get("next_id", len(self.takes) + 1)
+        self.last_mix = data.get("last_mix")
+
+    def save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        atomic_write_json(self.manifest_path, {
+            "song": self.song_path,
+            "rate": self.rate,
+            "channels": self.channels,
+            "takes": self.takes,
+            "next_id": self.next_id,
+            "last_mix": self.last_mix,
+        })
+
+    def add_take(self, pcm, start_time, offset=0):
+        """Store raw 16-bit mic audio captured from start_time (song seconds) as a new take.
+
+        offset is the recording latency in frames, from calibration.
+        """
+        frames = len(pcm) // (self.channels * 2)
+        if not frames:
+            return None
+        with self.lock:
+            return self._add_take(pcm, frames, start_time, offset)
+
+    def _add_take(self, pcm, frames, start_time, offset):
+        take_id = self.next_id
+        clip = f"take-{take_id:03d}.wav"
+        os.makedirs(self.dir, exist_ok=True)
+        with wave.open(os.path.join(self.dir, clip), 'wb') as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(2)
+            wf.setframerate(self.rate)
+            wf.writeframes(pcm)
+        take = {
+            "id": take_id,
+            "clip": clip,
+            "start": int(round(start_time * self.rate)),
+            "offset": int(offset),
+            "frames": frames,
+            "created": time.time(),
+        }
+        self.takes.append(take)
+        self.next_id += 1
+        self.save()
+        return take
+
+    def remove_take(self, take_id):
+        """Drop a take; the regions it covered are re-rendered on the next mixdown"""
+        with self.lock:
+            return self._remove_take(take_id)
+
+    def _remove_take(self, take_id):
+        for take in self.takes:
+            if take["id"] == take_id:
+                self.takes.remove(take)
+                self.save()
+                try:
+                    os.remove(os.path.join(self.dir, take["clip"]))
+                except OSError:
+                    pass
+                return True
+        return False
+
+    def _song_ident(self):
+        try:
+            stat = os.stat(self.song_path)
+            return [os.path.abspath(self.song_path), stat.st_size, stat.st_mtime]
+        except OSError:
+            return [os.path.abspath(self.song_path)]
+
+    def take_start(self, take):
+        """Song frame the take's first sample lines up with"""
+        return take["start"] - take.get("offset", 0)
+
+    def _overlapping(self, start, end):
+        return [t for t in self.takes if self.take_start(t) < end and self.take_start(t) + t["frames"] > start]
+
+    def align_take(self, take):
+        """Refine a take's offset by correlating its mic bleed against the backing track.
+
+        Only applies when the backing track is clearly audible in the take;
+        with headphones the calibrated offset is kept.
+        """
+        take["aligned"] = True
+        search = int(ALIGN_SEARCH * self.rate)
+        count = min(take["frames"], int(ALIGN_SECONDS * self.rate))
+        nominal = self.take_start(take)
+        begin = max(0, nominal - search)
+        clip = read_clip(os.path.join(self.dir, take["clip"]), 0, count).mean(axis=1)
+        song = decode_pcm(self.song_path, self.rate, 1,
+                          start=begin / self.rate, duration=(nominal - begin + count + search) / self.rate)[:, 0]
+        max_lag = min(len(song) - len(clip), nominal - begin + search)
+        if max_lag <= 0:
+            return False
+        lag, confidence = find_delay(clip, song, max_lag)
+        if confidence < MIN_CONFIDENCE:
+            return False
+        take["offset"] = take["start"] - (begin + lag)
+        return True
+
+    def region_key(self, index, gain):
+        """Cache key of a region: the song, the gain and the takes laid over it"""
+        start = index * self.region_frames
+        takes = [[t["id"], self.take_start(t), t["frames"]] for t in self._overlapping(start, start + self.region_frames)]
+        ident = json.dumps([self._song_ident(), round(gain, 4), index, takes])
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:20]
+
+    def render_region(self, index, gain):
+        """Mix of one region as int16 frames"""
+        start = index * self.region_frames
+        end = start + self.region_frames
+        song = decode_pcm(self.song_path, self.rate, self.channels,
+                          start=start / self.rate, duration=REGION_SECONDS)
+        length = self.region_frames
+        song = np.pad(song[:length], ((0, length - min(length, len(song))), (0, 0)))
+        mic = np.zeros_like(song)
+        # Oldest first, so newer takes overwrite the range they re-recorded
+        for take in self._overlapping(start, end):
+            first = self.take_start(take)
+            take_start = max(start, first)
+            take_end = min(end, first + take["frames"])
+            clip = read_clip(os.path.join(self.dir, take["clip"]), take_start - first, take_end - take_start)
+            mic[take_start - start:take_start - start + len(clip)] = clip
+        mixed = song * gain + mic * MIC_GAIN
+        return (np.clip(mixed, -1.0, 1.0) * 32767).astype('<i2')
+
+    def mixdown(self, gain=1.0):
+        """Export every take mixed over the backing track. Returns the output path or None.
+
+        Regions rendered by an earlier mixdown are reused from the cache, and
+        when nothing changed the previous export is returned as is.
+        """
+        with self.lock:
+            return self._mixdown(gain)
+
+    def _mixdown(self, gain):
+        if not self.takes:
+            return None
+        unaligned = [take for take in self.takes if "aligned" not in take]
+        for take in unaligned:
+            try:
+                self.align_take(take)
+            except Exception:
+                pass  # keep the calibrated offset
+        if unaligned:
+            self.save()
+        first_frame = max(0, min(self.take_start(t) for t in self.takes))
+        end_frame = max(self.take_start(t) + t["frames"] for t in self.takes)
+        indices = range(first_frame // self.region_frames, (end_frame - 1) // self.region_frames + 1)
+        keys = [self.region_key(index, gain) for index in indices]
+        if self.last_mix and self.last_mix.get("regions") == keys and os.path.exists(self.last_mix["path"]):
+            return self.last_mix["path"]
+
+        from pydub import AudioSegment
+
+        os.makedirs(self.mix_dir, exist_ok=True)
+        regions = []
+        for index, key in zip(indices, keys):
+            path = os.path.join(self.mix_dir, f"{key}.npy")
+            try:
+                region = np.load(path)
+            except Exception:
+                region = self.render_region(index, gain)
+                temp_path = path + ".part"
+                with open(temp_path, 'wb') as f:
+                    np.save(f, region)
+                os.replace(temp_path, path)
+            regions.append(region)
+        # Regions no mix uses any more
+        for name in os.listdir(self.mix_dir):
+            if name.endswith(".npy") and name[:-4] not in keys:
+                try:
+                    os.remove(os.path.join(self.mix_dir, name))
+                except OSError:
+                    pass
+
+        offset = indices[0] * self.region_frames
+        audio = np.concatenate(regions)[first_frame - offset:end_frame - offset]
+        merged = AudioSegment(
+            data=audio.tobytes(), sample_width=2, frame_rate=self.rate, channels=self.channels
+        )
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        song_name = os.path.splitext(os.path.basename(self.song_path))[0]
+        output_path = os.path.join(self.recordings_dir, f"{song_name}_karaoke_{timestamp}.mp3")
+        merged.export(output_path, format="mp3")
+        self.last_mix = {"regions": keys, "path": output_path}
+        self.save()
+        return output_path
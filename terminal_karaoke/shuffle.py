@@ -0,0 +1,117 @@
+import random
+from collections import deque
+
+MASK64 = (1 << 64) - 1
+
+
+def _mix(x):
+    """splitmix64 finaliser, used as the Feistel round function"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class ShuffleEngine:
+    """Lazily generated shuffle over stable playlist entry ids.
+
+    The order is a keyed Feistel bijection over a power-of-four id domain,
+    so starting a new shuffle is O(1) whatever the playlist size. Ids that
+    are not live (removed entries, unused slots) are skipped as they come
+    up, which keeps the order valid through edits: removed songs never
+    play and songs added mid-cycle play once their slot comes round.
+    """
+    __slots__ = ("seed", "half_bits", "cursor", "position", "history", "forward")
+
+    ROUNDS = 4
+
+    def __init__(self, history_size=256):
+        self.history = deque(maxlen=history_size)  # entry ids played, most recent last
+        self.forward = []  # ids stepped back over, replayed by next()
+        self.reseed(0)
+
+    def reseed(self, id_bound):
+        """Start a fresh permutation covering ids below id_bound"""
+        self.seed = random.getrandbits(64)
+        bits = max(2, (max(id_bound, 1) - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.cursor = 0  # next index of the permutation to draw
+        self.position = 0  # songs into the current cycle, for display
+
+    @property
+    def domain(self):
+        return 1 << (2 * self.half_bits)
+
+    def permute(self, i):
+        """Map permutation index i to an id in [0, domain)"""
+        mask = (1 << self.half_bits) - 1
+        left, right = i >> self.half_bits, i & mask
+        for r in range(self.ROUNDS):
+            left, right = right, left ^ (_mix(self.seed ^ (r << 56) ^ right) & mask)
+        return (left << self.half_bits) | right
+
+    def restart(self, id_bound, current_id=None):
+        """New shuffle, optionally keeping current_id as the song now playing"""
+        self.reseed(id_bound)
+        self.history.clear()
+        self.forward.clear()
+        if current_id is not None:
+            self._play(current_id)
+
+    def current(self):
+        """Entry id of the song now playing, or None before the first draw"""
+        return self.history[-1] if self.history else None
+
+    def next(self, entries, id_bound, avoid=()):
+        """Advance to the next live entry id in entries (id -> song); None if empty.
+
+        Songs whose mp3 path is in avoid are passed over while anything
+        else is left, which gives a no-repeat window.
+        """
+        if not entries:
+            return None
+        while self.forward:
+            entry_id = self.forward.pop()
+            if entry_id in entries:
+                return self._play(entry_id)
+        if id_bound > self.domain:
+            # The playlist outgrew the id domain; carry on in a larger one
+            self.reseed(id_bound)
+        skipped = 0
+        while True:
+            if self.cursor >= self.domain:
+                self.reseed(id_bound)
+            entry_id = self.permute(self.cursor)
+            self.cursor += 1
+            song = entries.get(entry_id)
+            if song is None:
+                continue
+            if avoid and song[0] in avoid and skipped < len(entries):
+                skipped += 1
+                continue
+            return self._play(entry_id)
+
+    def peek(self, entries, id_bound, avoid=()):
+        """Entry id that next() will return, drawing it now if needed"""
+        if self.forward and self.forward[-1] in entries:
+            return self.forward[-1]
+        entry_id = self.next(entries, id_bound, avoid)
+        if entry_id is not None:
+            self.history.pop()
+            self.position -= 1
+            self.forward.append(entry_id)
+        return entry_id
+
+    def _play(self, entry_id):
+        self.history.append(entry_id)
+        self.position += 1
+        return entry_id
+
+    def previous(self, entries):
+        """Step back to the last played song that is still in entries"""
+        while len(self.history) > 1:
+            self.forward.append(self.history.pop())
+            self.position = max(0, self.position - 1)
+            if self.history[-1] in entries:
+                return self.history[-1]
+        return self.current()
@@ -0,0 +1,125 @@
+import os
+import re
+import time
+
+DAY = 86400
+_lyric_words = {}  # lrc_path -> (mtime, set of words), re-read when the file changes
+
+
+def parse_duration(text):
+    """Seconds from '240', '4:00' or '4m'"""
+    text = text.strip().lower()
+    if ':' in text:
+        minutes, seconds = text.split(':', 1)
+        return int(minutes) * 60 + float(seconds)
+    if text.endswith('m'):
+        return float(text[:-1]) * 60
+    return float(text.rstrip('s'))
+
+
+class SmartQuery:
+    """Filter over library index fields that defines a smart playlist"""
+
+    FIELDS = ("text", "artist", "title", "min_duration", "max_duration",
+              "added_within_days", "min_plays", "max_plays", "keywords")
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def parse(cls, text):
+        """Build a query from 'artist:queen max:4:00 days:30 plays:3 words:love,night free text'"""
+        fields = {}
+        free = []
+        for token in text.split():
+            key, sep, value = token.partition(':')
+            key = key.lower()
+            if not sep or not value:
+                free.append(token)
+            elif key == "artist":
+                fields["artist"] = value
+            elif key == "title":
+                fields["title"] = value
+            elif key == "min":
+                fields["min_duration"] = parse_duration(value)
+            elif key == "max":
+                fields["max_duration"] = parse_duration(value)
+            elif key == "days":
+                fields["added_within_days"] = float(value)
+            elif key == "plays":
+                fields["min_plays"] = int(value)
+            elif key == "maxplays":
+                fields["max_plays"] = int(value)
+            elif key == "words":
+                fields["keywords"] = [w for w in value.lower().split(',') if w]
+            else:
+                free.append(token)
+        if free:
+            fields["text"] = " ".join(free)
+        return cls(**fields)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def matches(self, mp3_path, entry, now=None):
+        """Whether an indexed song satisfies every condition of the query"""
+        now = now or time.time()
+        name = os.path.basename(mp3_path)[:-4].lower()
+        if self.text and self.text.lower() not in name:
+            return False
+        if self.artist and self.artist.lower() not in (entry.get("artist") or name).lower():
+            return False
+        if self.title and self.title.lower() not in (entry.get("title") or name).lower():
+            return False
+        if self.min_duration is not None or self.max_duration is not None:
+            duration = entry.get("duration")
+            if duration is None:
+                return False
+            if self.min_duration is not None and duration < self.min_duration:
+                return False
+            if self.max_duration is not None and duration > self.max_duration:
+                return False
+        if self.added_within_days is not None and now >= self.expires_at(entry):
+            return False
+        plays = entry.get("play_count", 0)
+        if self.min_plays is not None and plays < self.min_plays:
+            return False
+        if self.max_plays is not None and plays > self.max_plays:
+            return False
+        if self.keywords and not self._lyrics_contain(entry.get("lrc_path")):
+            return False
+        return True
+
+    def expires_at(self, entry):
+        """Time at which a matching song stops matching, or None if it never does"""
+        if self.added_within_days is None:
+            return None
+        return entry.get("added", 0) + self.added_within_days * DAY
+
+    def _lyrics_contain(self, lrc_path):
+        words = lyric_words(lrc_path)
+        return words is not None and all(keyword in words for keyword in self.keywords)
+
+
+def lyric_words(lrc_path):
+    """Lower-case words of an LRC file's lyrics, or None if unreadable. Cached until the file changes"""
+    try:
+        mtime = os.stat(lrc_path).st_mtime
+    except (OSError, TypeError):
+        return None
+    cached = _lyric_words.get(lrc_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(lrc_path, 'r', encoding='utf-8') as f:
+            text = re.sub(r'\[[^\]]*\]', ' ', f.read()).lower()
+    except Exception:
+        return None
+    words = set(re.findall(r"\w+", text))
+    _lyric_words[lrc_path] = (mtime, words)
+    return words
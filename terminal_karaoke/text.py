@@ -0,0 +1,138 @@
+import unicodedata
+from bisect import bisect_right
+
+ZWJ = "\u200d"
+_widths = {}  # character -> terminal cells, filled as characters are seen
+
+
+def char_width(ch):
+    """Terminal cells one character takes: 0 for combining and format marks, 2 for wide"""
+    width = _widths.get(ch)
+    if width is None:
+        if unicodedata.combining(ch) or unicodedata.category(ch) in ("Mn", "Me", "Cf", "Cc"):
+            width = 0
+        elif unicodedata.east_asian_width(ch) in ("W", "F"):
+            width = 2
+        else:
+            width = 1
+        _widths[ch] = width
+    return width
+
+
+def _regional(ch):
+    return "\U0001F1E6" <= ch <= "\U0001F1FF"
+
+
+def _skin_tone(ch):
+    return "\U0001F3FB" <= ch <= "\U0001F3FF"
+
+
+def graphemes(text):
+    """Split text into user-perceived characters and their cell widths.
+
+    Covers what lyrics use: base characters with combining marks,
+    variation selectors and skin tones, ZWJ emoji sequences and flag
+    pairs. Returns a list of (cluster, width).
+    """
+    clusters = []
+    joined = False
+    for ch in text:
+        width = char_width(ch)
+        if clusters and (joined or width == 0 or _skin_tone(ch)):
+            cluster, cluster_width = clusters[-1]
+            clusters[-1] = (cluster + ch, cluster_width)
+        elif (clusters and _regional(ch) and len(clusters[-1][0]) == 1
+              and _regional(clusters[-1][0])):
+            clusters[-1] = (clusters[-1][0] + ch, 2)
+        else:
+            clusters.append((ch, width))
+        joined = ch == ZWJ
+    return clusters
+
+
+def display_width(text):
+    if text.isascii():
+        return len(text)
+    return sum(width for _, width in graphemes(text))
+
+
+def fit(text, cells):
+    """Longest prefix of text that fits in cells, never splitting a cluster"""
+    if text.isascii():
+        return text[:cells]
+    used = 0
+    end = 0
+    for cluster, width in graphemes(text):
+        if used + width > cells:
+            break
+        used += width
+        end += len(cluster)
+    return text[:end]
+
+
+def center_x(text, width):
+    """Column that centers text in width cells"""
+    return (width - display_width(text)) // 2
+
+
+class TextLine:
+    """One line of text split into clusters once, with cumulative cell offsets.
+
+    Highlight and centering positions are then table lookups instead of
+    walking the string every frame.
+    """
+
+    __slots__ = ("text", "offsets", "indices", "width", "cuts", "_wraps")
+
+    def __init__(self, text):
+        self.text = text
+        offsets = [0]  # cells before each cluster, and the total at the end
+        indices = [0]  # string index of each cluster start, and len(text)
+        for cluster, width in graphemes(text):
+            offsets.append(offsets[-1] + width)
+            indices.append(indices[-1] + len(cluster))
+        self.offsets = offsets
+        self.indices = indices
+        self.width = offsets[-1]
+        # Clusters wholly within the first c cells, for every c up to the width
+        cuts = []
+        count = 0
+        for cells in range(self.width + 1):
+            while count + 1 < len(offsets) and offsets[count + 1] <= cells:
+                count += 1
+            cuts.append(count)
+        self.cuts = cuts
+        self._wraps = {}
+
+    def split(self, cells):
+        """(head, tail, head_cells): the clusters wholly within the first cells, and the rest"""
+        count = self.cuts[max(0, min(cells, self.width))]
+        index = self.indices[count]
+        return self.text[:index], self.text[index:], self.offsets[count]
+
+    def wrap(self, width):
+        """TextLines of at most width cells, broken at spaces where possible; cached per width"""
+        lines = self._wraps.get(width)
+        if lines is None:
+            lines = self._wraps[width] = [TextLine(part) for part in self._wrap(width)]
+        return lines
+
+    def _wrap(self, width):
+        if self.width <= width or width <= 0:
+            return [self.text]
+        parts = []
+        text = self.text
+        offsets, indices = self.offsets, self.indices
+        start = 0  # cluster index the current row starts at
+        while offsets[-1] - offsets[start] > width:
+            end = bisect_right(offsets, offsets[start] + width) - 1
+            end = max(end, start + 1)  # a cluster wider than the row still has to go somewhere
+            cut = text.rfind(" ", indices[start], indices[end] + 1)
+            if cut > indices[start]:
+                parts.append(text[indices[start]:cut])
+                start = bisect_right(indices, cut)  # resume after the space
+            else:
+                parts.append(text[indices[start]:indices[end]])
+                start = end
+        parts.append(text[indices[start]:])
+        return parts
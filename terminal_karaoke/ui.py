@@ -2,40 +2,44 @@ import curses
 import os
 import time
 from .menus import MenuManager
+from .pitch import SILENCE_DB, note_name
+from .melody import LEVELS
+from .text import center_x, fit
+from .bandwidth import RenderGovernor
+from .layout import EMPTY_MESSAGE, REC_INDICATOR, TITLE, Layout, layout_key
+
+# (pair, foreground, foreground where the terminal lacks it)
+COLOR_PAIRS = [
+    (1, curses.COLOR_CYAN, curses.COLOR_CYAN),        # Title
+    (2, curses.COLOR_YELLOW, curses.COLOR_YELLOW),    # Current line (highlighted)
+    (3, curses.COLOR_GREEN, curses.COLOR_GREEN),      # Progress bar
+    (4, curses.COLOR_RED, curses.COLOR_RED),          # Error/status
+    (5, curses.COLOR_MAGENTA, curses.COLOR_MAGENTA),  # Cat/controls
+    (6, 8, curses.COLOR_BLACK),                       # Past lyrics (darker)
+    (7, curses.COLOR_WHITE, curses.COLOR_WHITE),      # Normal text
+    (8, curses.COLOR_BLUE, curses.COLOR_BLUE),        # Future lyrics (brighter)
+]
 
 class UI:
-    def __init__(self, stdscr):
-        self.stdscr = stdscr
+    def __init__(self, stdscr, clock=time.time, low_bandwidth=False):
+        self.stdscr = stdscr  # a CursesScreen, or a MemoryScreen when headless
+        self.clock = clock
+        self.governor = RenderGovernor(forced=low_bandwidth)
+        self.repaint = True  # next frame clears the terminal instead of sending a diff
         self.visible_lines = 7
         self.progress_bar_width = 50
         self.dancing_cat_frames = self.create_dancing_cat_frames()
         self.cat_frame_idx = 0
-        self.last_cat_update = time.time()
+        self.last_cat_update = clock()
         self.cat_update_interval = 0.15
         self.setup_colors()
         self.menu_manager = MenuManager(stdscr)
+        self.size = None  # (height, width), read again only after KEY_RESIZE
+        self.layout = None
+        self.layout_key = None
 
     def setup_colors(self):
-        curses.start_color()
-        curses.use_default_colors()
-        try:
-            curses.init_pair(1, curses.COLOR_CYAN, -1)      # Title
-            curses.init_pair(2, curses.COLOR_YELLOW, -1)    # Current line (highlighted)
-            curses.init_pair(3, curses.COLOR_GREEN, -1)     # Progress bar
-            curses.init_pair(4, curses.COLOR_RED, -1)       # Error/status
-            curses.init_pair(5, curses.COLOR_MAGENTA, -1)   # Cat/controls
-            curses.init_pair(6, 8, -1)                      # Past lyrics (darker)
-            curses.init_pair(7, curses.COLOR_WHITE, -1)     # Normal text
-            curses.init_pair(8, curses.COLOR_BLUE, -1)      # Future lyrics (brighter)
-        except:
-            curses.init_pair(1, curses.COLOR_CYAN, -1)
-            curses.init_pair(2, curses.COLOR_YELLOW, -1)
-            curses.init_pair(3, curses.COLOR_GREEN, -1)
-            curses.init_pair(4, curses.COLOR_RED, -1)
-            curses.init_pair(5, curses.COLOR_MAGENTA, -1)
-            curses.init_pair(6, curses.COLOR_BLACK, -1)
-            curses.init_pair(7, curses.COLOR_WHITE, -1)
-            curses.init_pair(8, curses.COLOR_BLUE, -1)
+        self.stdscr.init_colors(COLOR_PAIRS)
 
     def create_dancing_cat_frames(self):
         frames = [
@@ -74,36 +78,86 @@ class UI:
         for frame in frames:
             max_len = max(len(line) for line in frame)
             padded_frame = [line.center(max_len) for line in frame]
-            formatted_frames.append("\n".join(padded_frame))
+            formatted_frames.append(padded_frame)
         return formatted_frames
 
-    def update_animation(self, current_time):
-        if current_time - self.last_cat_update > self.cat_update_interval:
+    def update_animation(self, current_time, beat=None):
+        """Step the cat on each beat when the song's beats are known, else on a timer"""
+        if beat is not None:
+            self.cat_frame_idx = beat % len(self.dancing_cat_frames)
+        elif current_time - self.last_cat_update > self.cat_update_interval:
             self.cat_frame_idx = (self.cat_frame_idx + 1) % len(self.dancing_cat_frames)
             self.last_cat_update = current_time
 
-    def get_visible_lines(self, player):
-        if not player.lyrics:
-            return [], 0, 0
-        start_idx = max(0, player.current_line_idx - (self.visible_lines // 2))
-        end_idx = min(len(player.lyrics), start_idx + self.visible_lines)
-        if end_idx - start_idx < self.visible_lines and start_idx > 0:
-            start_idx = max(0, end_idx - self.visible_lines)
-        visible = player.lyrics[start_idx:end_idx]
-        current_visible_idx = player.current_line_idx - start_idx
-        return visible, start_idx, current_visible_idx
-
-    def draw_progress_bar(self, y, x, width, current_time, total_time):
+    def invalidate_layout(self):
+        """Forget the cached size and layout after a resize"""
+        self.size = None
+        self.layout = None
+        self.repaint = True
+
+    def get_layout(self, player):
+        """Layout for the current size, song and line, rebuilt only when one of them changes"""
+        if self.size is None:
+            self.size = self.stdscr.getmaxyx()
+        key = layout_key(self.size, player)
+        if key != self.layout_key or self.layout is None:
+            self.layout = Layout(self.size, player, self.visible_lines, self.progress_bar_width,
+                                 self.dancing_cat_frames)
+            self.layout_key = key
+        return self.layout
+
+    def put(self, y, x, text, attr=0):
+        """addstr clipped to the screen in display cells; never writes the bottom-right cell"""
+        height, width = self.size
+        if not text or not 0 <= y < height:
+            return
+        if x < 0:
+            text = text[len(fit(text, -x)):]  # drop the cells left of the screen
+            x = 0
+        room = width - x - (1 if y == height - 1 else 0)
+        if room <= 0:
+            return
+        try:
+            self.stdscr.addstr(y, x, fit(text, room), attr)
+        except curses.error:
+            pass  # a terminal that disagrees about a character's width
+
+    def centered(self, y, text, attr=0):
+        self.put(y, center_x(text, self.size[1]), text, attr)
+
+    def draw_progress_bar(self, layout, current_time, total_time):
+        width = layout.bar_width
         progress = min(1.0, max(0.0, current_time / total_time)) if total_time > 0 else 0
         filled = int(width * progress)
         bar = "█" * filled + "░" * (width - filled)
-        self.stdscr.addstr(y, x, f"[{bar}]", curses.color_pair(3))
+        self.put(layout.bar_y, layout.bar_x, f"[{bar}]", self.stdscr.color_pair(3))
         
         time_text = f"{self.format_time(current_time)}/{self.format_time(total_time)}"
-        time_y = y - 1
-        time_x = x + (width // 2) - (len(time_text) // 2)
-        if time_y > 0:
-            self.stdscr.addstr(time_y, time_x, time_text, curses.color_pair(7))
+        if layout.time_y > 0:
+            self.put(layout.time_y, layout.bar_x + (width // 2) - (len(time_text) // 2), time_text, self.stdscr.color_pair(7))
+
+    def draw_visualizer(self, y, levels):
+        """One row of spectrum bars from precomputed band levels (0-255)"""
+        bar_width = max(1, self.progress_bar_width // len(levels))
+        bars = "".join(LEVELS[int(level) * len(LEVELS) // 256] * bar_width for level in levels)
+        self.centered(y, bars, self.stdscr.color_pair(3))
+
+    def draw_mic_meter(self, y, player):
+        """Mic level bar, sung note and the last line's score from the latest pitch snapshot"""
+        snapshot = player.analyzer.snapshot
+        meter_width = 20
+        level = min(1.0, max(0.0, (snapshot.level_db - SILENCE_DB) / -SILENCE_DB))
+        filled = int(meter_width * level)
+        text = f"Mic [{'█' * filled}{'░' * (meter_width - filled)}] "
+        if snapshot.frequency:
+            name, cents = note_name(snapshot.frequency)
+            text += f"{name:<3} {cents:+3d}¢"
+        else:
+            text += " --     "
+        score = player.line_scorer.score(player.current_line_idx - 1)
+        if score is not None:
+            text += f"  Last line {score}%"
+        self.centered(y, text, self.stdscr.color_pair(3))
 
     def format_time(self, seconds):
         if seconds is None or seconds < 0:
@@ -112,142 +166,109 @@ class UI:
         secs = int(seconds % 60)
         return f"{mins:02d}:{secs:02d}"
 
-    def draw_lyrics(self, player):
+    def draw_lyrics(self, layout, player, current_time):
         """Draw lyrics with different colors for past, current, and future lines"""
-        if not player.lyrics:
-            return
-            
-        current_time = player.current_time()
-        visible_lines, start_idx, current_visible_idx = self.get_visible_lines(player)
-        height, width = self.stdscr.getmaxyx()
-        lyrics_start_y = (height - len(visible_lines)) // 2
+        for y, x, line, role in layout.lyric_rows:
+            self.put(y, x, line, self.stdscr.color_pair(6 if role == "past" else 8))
+        if layout.current_rows:
+            start, end = layout.current_times
+            self.draw_current_line_progress(layout, current_time, start, end)
         
-        for i, (timestamp, line) in enumerate(visible_lines):
-            y = lyrics_start_y + i
-            if 0 < y < height - 5:
-                x = (width - len(line)) // 2
-                
-                # Determine color based on timing
-                if i < current_visible_idx:
-                    # Past line
-                    self.stdscr.addstr(y, x, line, curses.color_pair(6))
-                elif i == current_visible_idx:
-                    # Current line with progress highlighting
-                    current_line_time = player.lyrics[player.current_line_idx][0]
-                    next_line_time = (
-                        player.lyrics[player.current_line_idx + 1][0] 
-                        if player.current_line_idx < len(player.lyrics) - 1 
-                        else player.total_time
-                    )
-                    self.draw_current_line_progress(
-                        line, y, x, 
-                        current_time, current_line_time, next_line_time
-                    )
-                else:
-                    # Future line
-                    self.stdscr.addstr(y, x, line, curses.color_pair(8))
-
-    def draw_current_line_progress(self, line_text, y, x, current_time, current_line_time, next_line_time):
-        """Draw current line with progress highlighting"""
-        if not line_text:
-            return
+        # Upcoming reference melody under the lyrics
+        if player.melody is not None and layout.melody_y is not None:
+            strip = layout.melody_strip(player.melody, current_time * player.audio_tempo, self.progress_bar_width)
+            if strip.strip():
+                self.centered(layout.melody_y, strip, self.stdscr.color_pair(1))
+
+    def draw_current_line_progress(self, layout, current_time, current_line_time, next_line_time):
+        """Draw current line with progress highlighting, wiped across its rows by display cell"""
         line_duration = next_line_time - current_line_time
         if line_duration <= 0:
             line_progress = 1.0
         else:
             line_progress = min(1.0, max(0.0, (current_time - current_line_time) / line_duration))
-        num_colored = int(len(line_text) * line_progress)
-        completed_text = line_text[:num_colored]
-        remaining_text = line_text[num_colored:]
-        self.stdscr.addstr(y, x, completed_text, curses.color_pair(2))  # Past color (darker)
-        self.stdscr.addstr(remaining_text, curses.color_pair(8))  # Current color (brighter/yellow)
-
-    def draw(self, player):
-        self.stdscr.clear()
-        height, width = self.stdscr.getmaxyx()
+        # Under backpressure the wipe moves in coarser steps, so fewer frames change
+        step = self.governor.highlight_step
+        colored = int(layout.current_width * line_progress) // step * step
+        for y, x, row, before in layout.current_rows:
+            completed_text, remaining_text, cells = row.split(colored - before)
+            self.put(y, x, completed_text, self.stdscr.color_pair(2))  # Past color (darker)
+            self.put(y, x + cells, remaining_text, self.stdscr.color_pair(8))  # Current color (brighter/yellow)
+
+    def draw(self, player, urgent=False):
+        """Draw a frame if one is due; urgent (input was handled) draws regardless.
+
+        Frames that change the layout, such as a new lyric line, are always
+        drawn; other frames follow the governor's rate under backpressure.
+        """
+        previous = self.layout
+        layout = self.get_layout(player)
+        now = self.clock()
+        if not (urgent or layout is not previous or self.governor.due(now)):
+            return
+        governor = self.governor
+        # erase lets curses send only the cells that changed; clear repaints everything
+        if self.repaint:
+            self.stdscr.clear()
+            self.repaint = False
+        else:
+            self.stdscr.erase()
         
         # Get current time once for consistency
-        current_time = player.current_time()
+        current_time = player.display_time()
         
-        title = " TERMINAL KARAOKE "
-        title_x = (width - len(title)) // 2
-        self.stdscr.addstr(0, title_x, title, curses.color_pair(1) | curses.A_BOLD)
+        self.put(0, layout.title_x, TITLE, self.stdscr.color_pair(1) | curses.A_BOLD)
         
         # Show playlist info if in playlist mode
-        if player.playlist_mode and player.current_playlist:
-            shuffle_icon = "🔀 " if player.current_playlist.shuffle_mode else ""
-            playlist_info = f"{shuffle_icon}Playlist: {player.current_playlist.name} [{player.current_playlist.current_index + 1}/{len(player.current_playlist.songs)}]"
-            info_x = (width - len(playlist_info)) // 2
-            self.stdscr.addstr(1, info_x, playlist_info, curses.color_pair(5))
-            song_line = 2
-        else:
-            song_line = 1
+        if layout.playlist_info:
+            info_x, playlist_info = layout.playlist_info
+            self.put(1, info_x, playlist_info, self.stdscr.color_pair(5))
         
-        if player.song_path:
-            song_name = os.path.basename(player.song_path)
-            self.stdscr.addstr(song_line, 2, f"Song: {song_name}", curses.color_pair(7))
-            self.stdscr.addstr(1, 2, f"Song: {song_name}", curses.color_pair(7))
+        if layout.song_text:
+            self.put(layout.song_y, 2, layout.song_text, self.stdscr.color_pair(7))
             
             # Show recording indicator
-            if hasattr(player, 'is_recording') and player.is_recording:
-                rec_indicator = " [●REC] "
-                rec_x = width - len(rec_indicator) - 2
-                self.stdscr.addstr(1, rec_x, rec_indicator, curses.color_pair(4) | curses.A_BOLD)
+            if player.is_recording:
+                self.put(layout.song_y, layout.rec_x, REC_INDICATOR, self.stdscr.color_pair(4) | curses.A_BOLD)
+        
+        if self.clock() < player.status_timer and player.status_message:
+            self.centered(layout.status_y, player.status_message, self.stdscr.color_pair(4))
         
-        if time.time() < player.status_timer and player.status_message:
-            status_x = (width - len(player.status_message)) // 2
-            status_y = song_line + 1
-            self.stdscr.addstr(status_y, status_x, player.status_message, curses.color_pair(4))
+        frame = player.envelope_frame()
+        if frame is not None and layout.visualizer_y is not None and governor.cosmetics:
+            self.draw_visualizer(layout.visualizer_y, frame[:-1])
         
         if player.lyrics:
             # Draw lyrics with color coding
-            self.draw_lyrics(player)
+            self.draw_lyrics(layout, player, current_time)
             
             # Draw dancing cat
-            height, width = self.stdscr.getmaxyx()
-            visible_lines, start_idx, current_visible_idx = self.get_visible_lines(player)
-            lyrics_start_y = (height - len(visible_lines)) // 2
-            cat_y = lyrics_start_y - 4
-            cat_frame = self.dancing_cat_frames[self.cat_frame_idx]
-            cat_lines = cat_frame.split('\n')
-            for i, line in enumerate(cat_lines):
-                if 0 < cat_y + i < height - 5:
-                    cat_x = (width - max(len(l) for l in cat_lines)) // 2
-                    self.stdscr.addstr(cat_y + i, cat_x, line, curses.color_pair(5))
+            if governor.show_cat:
+                cat_lines = self.dancing_cat_frames[self.cat_frame_idx]
+                for y, i in layout.cat_rows:
+                    self.put(y, layout.cat_x, cat_lines[i], self.stdscr.color_pair(5))
         else:
-            msg = "Load .mp3 and .lrc files to start"
-            x = (width - len(msg)) // 2
-            self.stdscr.addstr(height//2, x, msg, curses.color_pair(6))
+            x, y = layout.empty_message
+            self.put(y, x, EMPTY_MESSAGE, self.stdscr.color_pair(6))
+        
+        if player.analyzer is not None and player.analyzer.running:
+            self.draw_mic_meter(layout.meter_y, player)
         
         if player.total_time > 0:
-            bar_y = height - 3
-            bar_x = (width - self.progress_bar_width) // 2
-            self.draw_progress_bar(bar_y, bar_x, self.progress_bar_width, current_time, player.total_time)
+            self.draw_progress_bar(layout, current_time, player.total_time)
         
-        controls = " | ".join([f"<{k}> {v}" for k, v in player.controls.items()])
-        controls_x = (width - len(controls)) // 2
-        self.stdscr.addstr(height - 1, controls_x, controls, curses.color_pair(5))
+        if player.profiler.enabled:
+            overlay = player.profiler.overlay_text()
+            self.put(0, max(0, layout.width - len(overlay) - 1), overlay, self.stdscr.color_pair(4) | curses.A_REVERSE)
         
+        menus = self.menu_manager
+        if menus.active:
+            menus.draw(self, layout)
+        if menus.active:
+            self.centered(layout.controls_y, menus.stack[-1].hint, self.stdscr.color_pair(5))
+        else:
+            self.put(layout.controls_y, layout.controls_x, layout.controls, self.stdscr.color_pair(5))
+        
+        started = time.perf_counter()
         self.stdscr.refresh()
-    
-    # Delegate menu methods to MenuManager
-    def show_file_loader(self, player):
-        return self.menu_manager.show_file_loader(player)
-    
-    def show_search_menu(self, player):
-        return self.menu_manager.show_search_menu(player)
-    
-    def show_library_menu(self, player):
-        return self.menu_manager.show_library_menu(player)
-    
-    def show_local_file_loader(self, player):
-        return self.menu_manager.show_local_file_loader(player)
-    
-    def show_download_progress(self, message):
-        return self.menu_manager.show_download_progress(message)
-        height, width = self.stdscr.getmaxyx()
-        self.stdscr.clear()
-        msg = f"Downloading: {message}"
-        x = (width - len(msg)) // 2
-        self.stdscr.addstr(height//2, x, msg, curses.color_pair(3))
-        self.stdscr.refresh()
+        governor.record(now, time.perf_counter() - started, self.stdscr.pending_output())
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from .dsp import decode_pcm, frame_signal, overlap_add, write_wav
+from .persistence import atomic_write_json, remove_file
+
+RATE = 44100
+N_FFT = 2048
+HOP = 512
+MIN_TEMPO = 0.5
+MAX_TEMPO = 1.5
+MAX_SEMITONES = 12
+BLOCK_FRAMES = 1024  # STFT frames per block, about 8 MB per spectrum
+BLOCK_SAMPLES = 1 << 20  # samples per block when resampling
+
+
+def stretch(signal, rate):
+    """Phase-vocoder time stretch of a mono signal by rate (>1 is faster).
+
+    Works through BLOCK_FRAMES output frames at a time, carrying the phase
+    from block to block, so only a block's spectra are ever held rather
+    than the whole song's.
+    """
+    window = np.hanning(N_FFT + 1)[:N_FFT].astype(np.float32)
+    padded = np.pad(signal, (N_FFT // 2, N_FFT // 2))
+    if len(padded) < N_FFT:
+        padded = np.pad(padded, (0, N_FFT - len(padded)))
+    count = 1 + (len(padded) - N_FFT) // HOP
+    steps = np.arange(0, count - 1, rate)
+    if not len(steps):
+        return np.zeros(0, dtype=np.float32)
+    expected = (2 * np.pi * HOP * np.arange(N_FFT // 2 + 1) / N_FFT).astype(np.float32)
+    out = np.zeros((len(steps) - 1) * HOP + N_FFT, dtype=np.float32)
+    phase_start = None
+    for start in range(0, len(steps), BLOCK_FRAMES):
+        block = steps[start:start + BLOCK_FRAMES]
+        base = np.floor(block).astype(int)
+        first = base[0]
+        # Input frames first..base[-1] + 1, the pair each output frame lies between
+        frames = frame_signal(padded[first * HOP:(base[-1] + 1) * HOP + N_FFT], N_FFT, HOP)
+        spectrum = np.fft.rfft(frames * window, axis=1).astype(np.complex64)
+        base -= first
+        frac = (block - np.floor(block))[:, None].astype(np.float32)
+        magnitude = (1 - frac) * np.abs(spectrum[base]) + frac * np.abs(spectrum[base + 1])
+
+        phase = np.angle(spectrum)
+        advance = phase[base + 1] - phase[base] - expected
+        advance -= 2 * np.pi * np.round(advance / (2 * np.pi))
+        if phase_start is None:
+            phase_start = phase[0]
+        # Output phase is the first frame's phase plus the accumulated true advances
+        steps_taken = expected + advance
+        accumulated = phase_start + np.cumsum(np.vstack([np.zeros_like(expected), steps_taken[:-1]]), axis=0)
+        phase_start = np.mod(accumulated[-1] + steps_taken[-1], 2 * np.pi)
+
+        output = np.fft.irfft(magnitude * np.exp(1j * accumulated), n=N_FFT, axis=1).astype(np.float32) * window
+        offset = start * HOP
+        out[offset:offset + (len(block) - 1) * HOP + N_FFT] += overlap_add(output, HOP)
+    gain = np.sum(window ** 2) / HOP  # overlap of the squared window
+    return out[N_FFT // 2:] / gain
+
+
+def resample(signal, length):
+    """Linear-interpolation resample of a mono signal to length samples"""
+    if not len(signal):
+        return np.zeros(length, dtype=np.float32)
+    out = np.empty(length, dtype=np.float32)
+    scale = (len(signal) - 1) / (length - 1) if length > 1 else 0.0
+    for start in range(0, length, BLOCK_SAMPLES):
+        positions = np.arange(start, min(length, start + BLOCK_SAMPLES)) * scale
+        low = int(positions[0])
+        high = min(len(signal), int(positions[-1]) + 2)
+        out[start:start + len(positions)] = np.interp(positions, np.arange(low, high), signal[low:high])
+    return out
+
+
+def shift_and_stretch(samples, semitones=0, tempo=1.0):
+    """Transpose by semitones and change speed by tempo, shaped (frames, channels)"""
+    pitch = 2.0 ** (semitones / 12.0)
+    out_length = int(round(len(samples) / tempo))
+    channels = []
+    for channel in samples.T:
+        # Stretch to pitch/tempo of the length, then resampling by pitch restores the tempo
+        stretched = stretch(channel, tempo / pitch)
+        channels.append(resample(stretched, out_length) if semitones else stretched[:out_length])
+    length = min(len(c) for c in channels)
+    return np.stack([c[:length] for c in channels], axis=1)
+
+
+def render_variant(job):
+    """Worker: render (source_path, semitones, tempo, out_path) and return out_path"""
+    source_path, semitones, tempo, out_path = job
+    if os.path.exists(out_path):
+        return out_path
+    samples = decode_pcm(source_path, RATE, 2)
+    rendered = shift_and_stretch(samples, semitones, tempo)
+    temp_path = out_path + ".part"
+    write_wav(temp_path, rendered, RATE)
+    os.replace(temp_path, out_path)
+    return out_path
+
+
+class VariantCache:
+    """Size-bounded LRU cache of rendered key and tempo variants on disk.
+
+    Evicted files are deleted through discard(path), like PCMCache's.
+    """
+
+    def __init__(self, cache_dir, budget_bytes=2 << 30, persistence=None, discard=remove_file):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.persistence = persistence
+        self.discard = discard
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.entries = {}  # key -> {"size", "last_used"}
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception:
+            self.entries = {}
+
+    def key(self, source_path, semitones, tempo):
+        """Cache key for a rendering of source_path; changes if the file does"""
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        ident = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime}|{semitones:+d}|{tempo:.2f}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()[:20]
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key):
+        """Path of a cached variant, or None. Marks it as recently used"""
+        if key not in self.entries:
+            return None
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            del self.entries[key]
+            self.mark_dirty()
+            return None
+        self.entries[key]["last_used"] = time.time()
+        self.mark_dirty()
+        return path
+
+    def put(self, key):
+        """Register a rendered file and evict least recently used variants over budget"""
+        try:
+            size = os.path.getsize(self.path_for(key))
+        except OSError:
+            return None
+        self.entries[key] = {"size": size, "last_used": time.time()}
+        total = sum(entry["size"] for entry in self.entries.values())
+        for old_key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.budget_bytes or old_key == key:
+                break
+            total -= self.entries.pop(old_key)["size"]
+            self.discard(self.path_for(old_key))
+        self.mark_dirty()
+        return self.path_for(key)
+
+    def save(self):
+        atomic_write_json(self.manifest_path, dict(self.entries))
+
+    def mark_dirty(self):
+        if self.persistence is None:
+            self.save()
+        else:
+            self.persistence.mark_dirty("variant_cache", self.save)
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from .dsp import decode_pcm, write_wav
+from .fingerprint import content_hash
+from .jobs import run_parallel
+
+RATE = 44100
+BLOCK = 4096  # FFT block; blocks overlap by half under a Hann window
+BATCH = 256  # blocks transformed per vectorised step, bounds memory use
+# The centre channel is kept outside this band, where vocals carry little
+# energy, so bass and cymbals survive the cancellation
+VOCAL_BAND = (150.0, 7000.0)
+CACHE_DIR = ".instrumental"
+
+
+def instrumental_path(mp3_path, song_hash):
+    """Cache location for a song's instrumental, next to the original"""
+    return os.path.join(os.path.dirname(mp3_path), CACHE_DIR, f"{song_hash}.wav")
+
+
+def band_stop(signal, rate, low, high):
+    """Remove the [low, high] Hz band from a mono signal with overlap-added FFT blocks"""
+    hop = BLOCK // 2
+    padded = np.pad(signal, (hop, hop + (-len(signal)) % hop + hop))
+    window = np.hanning(BLOCK + 1)[:BLOCK].astype(np.float32)  # periodic Hann sums to 1 at 50% overlap
+    freqs = np.fft.rfftfreq(BLOCK, 1.0 / rate)
+    keep = ((freqs < low) | (freqs > high)).astype(np.float32)
+    out = np.zeros_like(padded)
+    count = (len(padded) - BLOCK) // hop + 1
+    for first in range(0, count, BATCH):
+        last = min(count, first + BATCH)
+        starts = np.arange(first, last) * hop
+        blocks = padded[starts[:, None] + np.arange(BLOCK)] * window
+        filtered = np.fft.irfft(np.fft.rfft(blocks, axis=1) * keep, n=BLOCK, axis=1).astype(np.float32)
+        # Even and odd blocks never overlap each other, so each half adds without collisions
+        for parity in (0, 1):
+            rows = filtered[parity::2]
+            at = starts[parity::2]
+            out[(at[:, None] + np.arange(BLOCK)).ravel()] += rows.ravel()
+    return out[hop:hop + len(signal)]
+
+
+def reduce_vocals(samples, rate=RATE):
+    """Centre-channel cancellation of a (frames, 2) float array, keeping centred bass and highs"""
+    left, right = samples[:, 0], samples[:, 1]
+    mid = (left + right) * 0.5
+    side = (left - right) * 0.5
+    kept_mid = band_stop(mid, rate, *VOCAL_BAND)
+    return np.stack([kept_mid + side, kept_mid - side], axis=1)
+
+
+def make_instrumental(mp3_path):
+    """Worker: render and cache a song's instrumental. Returns (content_hash, path)"""
+    song_hash = content_hash(mp3_path)
+    out_path = instrumental_path(mp3_path, song_hash)
+    if os.path.exists(out_path):
+        return song_hash, out_path
+    samples = decode_pcm(mp3_path, RATE, 2)
+    instrumental = reduce_vocals(samples)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    temp_path = out_path + ".part"
+    write_wav(temp_path, instrumental, RATE)
+    os.replace(temp_path, out_path)
+    return song_hash, out_path
+
+
+def cached_instrumental(mp3_path, entry):
+    """Path of an already rendered instrumental for an indexed song, or None"""
+    if not entry or "content_hash" not in entry:
+        return None
+    path = instrumental_path(mp3_path, entry["content_hash"])
+    return path if os.path.exists(path) else None
+
+
+def render_library_instrumentals(library_path, workers=None):
+    """Command line entry point: render instrumentals for every indexed song"""
+    from .library import LibraryIndex
+    from .persistence import PersistenceService
+
+    persistence = PersistenceService()
+    index = LibraryIndex(library_path, persistence)
+
+    def progress(done, total):
+        print(f"\rRendering instrumentals {done}/{total}", end="", flush=True)
+
+    try:
+        index.scan()
+        pending = [path for path in index.entries if not cached_instrumental(path, index.get(path))]
+        for mp3_path, result in run_parallel(make_instrumental, pending, workers, progress):
+            if result:
+                index.update(mp3_path, content_hash=result[0])
+        print()
+    finally:
+        persistence.close()
@@ -0,0 +1,67 @@
+from terminal_karaoke.bandwidth import (
+    ESCALATE_GAP, LEVELS, QUEUE_CLEAR, QUEUE_HIGH, RECOVER_SECONDS, WRITE_SLOW, RenderGovernor,
+)
+
+
+def run_frames(governor, start, end, step, write_seconds=0.0, queued_bytes=0):
+    now = start
+    while now < end:
+        governor.record(now, write_seconds, queued_bytes)
+        now += step
+    return now
+
+
+def test_starts_at_full_rate():
+    governor = RenderGovernor()
+    assert governor.level == 0
+    assert governor.fps is None
+    assert governor.show_cat
+    assert governor.highlight_step == 1
+    assert governor.due(0.0)
+
+
+def test_forced_mode_starts_low_and_never_recovers():
+    governor = RenderGovernor(forced=True)
+    assert governor.level == 1
+    run_frames(governor, 0.0, RECOVER_SECONDS * 3, 0.1)
+    assert governor.level == 1
+
+
+def test_congestion_steps_down_once_per_gap():
+    governor = RenderGovernor()
+    governor.record(0.0, 0.0, QUEUE_HIGH + 1)
+    assert governor.level == 1
+    governor.record(ESCALATE_GAP / 2, WRITE_SLOW * 2, 0)
+    assert governor.level == 1  # a second slow frame right after costs nothing more
+    governor.record(ESCALATE_GAP, WRITE_SLOW * 2, 0)
+    assert governor.level == 2
+    governor.record(ESCALATE_GAP * 3, WRITE_SLOW * 2, 0)
+    assert governor.level == len(LEVELS) - 1
+    assert not governor.cosmetics
+
+
+def test_recovers_a_level_per_clean_period():
+    governor = RenderGovernor()
+    governor.record(0.0, 0.0, QUEUE_HIGH + 1)
+    governor.record(ESCALATE_GAP, 0.0, QUEUE_HIGH + 1)
+    assert governor.level == 2
+    now = run_frames(governor, 1.0, 1.0 + RECOVER_SECONDS + 0.1, 0.1)
+    assert governor.level == 1
+    run_frames(governor, now, now + RECOVER_SECONDS + 0.1, 0.1)
+    assert governor.level == 0
+
+
+def test_partly_drained_queue_holds_the_level():
+    governor = RenderGovernor()
+    governor.record(0.0, 0.0, QUEUE_HIGH + 1)
+    run_frames(governor, 1.0, 1.0 + RECOVER_SECONDS * 3, 0.1, queued_bytes=QUEUE_CLEAR + 1)
+    assert governor.level == 1
+
+
+def test_due_follows_the_level_frame_rate():
+    governor = RenderGovernor(forced=True)
+    fps = governor.fps
+    governor.record(10.0, 0.0, 0)
+    assert not governor.due(10.0 + 0.5 / fps)
+    assert governor.due(10.0 + 1.5 / fps)
+    assert governor.frames_at_level[1] == 1
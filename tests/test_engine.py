@@ -0,0 +1,48 @@
+import numpy as np
+
+from terminal_karaoke.engine import RingBuffer
+
+
+def frames(start, count, channels=2):
+    return np.repeat(np.arange(start, start + count, dtype=np.int16)[:, None], channels, axis=1)
+
+
+def test_reads_what_was_written_in_order():
+    ring = RingBuffer(8, 2)
+    assert ring.write(frames(0, 5)) == 5
+    assert ring.available() == 5
+    assert ring.space() == 3
+    assert np.array_equal(ring.read(3), frames(0, 3))
+    assert np.array_equal(ring.read(2), frames(3, 2))
+
+
+def test_wraps_around_the_end():
+    ring = RingBuffer(8, 2)
+    ring.write(frames(0, 6))
+    ring.read(6)
+    assert ring.write(frames(6, 7)) == 7  # 2 frames at the end, 5 back at the start
+    assert np.array_equal(ring.read(7), frames(6, 7))
+    assert ring.available() == 0
+
+
+def test_write_takes_only_what_fits():
+    ring = RingBuffer(4, 1)
+    assert ring.write(frames(0, 6, 1)) == 4
+    assert ring.write(frames(6, 1, 1)) == 0
+    assert np.array_equal(ring.read(10), frames(0, 4, 1))
+
+
+def test_underrun_returns_what_there_is():
+    ring = RingBuffer(8, 2)
+    assert ring.read(4).shape == (0, 2)
+    ring.write(frames(0, 3))
+    assert np.array_equal(ring.read(5), frames(0, 3))
+    assert ring.read(1).shape == (0, 2)
+
+
+def test_clear_drops_buffered_frames():
+    ring = RingBuffer(8, 2)
+    ring.write(frames(0, 5))
+    ring.clear()
+    assert ring.available() == 0
+    assert ring.space() == 8
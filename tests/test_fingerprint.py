@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from terminal_karaoke.fingerprint import (
+    FINGERPRINT_RATE, NEAR_THRESHOLD, compute_fingerprint, fingerprint_bits, fingerprint_spectrum, similarity,
+)
+
+
+def noise(seed, seconds=60):
+    return np.random.default_rng(seed).normal(size=FINGERPRINT_RATE * seconds)
+
+
+def spectrum(samples):
+    return fingerprint_spectrum(compute_fingerprint(samples))
+
+
+def test_fingerprint_round_trips_to_16_bits_per_frame():
+    bits = fingerprint_bits(compute_fingerprint(noise(0, seconds=5)))
+    assert bits.shape[1] == 16
+    assert bits.dtype == bool
+
+
+def test_same_audio_matches_fully():
+    song = spectrum(noise(0))
+    assert similarity(song, song) == pytest.approx(1.0)
+
+
+def test_longer_intro_still_matches():
+    audio = noise(0)
+    intro = np.concatenate([np.zeros(FINGERPRINT_RATE * 3), audio])
+    assert similarity(spectrum(audio), spectrum(intro)) > NEAR_THRESHOLD
+    assert similarity(spectrum(intro), spectrum(audio)) > NEAR_THRESHOLD
+
+
+def test_unrelated_audio_scores_about_half():
+    score = similarity(spectrum(noise(0)), spectrum(noise(1)))
+    assert 0.4 < score < 0.6
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from terminal_karaoke.latency import MIN_CONFIDENCE, find_delay, make_chirp
+
+RATE = 8000
+
+
+def chirp():
+    return make_chirp(RATE, 1)[:, 0].astype(np.float64)
+
+
+@pytest.mark.parametrize("delay", [0, 1, 700, 3000])
+def test_finds_a_known_delay_through_noise(delay):
+    reference = chirp()
+    recorded = np.concatenate([np.zeros(delay), reference * 0.2])[:len(reference)]
+    recorded += np.random.default_rng(delay).normal(scale=300, size=len(recorded))
+    lag, confidence = find_delay(reference, recorded, RATE)
+    assert lag == delay
+    assert confidence > MIN_CONFIDENCE
+
+
+def test_noise_alone_has_low_confidence():
+    recorded = np.random.default_rng(0).normal(scale=300, size=len(chirp()))
+    _, confidence = find_delay(chirp(), recorded, RATE)
+    assert confidence < MIN_CONFIDENCE
+
+
+def test_chirp_is_followed_by_silence():
+    frames = make_chirp(RATE, 2)
+    assert frames.dtype == np.int16
+    assert frames.shape[1] == 2
+    assert not frames[-RATE // 2:].any()
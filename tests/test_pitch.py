@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from terminal_karaoke.pitch import detect_pitch, note_name, yin_frames
+
+RATE = 44100
+
+
+def sine(frequency, size=2048, rate=RATE):
+    return np.sin(2 * np.pi * frequency * np.arange(size) / rate)
+
+
+@pytest.mark.parametrize("frequency", [110.0, 220.0, 440.0, 880.0])
+def test_yin_finds_a_sine(frequency):
+    hz, confidence = detect_pitch(sine(frequency), RATE)
+    assert hz == pytest.approx(frequency, rel=0.005)
+    assert confidence > 0.9
+
+
+def test_noise_is_unvoiced():
+    hz, confidence = detect_pitch(np.random.default_rng(0).normal(size=2048), RATE)
+    assert hz == 0.0
+    assert confidence == 0.0
+
+
+def test_rows_are_analysed_independently():
+    frames = np.stack([sine(220.0), np.random.default_rng(1).normal(size=2048), sine(330.0)])
+    hz, _ = yin_frames(frames, RATE)
+    assert hz[0] == pytest.approx(220.0, rel=0.005)
+    assert hz[1] == 0.0
+    assert hz[2] == pytest.approx(330.0, rel=0.005)
+
+
+def test_too_short_for_the_lowest_note():
+    hz, confidence = yin_frames(sine(440.0, size=512)[None, :], RATE)
+    assert hz[0] == 0.0 and confidence[0] == 0.0
+
+
+def test_note_name():
+    assert note_name(440.0) == ("A4", 0)
+    assert note_name(261.63) == ("C4", 0)
+    assert note_name(440.0 * 2 ** (0.25 / 12)) == ("A4", 25)
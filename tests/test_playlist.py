@@ -0,0 +1,133 @@
+from terminal_karaoke.library import LibraryIndex
+from terminal_karaoke.playlist import Playlist, PlaylistManager, SmartPlaylist
+
+
+def make_songs(tmp_path, count):
+    songs = []
+    for i in range(count):
+        mp3_path = tmp_path / f"song{i}.mp3"
+        lrc_path = tmp_path / f"song{i}.lrc"
+        mp3_path.write_bytes(b"")
+        lrc_path.write_text("")
+        songs.append((str(mp3_path), str(lrc_path)))
+    return songs
+
+
+def reload(library_path):
+    return PlaylistManager(str(library_path)).get_playlist("mix")
+
+
+def test_journal_replays_edits_over_snapshot(tmp_path):
+    songs = make_songs(tmp_path, 5)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist("mix")  # writes the snapshot
+    playlist = manager.get_playlist("mix")
+    for song in songs[:3]:
+        playlist.add_song(*song)
+    manager.save_playlist("mix")
+
+    playlist.add_song(*songs[3])
+    playlist.discard_song(*songs[0])
+    playlist.replace_song(songs[1], songs[4])
+    playlist.toggle_shuffle()
+    manager.save_playlist("mix")
+    assert (tmp_path / "playlists" / "mix.journal").exists()
+
+    loaded = reload(tmp_path)
+    assert loaded.songs == [songs[4], songs[2], songs[3]]
+    assert loaded.shuffle_mode
+    assert loaded.entry_id(*songs[4]) == playlist.entry_id(*songs[4])
+    # Ids keep counting from where the journal left off
+    assert loaded.add_song(*songs[0]) == playlist.add_song(*songs[0])
+
+
+def test_torn_final_journal_line_is_ignored(tmp_path):
+    songs = make_songs(tmp_path, 3)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist("mix")  # writes the snapshot
+    playlist = manager.get_playlist("mix")
+    playlist.add_song(*songs[0])
+    manager.save_playlist("mix")
+    playlist.add_song(*songs[1])
+    manager.save_playlist("mix")
+    with open(tmp_path / "playlists" / "mix.journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": 2, "so')
+
+    assert reload(tmp_path).songs == songs[:2]
+
+
+def test_edits_after_a_torn_line_survive(tmp_path):
+    songs = make_songs(tmp_path, 3)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist("mix")
+    playlist = manager.get_playlist("mix")
+    playlist.add_song(*songs[0])
+    manager.save_playlist("mix")
+    with open(tmp_path / "playlists" / "mix.journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": 1, "so')
+
+    manager = PlaylistManager(str(tmp_path))
+    manager.get_playlist("mix").add_song(*songs[1])
+    manager.save_playlist("mix")
+    assert reload(tmp_path).songs == songs[:2]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    songs = make_songs(tmp_path, 2)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist("mix")  # writes the snapshot
+    playlist = manager.get_playlist("mix")
+    playlist.add_song(*songs[0])
+    manager.save_playlist("mix")
+    for _ in range(PlaylistManager.COMPACT_MIN_OPS + 1):
+        playlist.toggle_song(*songs[1])
+    manager.save_playlist("mix")
+
+    assert not (tmp_path / "playlists" / "mix.journal").exists()
+    assert reload(tmp_path).songs == playlist.songs
+
+
+def test_replay_matches_live_edits():
+    live = Playlist("mix")
+    for i in range(10):
+        live.add_song(f"{i}.mp3", f"{i}.lrc")
+    for i in range(0, 10, 3):
+        live.discard_song(f"{i}.mp3", f"{i}.lrc")
+    live.replace_song(("1.mp3", "1.lrc"), ("x.mp3", "x.lrc"))
+
+    replayed = Playlist("mix")
+    for entry in live.drain_journal():
+        replayed.apply_journal_entry(entry)
+    assert replayed.songs == live.songs
+    assert [replayed.position(*song) for song in live.songs] == list(range(len(live)))
+
+
+def test_static_all_songs_becomes_smart(tmp_path):
+    songs = make_songs(tmp_path, 3)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist_from_folder(str(tmp_path), "All Songs")  # as saved by older versions
+    manager.get_playlist("All Songs").toggle_shuffle()
+    manager.save_playlist("All Songs")
+
+    index = LibraryIndex(str(tmp_path))
+    index.scan()
+    manager = PlaylistManager(str(tmp_path))
+    manager.attach_index(index)
+    playlist = manager.create_playlist_from_library()
+    assert isinstance(playlist, SmartPlaylist)
+    assert playlist.shuffle_mode
+    assert sorted(playlist.songs) == songs
+    assert not (tmp_path / "playlists" / "All Songs.json").exists()
+
+    reloaded = PlaylistManager(str(tmp_path)).get_playlist("All Songs")
+    assert isinstance(reloaded, SmartPlaylist)
+    assert reloaded.shuffle_mode
+
+
+def test_smart_definition_wins_over_a_leftover_static_file(tmp_path):
+    make_songs(tmp_path, 2)
+    manager = PlaylistManager(str(tmp_path))
+    manager.create_playlist_from_folder(str(tmp_path), "All Songs")
+    (tmp_path / "playlists" / "All Songs.smart").write_text('{"name": "All Songs", "query": {}}')
+
+    assert isinstance(PlaylistManager(str(tmp_path)).get_playlist("All Songs"), SmartPlaylist)
@@ -0,0 +1,114 @@
+import curses
+
+import pytest
+
+from terminal_karaoke.render import ATTR_BYTES, CLEAR_BYTES, MOVE_BYTES, MemoryScreen
+
+
+def test_first_frame_sends_clear_and_non_blank_cells():
+    screen = MemoryScreen(3, 10)
+    screen.addstr(1, 2, "abc")
+    screen.refresh()
+    frame = screen.frames[-1]
+    assert frame == {"writes": 1, "cells": 3, "changed": 3, "bytes": CLEAR_BYTES + MOVE_BYTES + 3}
+    assert screen.text() == ["", "  abc", ""]
+
+
+def test_unchanged_frame_sends_nothing():
+    screen = MemoryScreen(3, 10)
+    screen.addstr(0, 0, "hello")
+    screen.refresh()
+    screen.erase()
+    screen.addstr(0, 0, "hello")
+    screen.refresh()
+    assert screen.frames[-1]["changed"] == 0
+    assert screen.frames[-1]["bytes"] == 0
+
+
+def test_only_changed_cells_are_counted():
+    screen = MemoryScreen(3, 10)
+    screen.addstr(0, 0, "hello")
+    screen.refresh()
+    screen.erase()
+    screen.addstr(0, 0, "hallo")
+    screen.refresh()
+    # One cell, reached with one cursor move
+    assert screen.frames[-1]["changed"] == 1
+    assert screen.frames[-1]["bytes"] == MOVE_BYTES + 1
+
+
+def test_attribute_changes_and_gaps_cost_bytes():
+    screen = MemoryScreen(2, 10)
+    screen.refresh()
+    screen.addstr(0, 0, "ab", screen.color_pair(2))
+    screen.addstr(0, 5, "c")
+    screen.refresh()
+    # Move and colour for "ab", then a move and a reset back to no attributes for "c"
+    assert screen.frames[-1]["bytes"] == 2 * MOVE_BYTES + 2 * ATTR_BYTES + 3
+    assert screen.attr_runs()[0] == [[2 << 8, 2], [0, 8]]
+
+
+def test_wide_and_multibyte_cells():
+    screen = MemoryScreen(1, 10)
+    screen.addstr(0, 0, "日é")
+    screen.refresh()
+    frame = screen.frames[-1]
+    assert frame["cells"] == 3
+    assert frame["changed"] == 3  # both halves of the wide character
+    assert frame["bytes"] == CLEAR_BYTES + MOVE_BYTES + len("日é".encode("utf-8"))
+    assert screen.text() == ["日é"]
+
+
+def test_overwriting_half_a_wide_character_blanks_it():
+    screen = MemoryScreen(1, 10)
+    screen.addstr(0, 0, "日本")
+    screen.addstr(0, 1, "x")
+    screen.refresh()
+    assert screen.text() == [" x本"]
+
+
+def test_clear_repaints_everything():
+    screen = MemoryScreen(2, 10)
+    screen.addstr(0, 0, "abc")
+    screen.refresh()
+    screen.clear()
+    screen.addstr(0, 0, "abc")
+    screen.refresh()
+    assert screen.frames[-1]["bytes"] == CLEAR_BYTES + MOVE_BYTES + 3
+
+
+def test_writes_past_the_screen_fail_like_curses():
+    screen = MemoryScreen(2, 5)
+    with pytest.raises(curses.error):
+        screen.addstr(2, 0, "x")
+    with pytest.raises(curses.error):
+        screen.addstr(1, 3, "ab")  # written, but the cursor can't move past the last cell
+    screen.addstr(0, 3, "abc")  # wraps onto the next row
+    screen.refresh()
+    assert screen.text() == ["   ab", "c  ab"]
+
+
+def test_slow_link_queues_output():
+    now = [0.0]
+    screen = MemoryScreen(2, 10, clock=lambda: now[0], link_rate=100)
+    screen.addstr(0, 0, "x" * 10)
+    screen.refresh()
+    sent = screen.frames[-1]["bytes"]
+    assert screen.pending_output() == sent
+    now[0] = 0.1
+    assert screen.pending_output() == sent - 10
+    now[0] = 10
+    assert screen.pending_output() == 0
+
+
+def test_scripted_keys_follow_the_clock():
+    now = [0.0]
+    screen = MemoryScreen(keys=[(1.0, ord("p")), (0.5, ord("n"))], clock=lambda: now[0])
+    assert screen.getch() == -1
+    now[0] = 1.0
+    assert screen.getch() == ord("n")
+    assert screen.getch() == ord("p")
+    assert screen.getch() == -1
+    screen.resize(10, 20)
+    assert screen.getch() == curses.KEY_RESIZE
+    assert screen.getmaxyx() == (10, 20)
@@ -0,0 +1,59 @@
+from collections import deque
+
+import pytest
+
+from terminal_karaoke.playlist import Playlist
+from terminal_karaoke.shuffle import ShuffleEngine
+
+
+@pytest.mark.parametrize("id_bound", [1, 2, 5, 16, 17, 1000, 4097])
+def test_permutation_is_a_bijection(id_bound):
+    engine = ShuffleEngine()
+    engine.reseed(id_bound)
+    domain = engine.domain
+    assert domain >= id_bound
+    assert sorted(engine.permute(i) for i in range(domain)) == list(range(domain))
+
+
+def test_cycle_plays_every_song_once():
+    entries = {i: (f"{i}.mp3", f"{i}.lrc") for i in range(0, 300, 3)}  # gaps from removed entries
+    engine = ShuffleEngine()
+    engine.restart(300)
+    played = [engine.next(entries, 300) for _ in range(len(entries))]
+    assert sorted(played) == sorted(entries)
+
+
+def test_no_repeat_window():
+    playlist = Playlist("mix", [(f"{i}.mp3", f"{i}.lrc") for i in range(30)])
+    playlist.toggle_shuffle()
+    recent = deque(maxlen=20)
+    for _ in range(500):
+        mp3_path, _ = playlist.next_song(avoid=set(recent))
+        assert mp3_path not in recent
+        recent.append(mp3_path)
+
+
+def test_window_larger_than_playlist_still_plays():
+    playlist = Playlist("mix", [(f"{i}.mp3", f"{i}.lrc") for i in range(3)])
+    playlist.toggle_shuffle()
+    avoid = {f"{i}.mp3" for i in range(3)}
+    assert playlist.next_song(avoid=avoid) is not None
+
+
+def test_previous_then_next_retraces_history():
+    entries = {i: (f"{i}.mp3", f"{i}.lrc") for i in range(10)}
+    engine = ShuffleEngine()
+    engine.restart(10)
+    played = [engine.next(entries, 10) for _ in range(5)]
+    assert engine.previous(entries) == played[3]
+    assert engine.previous(entries) == played[2]
+    assert engine.next(entries, 10) == played[3]
+    assert engine.next(entries, 10) == played[4]
+
+
+def test_peek_is_what_next_returns():
+    entries = {i: (f"{i}.mp3", f"{i}.lrc") for i in range(50)}
+    engine = ShuffleEngine()
+    engine.restart(50)
+    for _ in range(20):
+        assert engine.peek(entries, 50) == engine.next(entries, 50)
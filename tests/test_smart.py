@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from terminal_karaoke.smart import DAY, SmartQuery, lyric_words, parse_duration
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("240", 240),
+    ("240s", 240),
+    ("4:00", 240),
+    ("3:30.5", 210.5),
+    ("4m", 240),
+    ("1.5M", 90),
+])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+
+def test_parse_fields():
+    query = SmartQuery.parse("artist:queen max:4:00 min:2m days:30 plays:3 maxplays:9 words:Love,,Night title:rock")
+    assert query.artist == "queen"
+    assert query.title == "rock"
+    assert query.max_duration == 240
+    assert query.min_duration == 120
+    assert query.added_within_days == 30
+    assert query.min_plays == 3
+    assert query.max_plays == 9
+    assert query.keywords == ["love", "night"]
+    assert query.text is None
+
+
+def test_unknown_and_empty_keys_are_free_text():
+    query = SmartQuery.parse("bohemian genre:rock rhapsody artist:")
+    assert query.text == "bohemian genre:rock rhapsody artist:"
+    assert query.artist is None
+
+
+def test_round_trips_through_dict():
+    query = SmartQuery.parse("artist:queen days:7 words:love live")
+    assert SmartQuery.from_dict(query.to_dict()).to_dict() == query.to_dict()
+    assert "title" not in query.to_dict()
+
+
+def test_matches():
+    now = 1_000_000_000
+    entry = {"artist": "Queen", "duration": 300, "added": now - 2 * DAY, "play_count": 4}
+    path = "/music/Queen - Bohemian Rhapsody.mp3"
+    assert SmartQuery.parse("artist:queen bohemian").matches(path, entry, now)
+    assert SmartQuery.parse("min:4:00 days:3 plays:4").matches(path, entry, now)
+    assert not SmartQuery.parse("max:4:00").matches(path, entry, now)
+    assert not SmartQuery.parse("days:1").matches(path, entry, now)
+    assert not SmartQuery.parse("maxplays:3").matches(path, entry, now)
+    assert not SmartQuery.parse("artist:abba").matches(path, entry, now)
+
+
+def test_duration_clause_needs_a_measured_duration():
+    assert not SmartQuery.parse("max:10:00").matches("/music/a.mp3", {}, 0)
+
+
+def test_expiry():
+    query = SmartQuery.parse("days:30")
+    assert query.expires_at({"added": 100}) == 100 + 30 * DAY
+    assert SmartQuery.parse("artist:queen").expires_at({"added": 100}) is None
+
+
+def test_keywords_match_whole_words_outside_timestamps(tmp_path):
+    lrc_path = tmp_path / "song.lrc"
+    lrc_path.write_text("[00:01.00]Love me tonight\n[00:05.00]under the night sky\n", encoding="utf-8")
+    entry = {"lrc_path": str(lrc_path)}
+    assert SmartQuery.parse("words:love,night").matches("/music/a.mp3", entry)
+    assert not SmartQuery.parse("words:lov").matches("/music/a.mp3", entry)
+    assert not SmartQuery.parse("words:00").matches("/music/a.mp3", entry)
+
+
+def test_lyric_words_are_cached_until_the_file_changes(tmp_path):
+    lrc_path = tmp_path / "song.lrc"
+    lrc_path.write_text("[00:01.00]hello world\n", encoding="utf-8")
+    words = lyric_words(str(lrc_path))
+    assert words == {"hello", "world"}
+    assert lyric_words(str(lrc_path)) is words
+
+    lrc_path.write_text("[00:01.00]goodbye\n", encoding="utf-8")
+    os.utime(lrc_path, (0, 12345))
+    assert lyric_words(str(lrc_path)) == {"goodbye"}
+    assert lyric_words(str(tmp_path / "missing.lrc")) is None
@@ -0,0 +1,64 @@
+import pytest
+
+from terminal_karaoke.text import TextLine, display_width, fit, graphemes
+
+
+@pytest.mark.parametrize("text, width", [
+    ("hello", 5),
+    ("", 0),
+    ("日本語", 6),
+    ("e\u0301te\u0301", 3),  # combining acute accents
+    ("👍🏽", 2),  # skin tone modifier
+    ("👨‍👩‍👧", 2),  # ZWJ family
+    ("🇯🇵🇫🇷", 4),  # two flags
+    ("a\u200bb", 2),  # zero-width space
+])
+def test_display_width(text, width):
+    assert display_width(text) == width
+    assert TextLine(text).width == width
+
+
+def test_clusters_stay_whole():
+    assert [cluster for cluster, _ in graphemes("🇯🇵👨‍👩é")] == ["🇯🇵", "👨‍👩", "é"]
+
+
+def test_split_never_cuts_a_cluster():
+    line = TextLine("a日b́c")
+    assert line.split(0) == ("", "a日b́c", 0)
+    assert line.split(2) == ("a", "日b́c", 1)  # 日 doesn't fit in the second cell
+    assert line.split(3) == ("a日", "b́c", 3)
+    assert line.split(4) == ("a日b́", "c", 4)
+    assert line.split(99) == ("a日b́c", "", 5)
+    assert line.split(-1) == ("", "a日b́c", 0)
+
+
+def test_fit():
+    assert fit("日本語", 5) == "日本"
+    assert fit("hello", 3) == "hel"
+
+
+def test_wrap_breaks_at_spaces():
+    rows = TextLine("the quick brown fox jumps").wrap(10)
+    assert [row.text for row in rows] == ["the quick", "brown fox", "jumps"]
+    assert all(row.width <= 10 for row in rows)
+
+
+def test_wrap_wide_text_without_spaces():
+    rows = TextLine("日本語のうた").wrap(5)
+    assert [row.text for row in rows] == ["日本", "語の", "うた"]
+    assert all(row.width <= 5 for row in rows)
+
+
+def test_wrap_keeps_everything_but_break_spaces():
+    text = "we will   we will rock you 日本語 🇯🇵🇫🇷 👍🏽 e\u0301te\u0301"
+    for width in range(2, 30):
+        rows = TextLine(text).wrap(width)
+        assert all(row.width <= width for row in rows)
+        assert "".join(row.text for row in rows).replace(" ", "") == text.replace(" ", "")
+
+
+def test_wrap_is_cached_per_width():
+    line = TextLine("one two three")
+    assert line.wrap(5) is line.wrap(5)
+    assert [row.text for row in line.wrap(0)] == ["one two three"]
+    assert [row.text for row in line.wrap(50)] == ["one two three"]
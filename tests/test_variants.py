@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from terminal_karaoke.pitch import detect_pitch
+from terminal_karaoke.variants import N_FFT, RATE, resample, shift_and_stretch, stretch
+
+
+def sine(frequency, seconds=1.0):
+    return np.sin(2 * np.pi * frequency * np.arange(int(seconds * RATE)) / RATE).astype(np.float32)
+
+
+def middle(signal, size=2048):
+    start = len(signal) // 2 - size // 2
+    return signal[start:start + size].astype(np.float64)
+
+
+@pytest.mark.parametrize("rate", [0.5, 1.0, 1.25])
+def test_stretch_changes_length_but_not_pitch(rate):
+    signal = sine(440.0)
+    out = stretch(signal, rate)
+    assert abs(len(out) - len(signal) / rate) < N_FFT
+    hz, _ = detect_pitch(middle(out), RATE)
+    assert hz == pytest.approx(440.0, rel=0.005)
+
+
+def test_stretch_at_rate_one_keeps_the_signal():
+    signal = sine(440.0)
+    out = stretch(signal, 1.0)
+    # Away from the edges, where the first and last frames have no overlap partner
+    core = slice(N_FFT, len(signal) - 2 * N_FFT)
+    assert np.allclose(out[core], signal[core], atol=1e-2)
+
+
+def test_stretch_of_nothing():
+    assert len(stretch(np.zeros(0, dtype=np.float32), 1.0)) == 0
+
+
+def test_resample_hits_the_ends():
+    out = resample(np.array([0.0, 1.0, 2.0], dtype=np.float32), 5)
+    assert np.allclose(out, [0.0, 0.5, 1.0, 1.5, 2.0])
+    assert np.array_equal(resample(np.zeros(0, dtype=np.float32), 3), np.zeros(3))
+
+
+def test_octave_up_keeps_the_length():
+    samples = np.stack([sine(440.0), sine(440.0)], axis=1)
+    out = shift_and_stretch(samples, semitones=12)
+    assert out.shape == samples.shape
+    hz, _ = detect_pitch(middle(out[:, 0]), RATE)
+    assert hz == pytest.approx(880.0, rel=0.01)
+
+
+def test_tempo_changes_the_length():
+    samples = sine(440.0)[:, None]
+    assert len(shift_and_stretch(samples, tempo=1.25)) == round(len(samples) / 1.25)